@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark of the link allocators against the address list that
+auto_configure_link_ips used to slice and drain.
+
+The IPv4 allocator is timed on /8 pools and the IPv6 allocator on a /64
+pool: seeking to the last link, taking a batch of links after a seek and
+iterating over many links. The list is timed on a /16 pool, built and
+drained with remove() and pop(0) for one leaf of links, the way the module
+did it.
+
+    python benchmarks/bench_link_ips.py --links 1000000
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'module_utils'))
+
+from pn_nvos import (Ipv4LinkAllocator, Ipv6LinkAllocator,
+                     calculate_link_ip_addresses_ipv4)
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+def drain_list(address, cidr, subnet, offset, links):
+    """
+    Method to take links from the address list like the module did.
+    :param offset: Number of links used by the preceding leafs.
+    :param links: Number of links to take.
+    """
+    available_ips = calculate_link_ip_addresses_ipv4(address, cidr, subnet)
+    count = (1 << (32 - int(subnet))) - 4
+    count = (count + 2) if count > 0 else 2
+    available_ips = available_ips[count * offset:]
+    for _ in range(links):
+        first = available_ips[0]
+        available_ips.remove(first)
+        second = available_ips[0]
+        available_ips.remove(second)
+        for _ in range(max((1 << (32 - int(subnet))) - 4, 0)):
+            available_ips.pop(0)
+
+
+def iterate(links, count):
+    for _ in range(count):
+        next(links)
+
+
+def peak_memory(case):
+    """
+    Method to measure the peak memory allocated by a case.
+    :return: Peak in KiB, or None without tracemalloc.
+    """
+    if tracemalloc is None:
+        return None
+    tracemalloc.start()
+    case()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--address', default='10.0.0.0')
+    parser.add_argument('--address-ipv6', default='2001:db8::')
+    parser.add_argument('--links', type=int, default=1000000,
+                        help='links iterated on each pool')
+    parser.add_argument('--batch', type=int, default=1000,
+                        help='links taken after a seek')
+    parser.add_argument('--leaf-links', type=int, default=64,
+                        help='links drained from the /16 address list')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    cases = []
+    for subnet in ('31', '30'):
+        pool = Ipv4LinkAllocator(args.address, '8', subnet)
+        middle = len(pool) // 2
+        cases.extend([
+            ('/8 /%s seek to last link' % subnet,
+             lambda pool=pool: pool.seek(len(pool) - 1).take(1)),
+            ('/8 /%s seek, take %d' % (subnet, args.batch),
+             lambda pool=pool, middle=middle: pool.seek(middle).take(
+                 args.batch)),
+            ('/8 /%s iterate %d links' % (subnet, args.links),
+             lambda pool=pool: iterate(pool.seek(0), args.links)),
+        ])
+    for subnet in ('127', '126'):
+        pool = Ipv6LinkAllocator(args.address_ipv6, '64', subnet)
+        middle = pool.count // 2
+        cases.extend([
+            ('/64 /%s seek to last link' % subnet,
+             lambda pool=pool: pool.seek(pool.count - 1).take(1)),
+            ('/64 /%s seek, take %d' % (subnet, args.batch),
+             lambda pool=pool, middle=middle: pool.seek(middle).take(
+                 args.batch)),
+            ('/64 /%s iterate %d links' % (subnet, args.links),
+             lambda pool=pool: iterate(pool.seek(0), args.links)),
+        ])
+    for subnet in ('31', '30'):
+        links = len(Ipv4LinkAllocator(args.address, '16', subnet))
+        cases.append((
+            '/16 /%s list, drain %d links' % (subnet, args.leaf_links),
+            lambda subnet=subnet, links=links: drain_list(
+                args.address, '16', subnet, links // 2, args.leaf_links)))
+
+    print('%-36s %12s %12s' % ('case', 'best ms', 'peak KiB'))
+    for name, case in cases:
+        best = min(timeit.repeat(case, number=1, repeat=args.repeat))
+        peak = peak_memory(case)
+        print('%-36s %12.3f %12s' % (name, best * 1000,
+                                     '-' if peak is None else '%.1f' % peak))
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
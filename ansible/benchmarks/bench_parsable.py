@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark of parsable_records() against the split() based parsing
+used by the modules.
+
+By default a synthetic vrouter-interface-show output is generated. A
+captured output can be used instead with --file; it must be the output of
+'vrouter-interface-show format nic,ip,l3-port,vlan parsable-delim ,'.
+
+    python benchmarks/bench_parsable.py --rows 100000
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'module_utils'))
+
+from pn_nvos import parsable_records
+
+FIELDS = ('nic', 'ip', 'l3-port', 'vlan')
+LEADING = ('vrouter-name',)
+
+
+def synthetic_output(rows):
+    """
+    Method to build vrouter-interface-show output of the given size.
+    :param rows: Number of interface rows.
+    :return: The parsable-delim output string.
+    """
+    lines = []
+    for i in range(rows):
+        lines.append('leaf%d-vrouter,eth%d.%d,10.%d.%d.%d/31,%d,0' % (
+            i // 64, i % 64, 4000 + i % 64, (i >> 16) & 255, (i >> 8) & 255,
+            i & 255, i % 64 + 1))
+    return '\n'.join(lines) + '\n'
+
+
+def split_vrouters(output):
+    existing = output.replace(',', ' ').split()
+    return list(set(existing))
+
+
+def record_vrouters(output):
+    return set(rec.vrouter_name for rec in
+               parsable_records(output, FIELDS, LEADING))
+
+
+def split_nic(output, vrouter, port):
+    for line in output.splitlines():
+        values = line.split(',')
+        if values[0] == vrouter and values[3] == port:
+            return values[1]
+
+
+def record_nic(output, vrouter, port):
+    for rec in parsable_records(output, FIELDS, LEADING):
+        if rec.vrouter_name == vrouter and rec.l3_port == port:
+            return rec.nic
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--file', help='captured parsable-delim output')
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file) as captured:
+            output = captured.read()
+    else:
+        output = synthetic_output(args.rows)
+
+    first = next(parsable_records(output, FIELDS, LEADING))
+    cases = [
+        ('vrouter names, split()', lambda: split_vrouters(output)),
+        ('vrouter names, records', lambda: record_vrouters(output)),
+        ('first nic lookup, split()',
+         lambda: split_nic(output, first.vrouter_name, first.l3_port)),
+        ('first nic lookup, records',
+         lambda: record_nic(output, first.vrouter_name, first.l3_port)),
+    ]
+
+    print('%d lines, %d bytes' % (output.count('\n'), len(output)))
+    for name, case in cases:
+        best = min(timeit.repeat(case, number=1, repeat=args.repeat))
+        print('%-28s %10.3f ms' % (name, best * 1000))
+
+
+if __name__ == '__main__':
+    main()
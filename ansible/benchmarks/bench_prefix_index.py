@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark of the PrefixIndex overlap check against comparing every
+pair of subnets.
+
+The index is loaded with one /24 per vlan, as a large L3 VRRP csv has them,
+and with the ranges of the address plan of a fabric, then every overlap is
+listed. A fraction of the vlans is put in the link range so there are
+overlaps to report. The pairwise check is only timed up to --pairwise-max
+subnets, it grows with the square of their number.
+
+    python benchmarks/bench_prefix_index.py --subnets 1000,4000,16000
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'module_utils'))
+
+from pn_nvos import FabricAddressPlan, PrefixIndex, prefix_interval
+
+
+def vlan_subnets(count, overlapping):
+    """
+    Method to build the vlan subnets of a csv file.
+    :param count: Number of subnets.
+    :param overlapping: Every how many subnets one is in the link range.
+    :return: List of prefixes.
+    """
+    subnets = []
+    for vlan in range(count):
+        if overlapping and vlan % overlapping == 0:
+            subnets.append('172.168.%d.1/24' % (vlan % 256))
+        else:
+            subnets.append('10.%d.%d.1/24' % (vlan >> 8, vlan & 255))
+    return subnets
+
+
+def index_overlaps(subnets, plan):
+    index = PrefixIndex()
+    for line, subnet in enumerate(subnets, 1):
+        index.add(subnet, 'line %d' % line)
+    index.add_plan(plan)
+    return index.overlaps()
+
+
+def pairwise_overlaps(subnets, plan):
+    """
+    Method to compare every pair of ranges, as a per-file validator
+    would have to without an index.
+    """
+    index = PrefixIndex()
+    index.add_plan(plan)
+    ranges = [prefix_interval(subnet)[1:] for subnet in subnets]
+    ranges.extend(entry[:2] for entry in index.entries['ipv4'])
+    pairs = []
+    for position, (first, last) in enumerate(ranges):
+        for other_first, other_last in ranges[position + 1:]:
+            if first <= other_last and other_first <= last:
+                pairs.append(((first, last), (other_first, other_last)))
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--subnets', default='1000,4000,16000',
+                        help='comma separated numbers of vlan subnets')
+    parser.add_argument('--switches', type=int, default=256,
+                        help='switches of the address plan')
+    parser.add_argument('--overlapping', type=int, default=100,
+                        help='every how many subnets one overlaps, 0 for none')
+    parser.add_argument('--pairwise-max', type=int, default=4000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    spines = ['spine%d' % i for i in range(2)]
+    leafs = ['leaf%d' % i for i in range(args.switches - 2)]
+    plan = FabricAddressPlan(spines, leafs, {
+        'loopback_ip': '109.109.109.1/32',
+        'inband_ip': '192.16.0.1/16',
+        'link_ipv4': ['172.168.0.0', '16', '31'],
+        'iospf_ipv4': ['75.75.75.1', '24', '31'],
+    })
+
+    print('%-36s %12s %10s' % ('case', 'best ms', 'overlaps'))
+    for count in [int(count) for count in args.subnets.split(',')]:
+        subnets = vlan_subnets(count, args.overlapping)
+        cases = [('%d subnets, index' % count, index_overlaps)]
+        if count <= args.pairwise_max:
+            cases.append(('%d subnets, pairwise' % count, pairwise_overlaps))
+        for name, case in cases:
+            best = min(timeit.repeat(lambda case=case: case(subnets, plan),
+                                     number=1, repeat=args.repeat))
+            print('%-36s %12.3f %10d' % (name, best * 1000,
+                                         len(case(subnets, plan))))
+            sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+"""
+End-to-end benchmark of the ZTP playbook stages against the cli simulator.
+
+For every fabric size a simulated fabric is created and the stages are run
+with ansible-playbook, one playbook per stage, the same way the shipped
+playbooks run them (serial: 1, one fork). The modules reach the simulator
+through PN_CLI_PATH, so nothing but this tree and ansible are needed.
+
+    python benchmarks/bench_ztp.py --sizes 4,32,128,256 --latency 0.002
+
+Reported per size and stage: wall time, commands issued, mutating commands
+and commands per host. pn_ztp_vrouter_setup runs as the prerequisite of the
+L3 stages; pn_ebgp_ospf runs on the fabric as left by l3_links, before
+pn_ztp_ospf configured it.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+TREE_DIR = os.path.dirname(BENCH_DIR)
+SIMULATOR = os.path.join(BENCH_DIR, 'cli_simulator.py')
+
+sys.path.insert(0, BENCH_DIR)
+
+from cli_simulator import Simulator, build_fabric
+
+STAGES = ('initial_setup', 'vrouter_setup', 'l3_links', 'ospf', 'l3_vrrp',
+          'ebgp_ospf')
+
+ANSIBLE_CFG = """[defaults]
+library = %(tree)s/modules
+module_utils = %(tree)s/module_utils
+inventory = %(workdir)s/hosts
+forks = 1
+gathering = explicit
+host_key_checking = False
+retry_files_enabled = False
+stdout_callback = json
+"""
+
+
+def topology(size):
+    """
+    Method to split a fabric size into spines and leafs.
+    :param size: Number of switches.
+    :return: Tuple of the spine and leaf names.
+    """
+    spines = max(2, size // 32)
+    leafs = max(size - spines, 1)
+    return (['spine%d' % i for i in range(1, spines + 1)],
+            ['leaf%d' % i for i in range(1, leafs + 1)])
+
+
+def vrrp_csv(leafs):
+    """
+    Method to build the L3 vrrp csv, one vlan per leaf pair.
+    :param leafs: List of leaf names.
+    :return: The csv data.
+    """
+    rows = []
+    for i in range(0, len(leafs), 2):
+        vlan = 100 + i // 2
+        ip = '10.%d.%d.1/24' % (vlan >> 8, vlan & 255)
+        if i + 1 < len(leafs):
+            rows.append('%d,%s,%s,%s,18,%s' % (vlan, ip, leafs[i],
+                                               leafs[i + 1], leafs[i]))
+        else:
+            rows.append('%d,%s,%s' % (vlan, ip, leafs[i]))
+    return '\n'.join(rows)
+
+
+def stage_play(stage, leafs):
+    """
+    Method to build the play of a stage.
+    :param stage: Name of the stage.
+    :param leafs: List of leaf names, for the vrrp csv.
+    :return: Tuple of the hosts pattern, module name and module args.
+    """
+    lists = {
+        'pn_spine_list': "{{ groups['spine'] }}",
+        'pn_leaf_list': "{{ groups['leaf'] }}",
+    }
+    current = dict(lists, pn_current_switch='{{ inventory_hostname }}')
+    if stage == 'initial_setup':
+        return 'all', 'pn_ztp_initial_setup', dict(
+            current, pn_fabric_name='sim-fabric', pn_toggle_port_speed=False)
+    if stage == 'vrouter_setup':
+        return 'all', 'pn_ztp_vrouter_setup', dict(current)
+    if stage == 'l3_links':
+        return 'leaf', 'pn_ztp_l3_links', dict(
+            current, pn_cidr_ipv4='16', pn_subnet_ipv4='31')
+    if stage == 'ospf':
+        return 'all', 'pn_ztp_ospf', dict(current, pn_ospf_cidr_ipv4='16')
+    if stage == 'l3_vrrp':
+        return 'leaf', 'pn_ztp_l3_vrrp', dict(current,
+                                              pn_csv_data=vrrp_csv(leafs))
+    if stage == 'ebgp_ospf':
+        return "spine[0]", 'pn_ebgp_ospf', dict(
+            lists, pn_routing_protocol='ospf')
+    raise ValueError('unknown stage %s' % stage)
+
+
+def write_playbook(path, stage, leafs, environment):
+    """
+    Method to write the playbook of a stage; JSON is valid YAML.
+    """
+    hosts, module, args = stage_play(stage, leafs)
+    play = [{
+        'name': stage,
+        'hosts': hosts,
+        'serial': 1,
+        'gather_facts': False,
+        'environment': environment,
+        'tasks': [{'name': stage, module: args}],
+    }]
+    with open(path, 'w') as playbook:
+        json.dump(play, playbook, indent=2)
+
+
+def reset_stats(state):
+    simulator = Simulator.load(state)
+    simulator.state['stats'] = {}
+    simulator.save(state)
+
+
+def read_stats(state):
+    with open(state) as state_file:
+        return json.load(state_file)['stats']
+
+
+def play_failures(output):
+    """
+    Method to count the failed hosts in the json callback output.
+    """
+    try:
+        stats = json.loads(output[output.index('{'):])['stats']
+    except (ValueError, KeyError):
+        return -1
+    return sum(1 for host in stats.values()
+               if host.get('failures') or host.get('unreachable'))
+
+
+def run_size(options, size, ansible_playbook):
+    """
+    Method to run the stages on a fabric of the given size.
+    :return: List of result dicts, one per stage.
+    """
+    spines, leafs = topology(size)
+    workdir = os.path.join(options.workdir, 'fabric%d' % size)
+    if os.path.isdir(workdir):
+        shutil.rmtree(workdir)
+    os.makedirs(workdir)
+
+    state = os.path.join(workdir, 'fabric.json')
+    checkpoint = os.path.join(workdir, 'fabric-l3.json')
+    Simulator(build_fabric(len(spines), len(leafs)), None).save(state)
+
+    with open(os.path.join(workdir, 'hosts'), 'w') as hosts:
+        for group, names in (('spine', spines), ('leaf', leafs)):
+            hosts.write('[%s]\n' % group)
+            for name in names:
+                hosts.write('%s ansible_connection=local '
+                            'ansible_python_interpreter=%s\n' % (
+                                name, options.python))
+    cfg = os.path.join(workdir, 'ansible.cfg')
+    with open(cfg, 'w') as cfg_file:
+        cfg_file.write(ANSIBLE_CFG % {'tree': TREE_DIR, 'workdir': workdir})
+
+    environment = {
+        'PN_CLI_PATH': SIMULATOR,
+        'PN_CLI_SIM_STATE': state,
+        'PN_CLI_SIM_SWITCH': '{{ inventory_hostname }}',
+        'PN_CLI_SIM_LATENCY': options.latency,
+    }
+    env = dict(os.environ, ANSIBLE_CONFIG=cfg)
+
+    results = []
+    for stage in options.stages:
+        if stage == 'ebgp_ospf' and os.path.exists(checkpoint):
+            shutil.copy(checkpoint, state)
+        playbook = os.path.join(workdir, '%s.yml' % stage)
+        write_playbook(playbook, stage, leafs, environment)
+        reset_stats(state)
+
+        start = time.time()
+        process = subprocess.Popen([ansible_playbook, playbook], env=env,
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT,
+                                   universal_newlines=True)
+        output = process.communicate()[0]
+        elapsed = time.time() - start
+
+        stats = read_stats(state)
+        hosts = len(spines) + len(leafs) if stage_play(
+            stage, leafs)[0] == 'all' else len(leafs)
+        if stage == 'ebgp_ospf':
+            hosts = 1
+        commands = sum(stats.values())
+        results.append({
+            'size': size,
+            'stage': stage,
+            'hosts': hosts,
+            'commands': commands,
+            'mutating': sum(count for verb, count in stats.items()
+                            if not verb.endswith('-show')),
+            'seconds': round(elapsed, 3),
+            'per_host': round(float(commands) / hosts, 1),
+            'failed': play_failures(output),
+            'verbs': stats,
+        })
+        if stage == 'l3_links':
+            shutil.copy(state, checkpoint)
+
+    if not options.keep:
+        shutil.rmtree(workdir)
+    return results
+
+
+def find_ansible_playbook():
+    for path in os.environ.get('PATH', '').split(os.pathsep):
+        candidate = os.path.join(path, 'ansible-playbook')
+        if os.access(candidate, os.X_OK):
+            return candidate
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', default='4,32,128,256',
+                        help='comma separated fabric sizes')
+    parser.add_argument('--stages', default=','.join(STAGES),
+                        help='comma separated stages, in run order')
+    parser.add_argument('--latency', default='0',
+                        help='simulated cli latency, see cli_simulator.py')
+    parser.add_argument('--python', default=sys.executable,
+                        help='interpreter the modules run with')
+    parser.add_argument('--workdir', default=None)
+    parser.add_argument('--keep', action='store_true',
+                        help='keep the inventories and fabric models')
+    parser.add_argument('--json', default=None,
+                        help='also write the results to this file')
+    options = parser.parse_args()
+
+    options.stages = [stage for stage in options.stages.split(',') if stage]
+    for stage in options.stages:
+        if stage not in STAGES:
+            parser.error('unknown stage %s' % stage)
+
+    ansible_playbook = find_ansible_playbook()
+    if not ansible_playbook:
+        parser.error('ansible-playbook was not found in PATH')
+
+    if options.workdir is None:
+        options.workdir = tempfile.mkdtemp(prefix='bench_ztp.')
+
+    results = []
+    print('%6s %-14s %6s %9s %9s %9s %9s %7s' % (
+        'size', 'stage', 'hosts', 'commands', 'mutating', 'seconds',
+        'per host', 'failed'))
+    for size in [int(size) for size in options.sizes.split(',')]:
+        for result in run_size(options, size, ansible_playbook):
+            print('%(size)6d %(stage)-14s %(hosts)6d %(commands)9d '
+                  '%(mutating)9d %(seconds)9.2f %(per_host)9.1f '
+                  '%(failed)7d' % result)
+            sys.stdout.flush()
+            results.append(result)
+
+    if options.json:
+        with open(options.json, 'w') as json_file:
+            json.dump(results, json_file, indent=2, sort_keys=True)
+
+    if not options.keep:
+        shutil.rmtree(options.workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,785 @@
+#!/usr/bin/env python
+"""
+Stand-in for the Netvisor /usr/bin/cli, backed by an in-memory model of a
+spine/leaf fabric, for running the ZTP modules without switches.
+
+Create a fabric model, then point the modules at the simulator:
+
+    python benchmarks/cli_simulator.py --init --spines 2 --leafs 30 \\
+        --state /tmp/fabric.json
+    export PN_CLI_PATH=$PWD/benchmarks/cli_simulator.py
+    export PN_CLI_SIM_STATE=/tmp/fabric.json
+    export PN_CLI_SIM_SWITCH=leaf1
+
+The simulator accepts the same launch options as the cli. Given a command
+it runs it and exits; without one it reads commands from stdin, one per
+line, like the interactive cli used by the pooled sessions in pn_nvos.
+
+Only the generic object model the ZTP modules rely on is simulated: shows
+with filters, format, no-show-headers, parsable-delim and count-output,
+and create/add/modify/delete/remove of the objects. Vrouter sub-objects
+prepend the vrouter name column, like Netvisor does.
+
+Environment:
+    PN_CLI_SIM_STATE    Fabric model file, /tmp/pn_cli_simulator.json.
+    PN_CLI_SIM_SWITCH   Switch the cli runs on, the first switch if unset.
+    PN_CLI_SIM_LATENCY  Seconds added to every command, optionally followed
+                        by per verb overrides, e.g. '0.005,*-show=0.001'.
+
+Every command runs under a lock on the model file, on the latest model,
+and mutating commands write it back, so several simulators, like the
+sessions of concurrent executor workers, can share a model. The simulated
+latency is waited outside the lock. Commands are counted per verb and
+added to the model's stats when the simulator exits.
+"""
+
+import argparse
+import fcntl
+import fnmatch
+import json
+import os
+import shlex
+import sys
+import time
+
+STATE_FILE = '/tmp/pn_cli_simulator.json'
+
+ACTIONS = ('show', 'create', 'add', 'modify', 'delete', 'remove')
+
+# Object tables: scope and key fields. Rows of switch scoped objects are
+# shown for the target switch only, vrouter sub-objects belong to the
+# switch of their vrouter and are shown fabric wide.
+OBJECTS = {
+    'vrouter': ('fabric', ('name',)),
+    'vrouter-interface': ('vrouter', ('vrouter-name', 'nic')),
+    'vrouter-interface-config': ('vrouter', ('vrouter-name', 'nic')),
+    'vrouter-loopback-interface': ('vrouter', ('vrouter-name', 'ip')),
+    'vrouter-ospf': ('vrouter', ('vrouter-name', 'network')),
+    'vrouter-ospf6': ('vrouter', ('vrouter-name', 'nic')),
+    'vrouter-bgp': ('vrouter', ('vrouter-name', 'neighbor')),
+    'cluster': ('fabric', ('name',)),
+    'vlan': ('switch', ('id',)),
+    'trunk': ('switch', ('name',)),
+    'port': ('switch', ('port',)),
+    'port-config': ('switch', ('port',)),
+    'lldp': ('switch', ('local-port',)),
+    'bezel-portmap': ('switch', ('port',)),
+}
+
+# Per switch settings, shown in vertical 'field: value' layout.
+SINGLETONS = ('switch-setup', 'stp', 'system-settings', 'switch-info',
+              'admin-service', 'fabric-local')
+
+DEFAULT_FORMATS = {
+    'vrouter': ('name', 'location', 'router-id', 'bgp-as'),
+    'vrouter-interface': ('nic', 'ip', 'l3-port', 'vlan'),
+    'vrouter-interface-config': ('nic', 'ospf-network-type', 'ospf-bfd'),
+    'vrouter-loopback-interface': ('ip', 'router-if'),
+    'vrouter-ospf': ('network', 'ospf-area'),
+    'vrouter-ospf6': ('nic', 'ospf6-area'),
+    'vrouter-bgp': ('neighbor', 'remote-as'),
+    'cluster': ('name', 'cluster-node-1', 'cluster-node-2'),
+    'vlan': ('id', 'scope', 'ports'),
+    'trunk': ('name', 'ports'),
+    'port': ('port', 'hostname', 'rport', 'status'),
+    'port-config': ('port', 'speed', 'enable'),
+    'lldp': ('local-port', 'sys-name', 'port-id'),
+    'bezel-portmap': ('port', 'bezel-port'),
+    'fabric': ('name', 'fabric-network'),
+    'fabric-node': ('name', 'fab-name', 'fab-tid', 'state'),
+}
+
+# Display options of show commands, with the number of values they take.
+DISPLAY_OPTIONS = {
+    'format': 1, 'parsable-delim': 1, 'layout': 1, 'no-show-headers': 0,
+    'show-headers': 0, 'count-output': 0, 'sort-asc': 1, 'sort-desc': 1,
+    'show-interval': 1,
+}
+
+# Arguments of create/modify commands that take no value.
+FLAGS = ('enable', 'disable', 'jumbo', 'no-jumbo', 'autoneg', 'no-autoneg',
+         'auto-trunk', 'no-auto-trunk', 'pim-cluster', 'no-pim-cluster',
+         'bfd', 'no-bfd', 'next-hop-self', 'no-next-hop-self', 'allowas-in',
+         'no-allowas-in', 'ospf-passive-if', 'no-ospf-passive-if', 'web',
+         'no-web', 'ssh', 'no-ssh', 'icmp', 'no-icmp')
+
+# Fields holding comma separated lists, matched by membership.
+LIST_FIELDS = ('ports', 'status', 'remote-ports')
+
+
+class CliError(Exception):
+    pass
+
+
+def parse_latency(spec):
+    """
+    Method to parse the PN_CLI_SIM_LATENCY specification.
+    :param spec: Default seconds, then comma separated verb=seconds.
+    :return: Tuple of default latency and list of (pattern, latency).
+    """
+    default, overrides = 0.0, []
+    for item in (spec or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        if '=' in item:
+            pattern, value = item.split('=', 1)
+            overrides.append((pattern.strip(), float(value)))
+        else:
+            default = float(item)
+    return default, overrides
+
+
+def known_verb(verb):
+    """
+    Method to tell if the simulator knows a command verb; unknown ones,
+    like the session end of command markers, are neither delayed nor
+    counted.
+    """
+    if verb in ('fabric-info', 'fabric-create', 'fabric-join',
+                'vlan-port-add'):
+        return True
+    for action in ACTIONS:
+        if verb.endswith('-' + action):
+            obj = verb[:-len(action) - 1]
+            return obj in OBJECTS or obj in SINGLETONS or obj in (
+                'fabric', 'fabric-node')
+    return False
+
+
+def expand_ports(value):
+    """
+    Method to expand a port list like '1,3,49-52'.
+    :param value: The port list string.
+    :return: List of port strings.
+    """
+    ports = []
+    for item in value.split(','):
+        item = item.strip()
+        if '-' in item and item.replace('-', '').isdigit():
+            first, last = item.split('-', 1)
+            ports.extend(str(port) for port in range(int(first), int(last) + 1))
+        elif item:
+            ports.append(item)
+    return ports
+
+
+def match_value(field, row_value, values):
+    """
+    Method to test a row value against the values of a show filter.
+    """
+    row_value = '' if row_value is None else str(row_value)
+    if field in LIST_FIELDS:
+        return bool(set(row_value.split(',')) & set(values))
+    for value in values:
+        if row_value == value:
+            return True
+        if '/' not in value and row_value.split('/')[0] == value:
+            return True
+    return False
+
+
+def build_fabric(spines, leafs, fabric=None, idle_ports=4):
+    """
+    Method to build the model of a spine/leaf fabric. Every leaf has one
+    link to every spine, leafs are wired in pairs over two ports.
+    :param spines: Number of spine switches.
+    :param leafs: Number of leaf switches.
+    :param fabric: Name of an existing fabric all switches are part of, or
+    None for switches that still have to create or join a fabric.
+    :param idle_ports: Number of unconnected ports per switch.
+    :return: The model dictionary.
+    """
+    spine_names = ['spine%d' % (i + 1) for i in range(spines)]
+    leaf_names = ['leaf%d' % (i + 1) for i in range(leafs)]
+    state = {
+        'tid': 1,
+        'fabrics': {},
+        'switches': {},
+        'tables': dict((name, []) for name in OBJECTS),
+        'stats': {},
+    }
+    if fabric:
+        state['fabrics'][fabric] = {'fabric-network': 'mgmt'}
+
+    links = dict((name, []) for name in spine_names + leaf_names)
+    next_port = dict((name, 1) for name in links)
+
+    def connect(switch, peer, count=1):
+        for _ in range(count):
+            port, rport = next_port[switch], next_port[peer]
+            next_port[switch] += 1
+            next_port[peer] += 1
+            links[switch].append((port, peer, rport))
+            links[peer].append((rport, switch, port))
+
+    for leaf in leaf_names:
+        for spine in spine_names:
+            connect(leaf, spine)
+    for i in range(0, len(leaf_names) - 1, 2):
+        connect(leaf_names[i], leaf_names[i + 1], 2)
+
+    tables = state['tables']
+    for index, switch in enumerate(spine_names + leaf_names):
+        state['switches'][switch] = {
+            'fabric': fabric,
+            'switch-setup': {
+                'switch-name': switch,
+                'mgmt-ip': '10.0.%d.%d/16' % (index // 250, index % 250 + 2),
+                'in-band-ip': '',
+            },
+            'stp': {'enable': 'yes'},
+            'system-settings': {'auto-trunk': 'yes'},
+            'switch-info': {'model': 'SIMULATOR', 'chassis-serial': str(index)},
+            'admin-service': {'if': 'mgmt', 'web': 'no'},
+            'fabric-local': {'control-network': 'mgmt',
+                             'fabric-network': 'mgmt'},
+        }
+
+        peers = {}
+        for port, peer, rport in links[switch]:
+            peers.setdefault(peer, []).append(port)
+        trunk_of = {}
+        for peer, ports in sorted(peers.items()):
+            if len(ports) > 1:
+                name = 'auto-%d' % (128 + len(trunk_of))
+                tables['trunk'].append({
+                    'switch': switch, 'name': name,
+                    'ports': ','.join(str(port) for port in ports),
+                })
+                for port in ports:
+                    trunk_of[port] = name
+
+        connected = next_port[switch] - 1
+        for port in range(1, connected + idle_ports + 1):
+            tables['port-config'].append({
+                'switch': switch, 'port': str(port), 'speed': '10g',
+                'enable': 'on', 'autoneg': 'off',
+            })
+            tables['bezel-portmap'].append({
+                'switch': switch, 'port': str(port), 'bezel-port': str(port),
+            })
+        for port, peer, rport in links[switch]:
+            trunk = trunk_of.get(port, '')
+            tables['port'].append({
+                'switch': switch, 'port': str(port), 'hostname': peer,
+                'rport': str(rport), 'trunk': trunk, 'bezel-port': str(port),
+                'status': 'up,trunk' if trunk else 'up',
+            })
+            tables['lldp'].append({
+                'switch': switch, 'local-port': str(port), 'sys-name': peer,
+                'port-id': str(rport),
+            })
+        tables['vlan'].append({'switch': switch, 'id': '1', 'scope': 'local',
+                               'ports': ''})
+
+    return state
+
+
+class Simulator(object):
+    """
+    The fabric model and the command interpreter working on it.
+    """
+
+    def __init__(self, state, local, latency=(0.0, ())):
+        """
+        :param state: The model dictionary.
+        :param local: Name of the switch the cli runs on.
+        :param latency: Tuple of default latency and (pattern, latency) list.
+        """
+        self.state = state
+        self.local = local or sorted(state['switches'])[0]
+        self.latency = latency
+        self.dirty = False
+        self.path = None
+        self.stamp = None
+        self.counts = {}
+
+    @staticmethod
+    def _stamp(path):
+        info = os.stat(path)
+        return info.st_ino, info.st_mtime, info.st_size
+
+    @classmethod
+    def load(cls, path, local=None, latency=(0.0, ())):
+        with open(path) as state_file:
+            simulator = cls(json.load(state_file), local, latency)
+        simulator.path = path
+        simulator.stamp = cls._stamp(path)
+        return simulator
+
+    def refresh(self):
+        """
+        Method to reload the model if another simulator saved it since.
+        """
+        if self.path and self._stamp(self.path) != self.stamp:
+            with open(self.path) as state_file:
+                self.state = json.load(state_file)
+            self.stamp = self._stamp(self.path)
+
+    def save(self, path):
+        """
+        Method to write the model back, replacing the file atomically.
+        """
+        temp = '%s.%d' % (path, os.getpid())
+        with open(temp, 'w') as state_file:
+            json.dump(self.state, state_file, separators=(',', ':'))
+        os.rename(temp, path)
+        if path == self.path:
+            self.stamp = self._stamp(path)
+        self.dirty = False
+
+    def locked(self, action, *args):
+        """
+        Method to call action on the latest model, holding the model lock.
+        """
+        with open(self.path + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self.refresh()
+                return action(*args)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _run_and_save(self, args):
+        out, err = self.run(args)
+        if self.dirty:
+            self.save(self.path)
+        return out, err
+
+    def command(self, args):
+        """
+        Method to run one command against the model file, after waiting the
+        simulated latency.
+        :param args: The command arguments without the launch options.
+        :return: Tuple of stdout and stderr strings.
+        """
+        verb = [arg for arg in args if arg not in ('switch-local',
+                                                   'fabric-local')]
+        while verb[:1] == ['switch']:
+            verb = verb[2:]
+        delay = self._delay(verb[0]) if verb and known_verb(verb[0]) else 0
+        if delay:
+            time.sleep(delay)
+        return self.locked(self._run_and_save, args)
+
+    def _add_counts(self):
+        stats = self.state['stats']
+        for verb, count in self.counts.items():
+            stats[verb] = stats.get(verb, 0) + count
+        self.counts = {}
+        self.save(self.path)
+
+    def save_counts(self):
+        """
+        Method to add the command counts to the stats of the model file.
+        """
+        if self.counts:
+            self.locked(self._add_counts)
+
+    def _delay(self, verb):
+        default, overrides = self.latency
+        for pattern, seconds in overrides:
+            if fnmatch.fnmatch(verb, pattern):
+                return seconds
+        return default
+
+    def run(self, args):
+        """
+        Method to run one command.
+        :param args: The command arguments without the launch options.
+        :return: Tuple of stdout and stderr strings.
+        """
+        args = list(args)
+        pipe = []
+        if '|' in args:
+            pipe = args[args.index('|') + 1:]
+            args = args[:args.index('|')]
+
+        switch = self.local
+        while args and args[0] in ('switch', 'switch-local', 'fabric-local'):
+            if args[0] == 'switch' and len(args) > 1:
+                switch = args[1]
+                args = args[2:]
+            else:
+                args = args[1:]
+        if not args:
+            return '', ''
+
+        verb = args[0]
+        if known_verb(verb):
+            self.counts[verb] = self.counts.get(verb, 0) + 1
+
+        try:
+            if switch not in self.state['switches']:
+                raise CliError('switch %s not found' % switch)
+            out = self.execute(switch, verb, args[1:])
+        except CliError as error:
+            return '', '%s: %s\n' % (verb, error)
+
+        if pipe[:1] == ['grep'] and len(pipe) > 1:
+            out = ''.join(line for line in out.splitlines(True)
+                          if pipe[1] in line)
+        return out, ''
+
+    def execute(self, switch, verb, args):
+        if verb == 'fabric-info':
+            return self.fabric_info(switch, args)
+        if verb in ('fabric-create', 'fabric-join'):
+            return self.fabric_membership(switch, verb, args)
+        if verb == 'vlan-port-add':
+            return self.vlan_port_add(switch, args)
+
+        for action in ACTIONS:
+            if verb.endswith('-' + action):
+                obj = verb[:-len(action) - 1]
+                break
+        else:
+            raise CliError('unknown command')
+
+        if obj in ('fabric', 'fabric-node') and action == 'show':
+            return self.show_rows(obj, self.fabric_rows(obj, switch), args)
+        if obj in SINGLETONS:
+            settings = self.state['switches'][switch][obj]
+            if action == 'show':
+                return self.show_settings(settings, args)
+            if action == 'modify':
+                settings.update(self.parse_values(args))
+                return self.mutated(verb)
+        if obj not in OBJECTS:
+            raise CliError('unknown command')
+
+        if action == 'show':
+            scope = OBJECTS[obj][0]
+            rows = self.state['tables'][obj]
+            if scope == 'switch':
+                rows = [row for row in rows if row['switch'] == switch]
+            return self.show_rows(obj, rows, args)
+        if action in ('create', 'add'):
+            self.create(switch, obj, self.parse_values(args))
+        elif action == 'modify':
+            self.modify(switch, obj, self.parse_values(args))
+        else:
+            self.delete(switch, obj, self.parse_values(args))
+        return self.mutated(verb)
+
+    def mutated(self, verb):
+        """
+        Method to bump the fabric generation after a mutating command.
+        """
+        self.state['tid'] += 1
+        self.dirty = True
+        return ''
+
+    @staticmethod
+    def parse_values(args):
+        """
+        Method to parse the 'field value' pairs and flags of a command.
+        """
+        values = {}
+        index = 0
+        while index < len(args):
+            arg = args[index]
+            if arg in FLAGS:
+                if arg == 'disable':
+                    values['enable'] = 'no'
+                elif arg.startswith('no-'):
+                    values[arg[3:]] = 'no'
+                else:
+                    values[arg] = 'yes'
+                index += 1
+            else:
+                values[arg] = args[index + 1] if index + 1 < len(args) else ''
+                index += 2
+        return values
+
+    @staticmethod
+    def parse_show(args):
+        """
+        Method to separate the filters of a show command from its display
+        options.
+        :return: Tuple of filters list and display options dictionary.
+        """
+        filters, options = [], {}
+        index = 0
+        while index < len(args):
+            arg = args[index]
+            if arg in DISPLAY_OPTIONS:
+                count = DISPLAY_OPTIONS[arg]
+                options[arg] = args[index + 1] if count else True
+                index += 1 + count
+                if arg == 'format':
+                    # 'format a, b' continues the column list.
+                    while (options[arg].endswith(',') and index < len(args) and
+                           args[index] not in DISPLAY_OPTIONS):
+                        options[arg] += args[index]
+                        index += 1
+            else:
+                value = args[index + 1] if index + 1 < len(args) else ''
+                filters.append((arg, value.split(',')))
+                index += 2
+        return filters, options
+
+    def show_rows(self, obj, rows, args):
+        filters, options = self.parse_show(args)
+        if filters:
+            rows = [row for row in rows if all(
+                match_value(field, row.get(field), values)
+                for field, values in filters)]
+
+        columns = [column for column in
+                   options.get('format', '').split(',') if column]
+        if not columns or columns == ['all']:
+            columns = list(DEFAULT_FORMATS.get(obj, OBJECTS[obj][1]))
+        if OBJECTS.get(obj, ('',))[0] == 'vrouter' and 'vrouter-name' not in columns:
+            columns.insert(0, 'vrouter-name')
+
+        lines = []
+        delim = options.get('parsable-delim')
+        if delim is None and 'no-show-headers' not in options:
+            lines.append(' '.join(columns))
+        for row in rows:
+            values = [str(row.get(column, '')) for column in columns]
+            lines.append((delim or ' ').join(values))
+        if 'count-output' in options:
+            lines.append('Count: %d' % len(rows))
+        if not rows and 'count-output' not in options:
+            return ''
+        return '\n'.join(lines) + '\n'
+
+    def show_settings(self, settings, args):
+        filters, options = self.parse_show(args)
+        columns = [column for column in
+                   options.get('format', '').split(',') if column]
+        columns = columns or sorted(settings)
+        delim = options.get('parsable-delim')
+        if delim is not None or options.get('layout') == 'horizontal':
+            return (delim or ' ').join(
+                str(settings.get(column, '')) for column in columns) + '\n'
+        return ''.join('%s: %s\n' % (column, settings.get(column, ''))
+                       for column in columns)
+
+    def fabric_rows(self, obj, switch):
+        if obj == 'fabric':
+            return [dict(values, name=name) for name, values in
+                    sorted(self.state['fabrics'].items())]
+        fabric = self.state['switches'][switch]['fabric']
+        if not fabric:
+            return []
+        return [{
+            'name': name,
+            'fab-name': fabric,
+            'fab-tid': str(self.state['tid']),
+            'mgmt-ip': settings['switch-setup']['mgmt-ip'],
+            'in-band-ip': settings['switch-setup']['in-band-ip'],
+            'state': 'online',
+        } for name, settings in sorted(self.state['switches'].items())
+            if settings['fabric'] == fabric]
+
+    def fabric_info(self, switch, args):
+        settings = self.state['switches'][switch]
+        if not settings['fabric']:
+            raise CliError('switch is not part of a fabric')
+        info = dict(settings['fabric-local'], name=settings['fabric'])
+        return self.show_settings(info, args)
+
+    def fabric_membership(self, switch, verb, args):
+        values = self.parse_values(args)
+        name = values.get('name')
+        settings = self.state['switches'][switch]
+        if settings['fabric']:
+            raise CliError('switch is already part of fabric %s' %
+                           settings['fabric'])
+        if verb == 'fabric-create':
+            if name in self.state['fabrics']:
+                raise CliError('fabric %s already exists' % name)
+            network = values.get('fabric-network', 'mgmt')
+            self.state['fabrics'][name] = {'fabric-network': network}
+            settings['fabric-local']['fabric-network'] = network
+            message = 'Fabric %s created.\n' % name
+        else:
+            if name not in self.state['fabrics']:
+                raise CliError('fabric %s not found' % name)
+            message = 'Joined fabric %s. Restarting nvOS...\n' % name
+        settings['fabric'] = name
+        self.mutated(verb)
+        return message
+
+    def vlan_port_add(self, switch, args):
+        values = self.parse_values(args)
+        for vlan in self.state['tables']['vlan']:
+            if vlan['switch'] == switch and vlan['id'] == values.get('vlan-id'):
+                ports = [port for port in vlan['ports'].split(',') if port]
+                ports.extend(expand_ports(values.get('ports', '')))
+                vlan['ports'] = ','.join(ports)
+                return self.mutated('vlan-port-add')
+        raise CliError('vlan %s not found' % values.get('vlan-id'))
+
+    def _vrouter(self, name):
+        for vrouter in self.state['tables']['vrouter']:
+            if vrouter['name'] == name:
+                return vrouter
+        raise CliError('vrouter %s not found' % name)
+
+    def _find(self, switch, obj, values):
+        scope, keys = OBJECTS[obj]
+        table = self.state['tables'][obj]
+        if obj == 'port-config':
+            ports = set(expand_ports(values.get('port', '')))
+            return [row for row in table
+                    if row['switch'] == switch and row['port'] in ports]
+        return [row for row in table
+                if (scope != 'switch' or row['switch'] == switch) and
+                all(row.get(key) == values.get(key) for key in keys)]
+
+    def create(self, switch, obj, values):
+        scope, keys = OBJECTS[obj]
+        table = self.state['tables'][obj]
+        row = dict(values)
+
+        if obj == 'vrouter':
+            row.update(location=switch, switch=switch)
+        elif scope == 'vrouter':
+            vrouter = self._vrouter(values.get('vrouter-name'))
+            row['switch'] = vrouter['location']
+            if obj == 'vrouter-interface':
+                vrouter['nics'] = vrouter.get('nics', 0) + 1
+                row['nic'] = 'eth%d.%s' % (vrouter['nics'],
+                                          values.get('vlan', '4092'))
+                row.setdefault('vlan', '')
+                row.setdefault('l3-port', '')
+            elif obj == 'vrouter-loopback-interface':
+                vrouter['loopbacks'] = vrouter.get('loopbacks', 0) + 1
+                row['router-if'] = 'lo%d' % vrouter['loopbacks']
+        elif obj == 'cluster':
+            node1, node2 = values.get('cluster-node-1'), values.get('cluster-node-2')
+            links = [port for port in self.state['tables']['port']
+                     if port['switch'] == node1 and port['hostname'] == node2]
+            row['ports'] = ','.join(port['port'] for port in links)
+            row['remote-ports'] = ','.join(port['rport'] for port in links)
+        elif obj == 'vlan':
+            row.setdefault('scope', 'local')
+            row.setdefault('ports', '')
+            switches = [switch]
+            if row['scope'] == 'fabric':
+                fabric = self.state['switches'][switch]['fabric']
+                switches = [name for name, settings in
+                            self.state['switches'].items()
+                            if settings['fabric'] == fabric]
+            elif row['scope'] == 'cluster':
+                for cluster in self.state['tables']['cluster']:
+                    nodes = (cluster['cluster-node-1'], cluster['cluster-node-2'])
+                    if switch in nodes:
+                        switches = list(nodes)
+            if self._find(switch, obj, row):
+                raise CliError('vlan %s already exists' % row.get('id'))
+            for name in switches:
+                if not self._find(name, obj, row):
+                    table.append(dict(row, switch=name))
+            return
+        else:
+            row['switch'] = switch
+
+        if self._find(switch, obj, row):
+            raise CliError('%s %s already exists' % (
+                obj, ' '.join(str(row.get(key)) for key in keys)))
+        table.append(row)
+
+    def modify(self, switch, obj, values):
+        rows = self._find(switch, obj, values)
+        if not rows:
+            raise CliError('%s not found' % obj)
+        keys = OBJECTS[obj][1]
+        for row in rows:
+            row.update((field, value) for field, value in values.items()
+                       if field not in keys)
+
+    def delete(self, switch, obj, values):
+        rows = self._find(switch, obj, values)
+        if not rows:
+            raise CliError('%s not found' % obj)
+        table = self.state['tables'][obj]
+        self.state['tables'][obj] = [row for row in table if row not in rows]
+        if obj == 'trunk':
+            for port in self.state['tables']['port']:
+                if port['switch'] == switch and port['trunk'] == values['name']:
+                    port['trunk'] = ''
+                    port['status'] = 'up'
+
+
+def split_launch_options(argv):
+    """
+    Method to drop the cli launch options.
+    :param argv: The arguments the simulator was started with.
+    :return: List of the command arguments.
+    """
+    args = list(argv)
+    while args and args[0].startswith('-'):
+        option = args.pop(0)
+        if option == '--user' and args:
+            args.pop(0)
+    return args
+
+
+def serve(simulator, stdin, stdout, stderr):
+    """
+    Method to run the commands read from stdin until end of file.
+    """
+    while True:
+        line = stdin.readline()
+        if not line:
+            break
+        try:
+            args = shlex.split(line)
+        except ValueError as error:
+            stderr.write('cli: %s\n' % error)
+            stderr.flush()
+            continue
+        if not args:
+            continue
+        out, err = simulator.command(split_launch_options(args))
+        if out:
+            stdout.write(out)
+            stdout.flush()
+        if err:
+            stderr.write(err)
+            stderr.flush()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if '--init' in argv:
+        parser = argparse.ArgumentParser(description='Create a fabric model.')
+        parser.add_argument('--init', action='store_true')
+        parser.add_argument('--spines', type=int, default=2)
+        parser.add_argument('--leafs', type=int, default=2)
+        parser.add_argument('--fabric', default=None,
+                            help='put every switch in this fabric already')
+        parser.add_argument('--state', default=os.environ.get(
+            'PN_CLI_SIM_STATE', STATE_FILE))
+        options = parser.parse_args(argv)
+        simulator = Simulator(build_fabric(options.spines, options.leafs,
+                                           options.fabric), None)
+        simulator.save(options.state)
+        return 0
+
+    path = os.environ.get('PN_CLI_SIM_STATE', STATE_FILE)
+    simulator = Simulator.load(path, os.environ.get('PN_CLI_SIM_SWITCH'),
+                               parse_latency(os.environ.get('PN_CLI_SIM_LATENCY')))
+    args = split_launch_options(argv)
+    status = 0
+    try:
+        if args:
+            out, err = simulator.command(args)
+            sys.stdout.write(out)
+            sys.stderr.write(err)
+            status = 1 if err else 0
+        else:
+            serve(simulator, sys.stdin, sys.stdout, sys.stderr)
+    finally:
+        simulator.save_counts()
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,98 @@
 #!/usr/bin/python
 
+import abc
+import atexit
+import json
+import os
+import select
+import shlex
+import subprocess
+import sys
+import threading
+import time
+
+from collections import namedtuple
+
+try:
+    from shlex import quote as shell_quote
+except ImportError:
+    from pipes import quote as shell_quote
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+try:
+    STRING_TYPES = (str, unicode)
+except NameError:
+    STRING_TYPES = (str,)
+
+# PN_CLI_PATH points the sessions at another cli, like the simulator in
+# benchmarks/cli_simulator.py.
+CLI_PATH = os.environ.get('PN_CLI_PATH', '/usr/bin/cli')
+CLI_SESSION_TIMEOUT = 120
+# Commands run at the same time by the executors of a module, per fabric.
+CLI_FANOUT_LIMIT = 8
+FABRIC_FACTS_CACHE_DIR = '/tmp/pn_fabric_facts'
+FABRIC_FACTS_TTL = 1800
+
+# Sessions are pooled per cli user for the life of the module process;
+# executor worker threads keep their own pool in _CLI_THREAD.sessions,
+# taken from _CLI_WORKER_POOLS and put back there for the workers of the
+# next flush.
+_CLI_SESSIONS = {}
+_CLI_WORKER_POOLS = []
+_CLI_THREAD = threading.local()
+_CLI_LOCK = threading.Lock()
+# Serializes the one-shot cli fallback, module.run_command() is not known
+# to be thread safe.
+_CLI_FALLBACK_LOCK = threading.Lock()
+_FANOUT_SEMAPHORES = {}
+_RECORD_TYPES = {}
+_FABRIC_SNAPSHOTS = {}
+# Per verb [count, seconds, bytes, errors] of the commands run by the module.
+_CLI_METRICS = {}
+# Mutating commands issued, or only planned in check mode, in order.
+_CLI_PLAN = []
+# Responses of show commands per cli user and command, see memoize_shows().
+_SHOW_MEMO = {}
+_SHOW_MEMO_STATE = {'enabled': False, 'generation': 0}
+
+# Object types whose shows a mutation of another object type may change,
+# besides the object itself. Only the objects a mutation really changes
+# are listed: deleting a vrouter drops its interfaces, while adding an
+# interface, a BGP neighbor or an OSPF area leaves vrouter-show as it was.
+SHOW_MEMO_RELATED = {
+    'port-config': ('port', 'lldp', 'trunk'),
+    'port': ('port-config', 'lldp', 'trunk'),
+    'trunk': ('port', 'port-config', 'lldp'),
+    'vlag': ('port', 'trunk'),
+    'cluster': ('vlag', 'port', 'trunk', 'vlan'),
+    'system-settings': ('port', 'trunk', 'lldp'),
+    'vlan': ('port', 'vlan-port'),
+    'vlan-port': ('vlan', 'port'),
+    'vrouter': ('vrouter-interface', 'vrouter-interface-config',
+                'vrouter-loopback-interface', 'vrouter-bgp',
+                'vrouter-bgp-neighbor', 'vrouter-ospf', 'vrouter-ospf6',
+                'vrouter-ospf-neighbor', 'vrouter-static-route'),
+    'vrouter-interface': ('vrouter-interface-config', 'vrouter-ospf',
+                          'vrouter-ospf6', 'vrouter-ospf-neighbor',
+                          'vrouter-bgp', 'vrouter-bgp-neighbor'),
+    'vrouter-bgp': ('vrouter-bgp-neighbor',),
+    'vrouter-ospf': ('vrouter-ospf-neighbor',),
+    'vrouter-ospf6': ('vrouter-ospf-neighbor',),
+    'tunnel': ('tunnel-vxlan',),
+    'access-list': ('access-list-ip',),
+    'dscp-map': ('dscp-map-pri-map',),
+    'switch-setup': ('port', 'vrouter-interface', 'fabric-node'),
+}
+CLI_ACTIONS = ('create', 'delete', 'modify', 'add', 'remove')
+# Commands known to be read only besides the shows; every other command is
+# taken as mutating.
+CLI_READ_ONLY_VERBS = frozenset(('fabric-info', 'switch-info', 'vrouter-ping'))
+
+
 def pn_cli(module, switch=None, username=None, password=None, switch_local=None):
     """
     Method to generate the cli portion to launch the Netvisor cli.
@@ -19,153 +112,1438 @@ def pn_cli(module, switch=None, username=None, password=None, switch_local=None)
     return cli
 
 
-def calculate_link_ip_addresses_ipv4(address_str, cidr_str, supernet_str):
+def split_cli(cli):
     """
-    Method to calculate link IPs for layer 3 fabric.
-    :param address_str: Host/network address.
-    :param cidr_str: Subnet mask.
-    :param supernet_str: Supernet mask.
-    :return: List of available IP addresses that can be assigned to vrouter
-    interfaces for layer 3 fabric.
+    Method to separate the cli launch options from the Netvisor command.
+    :param cli: The complete cli string or its already split arguments.
+    :return: Tuple of cli user (or None) and the list of command arguments.
     """
-    # Split address into octets and turn CIDR, supernet mask into int
-    address = address_str.split('.')
-    cidr = int(cidr_str)
-    supernet = int(supernet_str)
-    supernet_range = (1 << (32 - supernet)) - 2
-    base_addr = int(address[3])
-
-    # Initialize the netmask and calculate based on CIDR mask
-    mask = [0, 0, 0, 0]
-    for i in range(cidr):
-        mask[i / 8] += (1 << (7 - i % 8))
-
-    # Initialize net and binary and netmask with addr to get network
-    network = []
-    for i in range(4):
-        network.append(int(address[i]) & mask[i])
-
-    # Duplicate net into broad array, gather host bits, and generate broadcast
-    broadcast = list(network)
-    broadcast_range = 32 - cidr
-    for i in range(broadcast_range):
-        broadcast[3 - i / 8] += (1 << (i % 8))
-
-    last_ip = list(broadcast)
-    diff = base_addr % (supernet_range + 2)
-    host = base_addr - diff
-    count, hostmin, hostmax = 0, 0, 0
-    third_octet = network[2]
-    available_ips = []
-    while third_octet <= last_ip[2]:
-        ips_list = []
-        while count < last_ip[3]:
-            hostmin = host + 1
-            hostmax = hostmin + supernet_range - 1
-            if supernet == 31:
-                while hostmax <= hostmin:
-                    ips_list.append(hostmax)
-                    hostmax += 1
-                host = hostmin + 1
+    args = shlex.split(cli) if isinstance(cli, STRING_TYPES) else list(cli)
+    user = None
+    if args and os.path.basename(args[0]) == 'cli':
+        args.pop(0)
+        while args and args[0].startswith('-'):
+            option = args.pop(0)
+            if option == '--user' and args:
+                user = args.pop(0)
+
+    return user, args
+
+
+class CliSession(object):
+    """
+    Long-lived interactive Netvisor cli process.
+    Every command is followed by an end of command marker which the cli
+    rejects as an unknown command; the marker showing up in its output is
+    what separates one response from the next.
+
+    Unlike the one-shot cli of pn_cli(), the session is started without -e:
+    it would end the session at the first failed command, the marker
+    included. The interactive cli reports no status per command either, so
+    rc is 1 when the command wrote to stderr and 0 otherwise. The modules
+    only look at stdout and stderr, which are the same either way.
+    """
+
+    def __init__(self, user=None, timeout=CLI_SESSION_TIMEOUT):
+        self.user = user
+        self.timeout = timeout
+        self.proc = None
+        self.broken = False
+        self._sequence = 0
+
+    def start(self):
+        """
+        Method to launch the interactive cli process.
+        :return: True if the cli process is running.
+        """
+        if self.proc is not None:
+            return self.proc.poll() is None
+
+        argv = [CLI_PATH, '--quiet', '--no-login-prompt']
+        if self.user:
+            argv += ['--user', self.user]
+
+        try:
+            self.proc = subprocess.Popen(argv, stdin=subprocess.PIPE,
+                                         stdout=subprocess.PIPE,
+                                         stderr=subprocess.PIPE,
+                                         close_fds=True)
+        except OSError:
+            self.broken = True
+            return False
+
+        return True
+
+    def _read_until(self, marker):
+        """
+        Method to collect stdout and stderr until the marker is echoed back.
+        :param marker: The end of command marker to wait for.
+        :return: Tuple of stdout and stderr, or None on timeout or cli exit.
+        """
+        streams = {self.proc.stdout.fileno(): b'', self.proc.stderr.fileno(): b''}
+        token = marker.encode('ascii')
+        while True:
+            ready = select.select(list(streams), [], [], self.timeout)[0]
+            if not ready:
+                return None
+            for fd in ready:
+                chunk = os.read(fd, 65536)
+                if not chunk:
+                    return None
+                streams[fd] += chunk
+            if any(token in data for data in streams.values()):
+                break
+
+        # The marker is answered only after the command itself, so anything
+        # still pending on the other stream is already sitting in the pipe.
+        while True:
+            ready = select.select(list(streams), [], [], 0)[0]
+            if not ready:
+                break
+            for fd in ready:
+                streams[fd] += os.read(fd, 65536)
+
+        out, err = [
+            b''.join(line for line in streams[stream.fileno()].splitlines(True)
+                     if token not in line).decode('utf-8', 'replace')
+            for stream in (self.proc.stdout, self.proc.stderr)
+        ]
+        return out, err
+
+    def run(self, cli):
+        """
+        Method to execute one command over the session.
+        :param cli: The complete cli string or its already split arguments.
+        :return: Tuple of rc, stdout and stderr like module.run_command(),
+        or None if the session is not usable and the command was not sent.
+        A command sent whose response was lost, to a timeout or the cli
+        exiting, is a failure: it may have run, so it must not be retried.
+        """
+        if self.broken or not self.start():
+            return None
+
+        self._sequence += 1
+        marker = 'pn-session-eoc-%d-%d' % (os.getpid(), self._sequence)
+        command = ' '.join(shell_quote(arg) for arg in split_cli(cli)[1])
+
+        try:
+            self.proc.stdin.write(('%s\n%s\n' % (command, marker)).encode('utf-8'))
+            self.proc.stdin.flush()
+        except (IOError, OSError):
+            # The cli exited before reading the command.
+            self.close()
+            self.broken = True
+            return None
+
+        try:
+            response = self._read_until(marker)
+        except (IOError, OSError):
+            response = None
+
+        if response is None:
+            try:
+                self.proc.kill()
+            except OSError:
+                pass
+            self.close()
+            self.broken = True
+            return 1, '', 'cli session lost waiting for: %s\n' % command
+
+        out, err = response
+        return (1 if err.strip() else 0), out, err
+
+    def close(self):
+        """
+        Method to terminate the cli process.
+        """
+        if self.proc is None:
+            return
+        try:
+            self.proc.stdin.close()
+            self.proc.wait()
+        except (IOError, OSError):
+            self.proc.kill()
+            self.proc.wait()
+        self.proc.stdout.close()
+        self.proc.stderr.close()
+        self.proc = None
+
+
+def cli_session(user=None):
+    """
+    Method to fetch the pooled cli session of a user, creating it on demand.
+    :param user: The 'username:password' string passed with --user.
+    :return: The CliSession object.
+    """
+    sessions = getattr(_CLI_THREAD, 'sessions', _CLI_SESSIONS)
+    if user not in sessions:
+        sessions[user] = CliSession(user)
+    return sessions[user]
+
+
+def close_cli_sessions(sessions=None):
+    """
+    Method to terminate every pooled cli session.
+    :param sessions: The pool to close, the module's pool and the pools of
+    the executor workers by default.
+    """
+    if sessions is None:
+        with _CLI_LOCK:
+            pools, _CLI_WORKER_POOLS[:] = [_CLI_SESSIONS] + _CLI_WORKER_POOLS, []
+        for pool in pools:
+            close_cli_sessions(pool)
+        return
+    for session in sessions.values():
+        session.close()
+    sessions.clear()
+
+
+def take_worker_sessions():
+    """
+    Method to get a session pool for an executor worker thread, one left
+    by the workers of a previous flush if any.
+    :return: Dictionary of cli user to CliSession.
+    """
+    with _CLI_LOCK:
+        return _CLI_WORKER_POOLS.pop() if _CLI_WORKER_POOLS else {}
+
+
+def release_worker_sessions(sessions):
+    """
+    Method to keep the session pool of an executor worker for the next
+    flush, dropping its broken sessions.
+    :param sessions: Dictionary of cli user to CliSession.
+    """
+    for user in [user for user, session in sessions.items() if session.broken]:
+        del sessions[user]
+    with _CLI_LOCK:
+        _CLI_WORKER_POOLS.append(sessions)
+
+
+atexit.register(close_cli_sessions)
+
+
+def cli_verb(args):
+    """
+    Method to find the Netvisor command verb, skipping the switch scope.
+    :param args: The command arguments without the cli launch options.
+    :return: The verb, like vrouter-interface-show.
+    """
+    index = 0
+    while index < len(args):
+        if args[index] == 'switch':
+            index += 2
+        elif args[index] in ('switch-local', 'fabric-local'):
+            index += 1
+        else:
+            return args[index]
+
+    return ''
+
+
+def record_cli_metrics(verb, elapsed, out, err):
+    """
+    Method to account one command in the per verb metrics.
+    :param verb: The Netvisor command verb.
+    :param elapsed: Wall time of the command in seconds.
+    :param out: The command's stdout.
+    :param err: The command's stderr.
+    """
+    with _CLI_LOCK:
+        entry = _CLI_METRICS.get(verb)
+        if entry is None:
+            entry = _CLI_METRICS[verb] = [0, 0.0, 0, 0]
+        entry[0] += 1
+        entry[1] += elapsed
+        entry[2] += len(out or '')
+        if err and err.strip():
+            entry[3] += 1
+
+
+def cli_metrics():
+    """
+    Method to report the metrics of the commands run so far, for the
+    metrics key of the module result.
+    :return: Dict of verb to count, time (seconds), bytes and errors.
+    """
+    return dict(
+        (verb, {
+            'count': count,
+            'time': round(elapsed, 6),
+            'bytes': size,
+            'errors': errors,
+        }) for verb, (count, elapsed, size, errors) in _CLI_METRICS.items()
+    )
+
+
+def run_in_session(module, cli):
+    """
+    Method to execute a cli command over the pooled session of its user,
+    falling back to a one-shot cli process if no session can be used. A
+    command the session sent but got no response for is not run again.
+    Every command is accounted in the per verb metrics.
+    :param module: The Ansible module to fetch input parameters.
+    :param cli: The complete cli string or its already split arguments.
+    :return: Tuple of rc, stdout and stderr like module.run_command().
+    """
+    args = shlex.split(cli) if isinstance(cli, STRING_TYPES) else list(cli)
+    user, command = split_cli(args)
+    verb = cli_verb(command)
+    memo_key = None
+    if is_mutating_verb(verb):
+        with _CLI_LOCK:
+            _CLI_PLAN.append(' '.join(shell_quote(arg) for arg in command))
+        invalidate_shows(verb)
+        if getattr(module, 'check_mode', False):
+            return 0, '', ''
+    elif verb.endswith(('-show', '-info')) and _SHOW_MEMO_STATE['enabled']:
+        memo_key = (user, tuple(command))
+        with _CLI_LOCK:
+            if memo_key in _SHOW_MEMO:
+                return _SHOW_MEMO[memo_key]
+            generation = _SHOW_MEMO_STATE['generation']
+
+    start = time.time()
+    response = cli_session(user).run(args)
+    if response is None:
+        if args and os.path.basename(args[0]) == 'cli':
+            args = [CLI_PATH] + args[1:]
+        with _CLI_FALLBACK_LOCK:
+            response = module.run_command(args)
+
+    record_cli_metrics(verb, time.time() - start, response[1], response[2])
+    if memo_key and not cli_failed(response):
+        with _CLI_LOCK:
+            # Not stored if a mutation was issued while the show ran.
+            if generation == _SHOW_MEMO_STATE['generation']:
+                _SHOW_MEMO[memo_key] = tuple(response)
+    return response
+
+
+def memoize_shows(enabled=True):
+    """
+    Method to turn the memoization of show commands on or off for the rest
+    of the module run; it is off unless the module turns it on. While on,
+    run_in_session() answers a show command already run with the same
+    arguments from memory, until a mutating command touches the object type
+    it shows. Only modules which do not poll the fabric for changes made by
+    others, like link or cluster state, should turn it on.
+    :param enabled: Flag to memoize show commands.
+    """
+    with _CLI_LOCK:
+        _SHOW_MEMO_STATE['enabled'] = enabled
+        _SHOW_MEMO_STATE['generation'] += 1
+        _SHOW_MEMO.clear()
+
+
+def cli_object(verb):
+    """
+    Method to find the object type of a command verb.
+    :param verb: The Netvisor command verb, like vrouter-interface-add.
+    :return: The object type, like vrouter-interface, or None if the verb
+    is not an object action.
+    """
+    for action in ('show',) + CLI_ACTIONS:
+        if verb.endswith('-' + action):
+            return verb[:-len(action) - 1]
+
+    return None
+
+
+def shows_related(changed, shown):
+    """
+    Method to tell if a mutation of an object type may change the output
+    of the shows of another.
+    :param changed: Object type of the mutating command.
+    :param shown: Object type of the show command.
+    :return: True if the show may be changed.
+    """
+    return changed == shown or shown in SHOW_MEMO_RELATED.get(changed, ())
+
+
+def invalidate_shows(verb):
+    """
+    Method to drop the memoized shows, and the tables of the fabric
+    snapshots, a mutating command may change. Verbs which are not object
+    actions, like fabric-join, drop every show and table.
+    :param verb: The mutating command verb.
+    """
+    changed = cli_object(verb)
+    with _CLI_LOCK:
+        _SHOW_MEMO_STATE['generation'] += 1
+        if changed is None or changed.startswith('fabric'):
+            _SHOW_MEMO.clear()
+            for snapshot in _FABRIC_SNAPSHOTS.values():
+                snapshot.invalidate()
+            return
+        for snapshot in _FABRIC_SNAPSHOTS.values():
+            snapshot.invalidate(changed)
+        for key in list(_SHOW_MEMO):
+            shown = cli_object(cli_verb(key[1]))
+            if shown is None or shows_related(changed, shown):
+                del _SHOW_MEMO[key]
+
+
+def is_read_only_verb(verb):
+    """
+    Method to tell if a command verb is known not to change the switch
+    configuration: the show commands and CLI_READ_ONLY_VERBS.
+    :param verb: The Netvisor command verb.
+    :return: True if the verb is read only.
+    """
+    return verb.endswith('-show') or verb in CLI_READ_ONLY_VERBS
+
+
+def is_mutating_verb(verb):
+    """
+    Method to tell if a command verb may change the switch configuration.
+    :param verb: The Netvisor command verb.
+    :return: True unless the verb is known to be read only.
+    """
+    return bool(verb) and not is_read_only_verb(verb)
+
+
+def cli_plan():
+    """
+    Method to report the mutating commands of the module run. In check mode
+    they are the commands the module would run against the existing state,
+    in order and without the cli launch options.
+    :return: List of command strings.
+    """
+    return list(_CLI_PLAN)
+
+
+def apply_cli_plan(module, plan, check=None):
+    """
+    Method to run a plan returned by a check mode run through a CliQueue,
+    without computing the diff against the fabric again.
+    :param module: The Ansible module to fetch input parameters.
+    :param plan: List of command strings as returned by cli_plan().
+    :param check: Optional function(module, cli, out, err) applied to
+    every response.
+    :return: List of results of the commands, in plan order.
+    """
+    cli = pn_cli(module)
+    with CliQueue(module, check=check) as queue:
+        for command in plan:
+            queue.add('%s %s' % (cli, command))
+
+    return queue.results
+
+
+class CliQueue(object):
+    """
+    Queue of mutating cli commands run over the pooled cli session of the
+    module when flushed, i.e. without a cli process launch per command.
+    This is not batching: every command is a round trip of its own, sent
+    after the response of the previous one. The end of command marker is
+    answered on one output stream only, so the output of commands sent
+    ahead could not be told apart. Results are kept in submission order;
+    add() returns the index of the command's result in self.results.
+    """
+
+    def __init__(self, module, check=None):
+        """
+        :param module: The Ansible module to fetch input parameters.
+        :param check: Optional function(module, cli, out, err) applied to
+        every response, typically the module's own output/error handling.
+        """
+        self.module = module
+        self.check = check
+        self.pending = []
+        self.results = []
+
+    def __len__(self):
+        return len(self.pending)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None:
+            self.flush()
+
+    def add(self, cli, callback=None):
+        """
+        Method to queue a command.
+        :param cli: The complete cli string to be executed.
+        :param callback: Optional function receiving the command's result.
+        :return: Index of the command's result in self.results.
+        """
+        index = len(self.results)
+        self.results.append(None)
+        self.pending.append((index, cli, callback))
+
+        return index
+
+    def flush(self):
+        """
+        Method to run every queued command, in order, over the cli session.
+        :return: List of results of the submitted commands.
+        """
+        pending, self.pending = self.pending, []
+        flushed = []
+        for index, cli, callback in pending:
+            args = shlex.split(cli) if isinstance(cli, STRING_TYPES) else list(cli)
+            rc, out, err = run_in_session(self.module, args)
+            if self.check:
+                result = self.check(self.module, args, out, err)
             else:
-                while hostmin <= hostmax:
-                    ips_list.append(hostmin)
-                    hostmin += 1
-                host = hostmax + 2
+                result = (rc, out, err)
+            if callback:
+                result = callback(result)
+            self.results[index] = result
+            flushed.append(result)
 
-            count = host
+        return flushed
 
-        list_index = 0
-        ip_address = str(last_ip[0]) + '.' + str(last_ip[1]) + '.'
-        ip_address += str(third_octet)
-        while list_index < len(ips_list):
-            ip = ip_address + '.' + str(ips_list[list_index]) + "/"
-            ip += supernet_str
-            available_ips.append(ip)
-            list_index += 1
 
-        host, count, hostmax, hostmin = 0, 0, 0, 0
-        third_octet += 1
+def fanout_semaphore(fabric=None):
+    """
+    Method to fetch the semaphore bounding the commands run at the same time
+    on a fabric by the executors of the module.
+    :param fabric: The fabric name, None for the fabric of the local switch.
+    :return: The threading.BoundedSemaphore of the fabric.
+    """
+    with _CLI_LOCK:
+        if fabric not in _FANOUT_SEMAPHORES:
+            _FANOUT_SEMAPHORES[fabric] = threading.BoundedSemaphore(
+                CLI_FANOUT_LIMIT)
+        return _FANOUT_SEMAPHORES[fabric]
 
-    return available_ips
+
+def cli_failed(response):
+    """
+    Method to tell if a cli response is a failure the way the modules'
+    output checks do, i.e. an error without any output.
+    :param response: Tuple of rc, stdout and stderr.
+    :return: True if the command failed.
+    """
+    return not response[1] and bool(response[2] and response[2].strip())
 
 
-def find_network_v6(address, mask):
+class CliExecutor(object):
     """
-    Method to find the network address
-    :param address: The address whose network to be found.
-    :param mask: Subnet mask.
-    :return: The network ip.
+    Pool of worker threads fanning independent cli commands out across
+    switches, each worker over its own cli session. Commands are grouped by
+    the switch they run on; the commands of a switch run in submission
+    order on one worker while the switches run concurrently, bounded by
+    max_workers and by the fabric's semaphore.
+    The responses are checked, and the callbacks run, in the calling thread
+    and in submission order once the commands ran, so a check exiting the
+    module behaves as with serial commands. With fail_fast no command is
+    started once one failed; the results of skipped commands stay None and
+    their indexes are listed in self.skipped. Worker sessions are kept
+    open for the next flush, of this executor or another one.
+    add() returns the index of the command's result in self.results.
     """
-    network = []
-    for i in range(8):
-        network.append(int(address[i], 16) & mask[i])
 
-    return network
+    def __init__(self, module, max_workers=CLI_FANOUT_LIMIT, check=None,
+                 fail_fast=True, fabric=None):
+        """
+        :param module: The Ansible module to fetch input parameters.
+        :param max_workers: Maximum number of worker threads.
+        :param check: Optional function(module, cli, out, err) applied to
+        every response, typically the module's own output/error handling.
+        :param fail_fast: Flag to stop starting commands after a failure.
+        :param fabric: The fabric name the concurrency limit applies to.
+        """
+        self.module = module
+        self.max_workers = max_workers
+        self.check = check
+        self.fail_fast = fail_fast
+        self.semaphore = fanout_semaphore(fabric)
+        self.pending = []
+        self.results = []
+        self.failed = None
+        self.skipped = []
+
+    def __len__(self):
+        return len(self.pending)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None:
+            self.flush()
+
+    def add(self, cli, callback=None, key=None):
+        """
+        Method to queue a command.
+        :param cli: The complete cli string to be executed.
+        :param callback: Optional function receiving the command's result.
+        :param key: Name grouping commands which must run in order, the
+        switch the command is scoped to by default.
+        :return: Index of the command's result in self.results.
+        """
+        args = shlex.split(cli) if isinstance(cli, STRING_TYPES) else list(cli)
+        if key is None:
+            command = split_cli(args)[1]
+            if len(command) > 1 and command[0] == 'switch':
+                key = command[1]
+
+        index = len(self.results)
+        self.results.append(None)
+        self.pending.append((index, args, callback, key))
+
+        return index
+
+    def _run_group(self, group, responses, failed):
+        """
+        Method to run the commands of one switch in order.
+        """
+        for index, args in group:
+            if self.fail_fast and failed.is_set():
+                return
+            with self.semaphore:
+                response = run_in_session(self.module, args)
+            responses[index] = response
+            if cli_failed(response):
+                failed.set()
+
+    def _work(self, groups, responses, failed, errors):
+        """
+        Method run by the worker threads, taking switches off the queue.
+        """
+        _CLI_THREAD.sessions = take_worker_sessions()
+        try:
+            while not (self.fail_fast and failed.is_set()):
+                try:
+                    group = groups.get_nowait()
+                except queue.Empty:
+                    break
+                self._run_group(group, responses, failed)
+        except BaseException as error:
+            errors.append(error)
+            failed.set()
+        finally:
+            release_worker_sessions(_CLI_THREAD.sessions)
+
+    def flush(self):
+        """
+        Method to run every queued command and collect the results.
+        :return: List of results of the commands run, in submission order.
+        """
+        pending, self.pending = self.pending, []
+        groups = {}
+        order = []
+        for index, args, callback, key in pending:
+            if key not in groups:
+                groups[key] = []
+                order.append(key)
+            groups[key].append((index, args))
+
+        responses = {}
+        failed = threading.Event()
+        errors = []
+        workers = min(self.max_workers or 1, len(order))
+        if workers <= 1:
+            for key in order:
+                self._run_group(groups[key], responses, failed)
+        else:
+            work = queue.Queue()
+            for key in order:
+                work.put(groups[key])
+            threads = [threading.Thread(target=self._work,
+                                        args=(work, responses, failed, errors))
+                       for _ in range(workers)]
+            for thread in threads:
+                thread.daemon = True
+                thread.start()
+            for thread in threads:
+                thread.join()
+            if errors:
+                raise errors[0]
+
+        flushed = []
+        for index, args, callback, key in pending:
+            if index not in responses:
+                self.skipped.append(index)
+                continue
+            rc, out, err = responses[index]
+            if cli_failed(responses[index]) and self.failed is None:
+                self.failed = index
+            if self.check:
+                result = self.check(self.module, args, out, err)
+            else:
+                result = (rc, out, err)
+            if callback:
+                result = callback(result)
+            self.results[index] = result
+            flushed.append(result)
+
+        return flushed
+
+
+def record_type(fields, leading=()):
+    """
+    Method to get the record class for a set of show command columns.
+    Hyphens in column names become underscores in attribute names.
+    :param fields: The field names requested with format.
+    :param leading: Names of columns the cli prepends to the requested ones.
+    :return: namedtuple class with the leading columns first.
+    """
+    key = (tuple(leading), tuple(fields))
+    if key not in _RECORD_TYPES:
+        names = [name.replace('-', '_') for name in key[0] + key[1]]
+        _RECORD_TYPES[key] = namedtuple('CliRecord', names)
+    return _RECORD_TYPES[key]
 
 
-def find_broadcast_v6(network, cidr):
+def parsable_records(output, fields, leading=(), delim=','):
     """
-    Method to find the broadcast address
-    :param network: The network ip whose broadcast ip to be found.
-    :param cidr: Subnet mask.
-    :return: The broadcast ip.
+    Generator to parse 'parsable-delim' output of a show command lazily.
+    Each line is split on the delimiter only, so values containing spaces
+    stay intact, and at most as many times as there are columns, so the
+    last column keeps any delimiter in its value, like the comma separated
+    ports of trunk-show. Only the last column may contain the delimiter.
+    Leading columns missing from a line are None.
+    :param output: Output of the show command.
+    :param fields: The field names requested with format.
+    :param leading: Names of columns the cli prepends to the requested ones,
+    such as the vrouter name of vrouter-interface-show.
+    :param delim: The delimiter passed to parsable-delim.
+    :return: Records of the class returned by record_type().
+    :raises ValueError: On a line with fewer columns than requested.
     """
-    broadcast = list(network)
-    broadcast_range = 128 - cidr
-    for i in range(broadcast_range):
-        broadcast[7 - i / 16] += (1 << (i % 16))
+    if not output or output == 'Success':
+        return
 
-    return broadcast
+    make = record_type(fields, leading)._make
+    width = len(fields) + len(leading)
+    padding = (None,) * len(leading)
+    start = 0
+    length = len(output)
+    while start < length:
+        end = output.find('\n', start)
+        if end < 0:
+            end = length
+        line = output[start:end].rstrip('\r')
+        start = end + 1
+        if not line or line == 'Success':
+            continue
+        values = line.split(delim, width - 1)
+        missing = width - len(values)
+        if missing:
+            if missing > len(padding):
+                raise ValueError('expected %d columns (%s) in line: %s' % (
+                    width, ','.join(tuple(leading) + tuple(fields)), line))
+            values = padding[:missing] + tuple(values)
+        yield make(values)
 
 
-def find_mask_v6(cidr):
+def show_records(module, run_cli, cli, fields, leading=(), delim=','):
     """
-    Method to find the subnet mask.
-    :param cidr: Subnet mask.
-    :return: The subnet mask
+    Generator to run a show command with parsable output and parse it.
+    :param module: The Ansible module to fetch input parameters.
+    :param run_cli: The module's run_cli(module, cli) function.
+    :param cli: The show command including pn_cli() prefix and filters.
+    :param fields: The field names to request with format.
+    :param leading: Names of columns the cli prepends to the requested ones.
+    :param delim: The delimiter to request with parsable-delim.
+    :return: Records of the class returned by record_type().
     """
-    mask = [0, 0, 0, 0, 0, 0, 0, 0]
-    for i in range(cidr):
-        mask[i / 16] += (1 << (15 - i % 16))
+    cli += ' format %s parsable-delim %s' % (','.join(fields), delim)
+    return parsable_records(run_cli(module, cli), fields, leading, delim)
+
+
+class FabricSnapshot(object):
+    """
+    Fabric state read once per module run and indexed in memory.
+    Fabric wide tables (vrouters, vrouter interfaces, clusters) are fetched
+    on first use; switch local tables (ports, trunks, lldp, vlans) are
+    fetched once per switch on first use. A snapshot can also be seeded
+    from the facts gathered by pn_fabric_facts.
+    """
+
+    # Values like the ports of trunk-show are comma lists, so the tables
+    # are requested with a delimiter the values do not contain.
+    DELIM = ';'
+    # Table name: (show command, fields, leading columns)
+    FABRIC_TABLES = {
+        'vrouters': ('vrouter-show', ('name', 'location'), ()),
+        'interfaces': ('vrouter-interface-show', ('nic', 'ip', 'l3-port', 'vlan'),
+                       ('vrouter-name',)),
+        'clusters': ('cluster-show', ('name', 'cluster-node-1', 'cluster-node-2'),
+                     ()),
+    }
+    SWITCH_TABLES = {
+        'ports': ('port-show', ('port', 'hostname', 'rport', 'trunk'), ()),
+        'trunks': ('trunk-show', ('name', 'ports'), ()),
+        'lldp': ('lldp-show', ('local-port', 'sys-name', 'port-id'), ()),
+        'vlans': ('vlan-show', ('id',), ()),
+    }
+    # Object type of the rows of every table, see invalidate().
+    TABLE_OBJECTS = {
+        'vrouters': 'vrouter',
+        'interfaces': 'vrouter-interface',
+        'clusters': 'cluster',
+        'ports': 'port',
+        'trunks': 'trunk',
+        'lldp': 'lldp',
+        'vlans': 'vlan',
+    }
+
+    def __init__(self, module, run_cli, cli):
+        """
+        :param module: The Ansible module to fetch input parameters.
+        :param run_cli: The module's run_cli(module, cli) function.
+        :param cli: The cli prefix generated by pn_cli().
+        """
+        self.module = module
+        self.run_cli = run_cli
+        self.cli = cli
+        self.fabric_name = None
+        self._tables = {}
+        self._switches = {}
+        self._indexes = {}
+
+    def _show(self, table, switch=None):
+        if switch:
+            command, fields, leading = self.SWITCH_TABLES[table]
+            cli = self.cli + ' switch %s %s ' % (switch, command)
+        else:
+            command, fields, leading = self.FABRIC_TABLES[table]
+            cli = self.cli + ' %s ' % command
+        return list(show_records(self.module, self.run_cli, cli, fields,
+                                 leading, self.DELIM))
+
+    def _table(self, table):
+        if table not in self._tables:
+            self._tables[table] = self._show(table)
+        return self._tables[table]
+
+    def _index(self, name, build):
+        if name not in self._indexes:
+            self._indexes[name] = build()
+        return self._indexes[name]
+
+    def _load_vrouters(self):
+        def build():
+            rows = self._table('vrouters')
+            return {
+                'by_name': dict((row.name, row) for row in rows),
+                'by_switch': dict((row.location, row.name) for row in rows),
+            }
+        return self._index('vrouters', build)
+
+    def _load_interfaces(self):
+        def build():
+            index = {'by_vrouter': {}, 'by_l3_port': {}, 'by_nic': {},
+                     'by_vlan': {}}
+            for row in self._table('interfaces'):
+                vrouter = row.vrouter_name
+                index['by_vrouter'].setdefault(vrouter, []).append(row)
+                if row.l3_port:
+                    index['by_l3_port'].setdefault(
+                        (vrouter, row.l3_port), []).append(row)
+                index['by_nic'][(vrouter, row.nic)] = row
+                if row.vlan and row.vlan != '0':
+                    index['by_vlan'].setdefault(row.vlan, []).append(row)
+            return index
+        return self._index('interfaces', build)
+
+    def _load_clusters(self):
+        def build():
+            rows = self._table('clusters')
+            by_node = {}
+            for row in rows:
+                by_node[row.cluster_node_1] = row
+                by_node[row.cluster_node_2] = row
+            return {
+                'by_name': dict((row.name, row) for row in rows),
+                'by_node': by_node,
+            }
+        return self._index('clusters', build)
+
+    def _load_switch(self, switch):
+        def build():
+            if switch not in self._switches:
+                self._switches[switch] = dict(
+                    (table, self._show(table, switch))
+                    for table in self.SWITCH_TABLES
+                )
+            tables = self._switches[switch]
+            return {
+                'ports': dict((row.port, row) for row in tables['ports']),
+                'trunks': dict((row.name, row) for row in tables['trunks']),
+                'lldp': tables['lldp'],
+                'vlans': set(row.id for row in tables['vlans']),
+            }
+        return self._index(('switch', switch), build)
+
+    def invalidate(self, changed=None):
+        """
+        Method to drop the tables a mutation of an object type may change,
+        so they are fetched again on next use.
+        :param changed: Object type of the mutating command, None to drop
+        every table.
+        """
+        def stale(table):
+            return changed is None or shows_related(changed,
+                                                    self.TABLE_OBJECTS[table])
 
-    return mask
+        for table in self.FABRIC_TABLES:
+            if stale(table):
+                self._tables.pop(table, None)
+                self._indexes.pop(table, None)
+        if any(stale(table) for table in self.SWITCH_TABLES):
+            self._switches.clear()
+            for name in list(self._indexes):
+                if isinstance(name, tuple):
+                    del self._indexes[name]
 
+    def load(self, switches=()):
+        """
+        Method to fetch every fabric wide table and the switch local tables
+        of the given switches.
+        :param switches: Names of the switches to fetch local tables for.
+        """
+        for table in self.FABRIC_TABLES:
+            self._table(table)
+        for switch in switches:
+            self._load_switch(switch)
 
-def find_network_supernet_v6(broadcast, cidr, supernet):
+    def to_facts(self):
+        """
+        Method to serialize the tables fetched so far.
+        :return: Dictionary of JSON serializable table rows.
+        """
+        facts = dict((table, [list(row) for row in rows])
+                     for table, rows in self._tables.items())
+        facts['switches'] = dict(
+            (switch, dict((table, [list(row) for row in rows])
+                          for table, rows in tables.items()))
+            for switch, tables in self._switches.items()
+        )
+        return facts
+
+    def seed(self, facts):
+        """
+        Method to load tables from facts produced by to_facts().
+        Tables missing from the facts are still fetched on first use.
+        :param facts: Dictionary of table rows.
+        """
+        for table, (command, fields, leading) in self.FABRIC_TABLES.items():
+            if table in facts:
+                make = record_type(fields, leading)._make
+                self._tables[table] = [make(row) for row in facts[table]]
+                self._indexes.pop(table, None)
+        for switch, tables in facts.get('switches', {}).items():
+            if set(tables) >= set(self.SWITCH_TABLES):
+                self._switches[switch] = dict(
+                    (table, [record_type(fields, leading)._make(row)
+                             for row in tables[table]])
+                    for table, (command, fields, leading)
+                    in self.SWITCH_TABLES.items()
+                )
+                self._indexes.pop(('switch', switch), None)
+
+    def vrouter_names(self):
+        """
+        :return: List of names of every vrouter in the fabric.
+        """
+        return list(self._load_vrouters()['by_name'])
+
+    def vrouter(self, switch):
+        """
+        :param switch: Name of the switch.
+        :return: Name of the vrouter located on the switch, or None.
+        """
+        return self._load_vrouters()['by_switch'].get(switch)
+
+    def vrouter_location(self, vrouter):
+        """
+        :param vrouter: Name of the vrouter.
+        :return: Name of the switch hosting the vrouter, or None.
+        """
+        row = self._load_vrouters()['by_name'].get(vrouter)
+        return row.location if row else None
+
+    def interfaces(self, vrouter, l3_port=None):
+        """
+        :param vrouter: Name of the vrouter.
+        :param l3_port: Optional l3-port to restrict the interfaces to.
+        :return: List of vrouter interface rows.
+        """
+        index = self._load_interfaces()
+        if l3_port is not None:
+            return index['by_l3_port'].get((vrouter, l3_port), [])
+        return index['by_vrouter'].get(vrouter, [])
+
+    def l3_ports(self, vrouter):
+        """
+        :param vrouter: Name of the vrouter.
+        :return: List of l3-ports having an interface on the vrouter.
+        """
+        return sorted(set(port for vr, port in self._load_interfaces()['by_l3_port']
+                          if vr == vrouter))
+
+    def interface_by_nic(self, vrouter, nic):
+        """
+        :param vrouter: Name of the vrouter.
+        :param nic: Name of the interface nic.
+        :return: The vrouter interface row, or None.
+        """
+        return self._load_interfaces()['by_nic'].get((vrouter, nic))
+
+    def interfaces_on_vlan(self, vlan):
+        """
+        :param vlan: The vlan id.
+        :return: List of vrouter interface rows on the vlan.
+        """
+        return self._load_interfaces()['by_vlan'].get(str(vlan), [])
+
+    def cluster_names(self):
+        """
+        :return: List of names of every cluster in the fabric.
+        """
+        return list(self._load_clusters()['by_name'])
+
+    def cluster(self, switch):
+        """
+        :param switch: Name of the switch.
+        :return: The cluster row the switch is a node of, or None.
+        """
+        return self._load_clusters()['by_node'].get(switch)
+
+    def port(self, switch, port):
+        """
+        :param switch: Name of the switch.
+        :param port: The port number.
+        :return: The port-show row of the port, or None.
+        """
+        return self._load_switch(switch)['ports'].get(str(port))
+
+    def ports_to(self, switch, hostname):
+        """
+        :param switch: Name of the switch.
+        :param hostname: Name of the connected switch.
+        :return: List of ports of the switch connected to hostname.
+        """
+        return [port for port, row in self._load_switch(switch)['ports'].items()
+                if row.hostname == hostname]
+
+    def trunk(self, switch, name):
+        """
+        :param switch: Name of the switch.
+        :param name: Name of the trunk.
+        :return: The trunk-show row, or None.
+        """
+        return self._load_switch(switch)['trunks'].get(name)
+
+    def lldp(self, switch):
+        """
+        :param switch: Name of the switch.
+        :return: List of lldp neighbor rows of the switch.
+        """
+        return self._load_switch(switch)['lldp']
+
+    def vlans(self, switch):
+        """
+        :param switch: Name of the switch.
+        :return: Set of vlan ids present on the switch.
+        """
+        return self._load_switch(switch)['vlans']
+
+
+def fabric_generation(module, run_cli, cli):
+    """
+    Method to find the fabric name and its configuration generation.
+    :param module: The Ansible module to fetch input parameters.
+    :param run_cli: The module's run_cli(module, cli) function.
+    :param cli: The cli prefix generated by pn_cli().
+    :return: Tuple of fabric name and the highest fabric transaction id.
+    """
+    name, generation = None, -1
+    for node in show_records(module, run_cli, cli + ' fabric-node-show ',
+                             ('fab-name', 'fab-tid')):
+        name = node.fab_name
+        if node.fab_tid and node.fab_tid.isdigit():
+            generation = max(generation, int(node.fab_tid))
+
+    return name, generation
+
+
+class FabricFactCache(object):
+    """
+    On-disk JSON cache of fabric facts, one file per fabric name and
+    configuration generation.
+    """
+
+    def __init__(self, path=FABRIC_FACTS_CACHE_DIR, ttl=FABRIC_FACTS_TTL):
+        self.path = path
+        self.ttl = ttl
+
+    def _file(self, name, generation):
+        return os.path.join(self.path, '%s_%s.json' % (name, generation))
+
+    def fresh(self, facts, name, generation):
+        """
+        Method to check whether facts still describe the fabric.
+        :param facts: Facts returned by pn_fabric_facts.
+        :param name: Current fabric name.
+        :param generation: Current fabric configuration generation.
+        :return: True if the facts match the fabric and are within the TTL.
+        """
+        return bool(facts) and facts.get('name') == name and \
+            facts.get('generation') == generation and \
+            time.time() - facts.get('gathered', 0) < self.ttl
+
+    def get(self, name, generation):
+        """
+        Method to read cached facts.
+        :param name: Current fabric name.
+        :param generation: Current fabric configuration generation.
+        :return: The cached facts, or None if missing or expired.
+        """
+        try:
+            with open(self._file(name, generation)) as cache_file:
+                facts = json.load(cache_file)
+        except (IOError, OSError, ValueError):
+            return None
+
+        return facts if self.fresh(facts, name, generation) else None
+
+    def put(self, facts):
+        """
+        Method to store facts, replacing older generations of the fabric.
+        :param facts: Facts returned by pn_fabric_facts.
+        """
+        self.invalidate(facts['name'])
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        path = self._file(facts['name'], facts['generation'])
+        with open(path + '.tmp', 'w') as cache_file:
+            json.dump(facts, cache_file, separators=(',', ':'))
+        os.rename(path + '.tmp', path)
+
+    def invalidate(self, name=None):
+        """
+        Method to drop cached facts.
+        :param name: Fabric name whose facts are dropped; all if None.
+        """
+        if not os.path.isdir(self.path):
+            return
+        for entry in os.listdir(self.path):
+            if name is None or entry.rsplit('_', 1)[0] == name:
+                try:
+                    os.remove(os.path.join(self.path, entry))
+                except OSError:
+                    pass
+
+
+def fabric_snapshot(module, run_cli, cli):
+    """
+    Method to get the FabricSnapshot of a module run, seeded from the
+    pn_fabric_facts module parameter or the on-disk cache when those still
+    match the fabric configuration generation.
+    :param module: The Ansible module to fetch input parameters.
+    :param run_cli: The module's run_cli(module, cli) function.
+    :param cli: The cli prefix generated by pn_cli().
+    :return: The FabricSnapshot object, shared by every caller in the run.
+    Mutating commands run through run_in_session() drop the tables they
+    may change, see invalidate_shows().
+    """
+    if cli in _FABRIC_SNAPSHOTS:
+        return _FABRIC_SNAPSHOTS[cli]
+
+    snapshot = FabricSnapshot(module, run_cli, cli)
+    facts = module.params.get('pn_fabric_facts')
+    cache = FabricFactCache(ttl=(facts or {}).get('ttl', FABRIC_FACTS_TTL))
+    name, generation = fabric_generation(module, run_cli, cli)
+    snapshot.fabric_name = name
+    if not cache.fresh(facts, name, generation):
+        facts = cache.get(name, generation)
+    if facts:
+        snapshot.seed(facts['tables'])
+
+    _FABRIC_SNAPSHOTS[cli] = snapshot
+    return snapshot
+
+
+def invalidate_fabric_facts(module, run_cli, cli):
+    """
+    Method to drop cached fabric facts after the fabric got modified.
+    :param module: The Ansible module to fetch input parameters.
+    :param run_cli: The module's run_cli(module, cli) function.
+    :param cli: The cli prefix generated by pn_cli().
     """
-    Method to find the subnet address
-    :param broadcast: The next subnet to be found after the broadcast ip.
-    :param cidr: Subnet mask.
-    :param supernet: Supernet mask.
-    :return: The next subnet after the broadcast ip.
+    if getattr(module, 'check_mode', False):
+        return
+    _FABRIC_SNAPSHOTS.pop(cli, None)
+    FabricFactCache().invalidate(fabric_generation(module, run_cli, cli)[0])
+
+
+def count_spine_links(module, run_cli, cli, leaf, spine_list):
+    """
+    Method to count the ports of a leaf connected to the spines, the way
+    the link ips of the leafs are numbered.
+    :param module: The Ansible module to fetch input parameters.
+    :param run_cli: The module's run_cli(module, cli) function.
+    :param cli: The cli prefix generated by pn_cli().
+    :param leaf: Name of the leaf.
+    :param spine_list: The list of all spines.
+    :return: Number of port-show rows of the leaf with a spine as hostname.
+    """
+    cli += ' switch %s port-show hostname %s count-output | grep Count' % (
+        leaf, ','.join(spine_list))
+    return int(run_cli(module, cli).split(':')[1].strip())
+
+
+def ipv4_to_int(address_str):
+    """
+    Method to convert a dotted IPv4 address to an integer.
+    :param address_str: The address, with or without a /mask.
+    :return: The address as an integer.
+    """
+    octets = address_str.split('/')[0].strip().split('.')
+    if len(octets) != 4:
+        raise ValueError('invalid ipv4 address %s' % address_str)
+    value = 0
+    for octet in octets:
+        octet = int(octet)
+        if not 0 <= octet <= 255:
+            raise ValueError('invalid ipv4 address %s' % address_str)
+        value = (value << 8) | octet
+    return value
+
+
+def int_to_ipv4(value):
+    """
+    Method to convert an integer to a dotted IPv4 address.
+    :param value: The address as an integer.
+    :return: The dotted address.
+    """
+    return '%d.%d.%d.%d' % (value >> 24, (value >> 16) & 255,
+                            (value >> 8) & 255, value & 255)
+
+
+def ipv6_to_int(address_str):
+    """
+    Method to convert an IPv6 address to an integer.
+    :param address_str: The address, with or without a /mask.
+    :return: The address as an integer.
+    """
+    address = address_str.split('/')[0].strip()
+    if '::' in address:
+        head, tail = address.split('::', 1)
+        head = head.split(':') if head else []
+        tail = tail.split(':') if tail else []
+        groups = head + ['0'] * (8 - len(head) - len(tail)) + tail
+    else:
+        groups = address.split(':')
+    if len(groups) != 8:
+        raise ValueError('invalid ipv6 address %s' % address_str)
+    value = 0
+    for group in groups:
+        group = int(group, 16)
+        if not 0 <= group <= 0xffff:
+            raise ValueError('invalid ipv6 address %s' % address_str)
+        value = (value << 16) | group
+    return value
+
+
+def int_to_ipv6(value):
+    """
+    Method to convert an integer to an IPv6 address, every group written
+    out as the link addresses always were.
+    :param value: The address as an integer.
+    :return: The address.
+    """
+    return ':'.join('%x' % ((value >> shift) & 0xffff)
+                    for shift in range(112, -16, -16))
+
+
+# Base of the abstract classes, python 2 and 3 declare the metaclass
+# differently.
+_AbstractBase = abc.ABCMeta('_AbstractBase', (object,), {})
+
+
+class LinkAllocator(_AbstractBase):
+    """
+    Lazy allocator of the link subnets of a range. The n-th link is
+    computed from its number, so the allocator holds no list and seeks to
+    any link in constant time. A link of two addresses uses both of them,
+    larger links their first two host addresses.
     """
-    host_bit = ''
-    for j in range(128-supernet):
-        host_bit += '0'
 
-    subnet_network_bit = []
-    for j in range((supernet/16) + 1):
-        subnet_network_bit.append(str(bin(broadcast[j])[2:]).rjust(16, '0'))
-    subnet_network_bit = ''.join(subnet_network_bit)
+    bits = 0
+
+    def __init__(self, first, broadcast, subnet):
+        """
+        :param first: Network address of the first link.
+        :param broadcast: Last address of the range.
+        :param subnet: Mask of the links.
+        """
+        self.subnet = subnet
+        self.size = 1 << (self.bits - subnet)
+        self.first = first
+        self.count = (broadcast + 1 - first) // self.size
+        self.host = 0 if subnet == self.bits - 1 else 1
+        self.position = 0
+
+    @abc.abstractmethod
+    def address(self, value):
+        """
+        Method to format an address of the range.
+        :param value: The address as an integer.
+        :return: The address string.
+        """
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return self
+
+    def _check(self, number):
+        if not 0 <= number < self.count:
+            raise IndexError('ipv%d link range exhausted' % (
+                4 if self.bits == 32 else 6))
 
-    network_bit = subnet_network_bit[:cidr]
+    def link(self, number):
+        """
+        Method to compute a link without moving the allocator.
+        :param number: Number of the link in the range.
+        :return: Tuple of the two link addresses with their mask.
+        """
+        self._check(number)
+        base = self.first + number * self.size + self.host
+        return ('%s/%d' % (self.address(base), self.subnet),
+                '%s/%d' % (self.address(base + 1), self.subnet))
 
-    subnet_bit = subnet_network_bit[cidr:supernet]
-    subnet_bit = bin(int(subnet_bit, 2) + 1)[2:].rjust(supernet - cidr, '0')
+    def seek(self, number):
+        """
+        Method to move the allocator to a link.
+        :param number: Number of the next link to return.
+        :return: The allocator.
+        """
+        self.position = number
+        return self
+
+    def next(self):
+        if self.position >= self.count:
+            raise StopIteration
+        self.position += 1
+        return self.link(self.position - 1)
+
+    __next__ = next
+
+    def take(self, count):
+        """
+        Method to return the next links.
+        :param count: Number of links to return.
+        :return: List of up to count link address tuples.
+        """
+        count = max(min(count, self.count - self.position), 0)
+        links = [self.link(self.position + i) for i in range(count)]
+        self.position += count
+        return links
+
+    def addresses(self, number, first=None, count=None):
+        """
+        Method to list addresses of a link subnet.
+        :param number: Number of the link in the range.
+        :param first: Offset of the first address, the first host address
+        by default.
+        :param count: Number of addresses, up to the last host address by
+        default.
+        :return: List of the addresses with their mask.
+        """
+        self._check(number)
+        if first is None:
+            first = self.host
+        if count is None:
+            count = self.size - 2 * self.host
+        base = self.first + number * self.size
+        return ['%s/%d' % (self.address(base + offset), self.subnet)
+                for offset in range(first, min(first + count, self.size))]
+
+
+class Ipv4LinkAllocator(LinkAllocator):
+    """
+    Allocator of the IPv4 link subnets of a range of any mask.
+
+        links = Ipv4LinkAllocator('10.0.0.0', '8', '31').seek(count_output)
+        spine_ip, leaf_ip = next(links)
+
+    The links are numbered from the one holding the last octet of the
+    address, as calculate_link_ip_addresses_ipv4 always numbered them.
+    """
 
-    final_subnet_binary = network_bit + subnet_bit + host_bit
-    final_subnet = []
-    temp1 = ''
-    for k in range(32):
-        temp = final_subnet_binary[(4 * k):(4 * (k+1))]
-        temp1 += hex(int(temp, 2))[2:]
+    bits = 32
 
-        if (k % 4) == 3:
-            final_subnet.append(int(temp1, 16))
-            temp1 = ''
+    def __init__(self, address_str, cidr_str, subnet_str):
+        cidr = int(cidr_str)
+        subnet = int(subnet_str)
+        if not 0 <= cidr <= subnet <= 31:
+            raise ValueError('invalid ipv4 link subnet /%s in /%s range' % (
+                subnet_str, cidr_str))
+        address = ipv4_to_int(address_str)
+        size = 1 << (32 - subnet)
+        network = address & ~((1 << (32 - cidr)) - 1) & 0xffffffff
+        broadcast = network | ((1 << (32 - cidr)) - 1)
+        # Only the last octet of the address moves the first link, within
+        # the first /24 of the range.
+        first = max(network, (network & ~255) | (address & 255 & ~(size - 1)))
+        LinkAllocator.__init__(self, first, broadcast, subnet)
 
-    return final_subnet
+    def address(self, value):
+        return int_to_ipv4(value)
+
+
+class Ipv6LinkAllocator(LinkAllocator):
+    """
+    Allocator of the IPv6 link subnets of a range, on 128 bit integers.
+
+        links = Ipv6LinkAllocator('2001:db8::', '64', '127').seek(500)
+        spine_ip, leaf_ip = next(links)
+
+    The links are numbered from the one holding the address. A /127 link
+    uses both of its addresses and a /126 link its first two host
+    addresses, as auto_configure_link_ips picked them from the lists of
+    calculate_link_ip_addresses_ipv6.
+    """
+
+    bits = 128
+
+    def __init__(self, address_str, cidr_str, subnet_str):
+        cidr = int(cidr_str)
+        subnet = int(subnet_str)
+        if not 0 <= cidr <= subnet <= 127:
+            raise ValueError('invalid ipv6 link subnet /%s in /%s range' % (
+                subnet_str, cidr_str))
+        address = ipv6_to_int(address_str)
+        network = address >> (128 - cidr) << (128 - cidr)
+        broadcast = network | ((1 << (128 - cidr)) - 1)
+        first = address >> (128 - subnet) << (128 - subnet)
+        LinkAllocator.__init__(self, first, broadcast, subnet)
+
+    def __len__(self):
+        # len() is limited to sys.maxsize, use count for wide ranges.
+        return int(min(self.count, sys.maxsize))
+
+    def address(self, value):
+        return int_to_ipv6(value)
+
+
+def calculate_link_ip_addresses_ipv4(address_str, cidr_str, supernet_str):
+    """
+    Method to calculate link IPs for layer 3 fabric.
+    :param address_str: Host/network address.
+    :param cidr_str: Subnet mask.
+    :param supernet_str: Supernet mask.
+    :return: List of available IP addresses that can be assigned to vrouter
+    interfaces for layer 3 fabric.
+    """
+    links = Ipv4LinkAllocator(address_str, cidr_str, supernet_str)
+    available_ips = []
+    for number in range(len(links)):
+        available_ips.extend(links.addresses(number))
+
+    return available_ips
 
 
 def calculate_link_ip_addresses_ipv6(address_str, cidr_str, supernet_str, ip_count):
@@ -178,58 +1556,441 @@ def calculate_link_ip_addresses_ipv6(address_str, cidr_str, supernet_str, ip_cou
     :return: List of available IP addresses that can be assigned to vrouter
     interfaces for layer 3 fabric.
     """
-    if '::' in address_str:
-        add_str = ''
-        count = (address_str.count(':'))
-        if address_str[-1] == ':':
-            count -= 2
-            while count < 7:
-                add_str += ':0'
-                count += 1
+    links = Ipv6LinkAllocator(address_str, cidr_str, supernet_str)
+    number = 0
+    while number < links.count:
+        yield links.addresses(number, 0, ip_count)
+        number += 1
+
+
+def add_to_ipv6_last_group(address_str, count):
+    """
+    Method to add to the last group of an IPv6 address, keeping the way
+    the address is written, as the loopback and mgmt ipv6 are numbered.
+    :param address_str: The address, without mask.
+    :param count: Number to add.
+    :return: The address.
+    """
+    groups = address_str.split(':')
+    if not groups[-1]:
+        groups[-1] = '0'
+    groups[-1] = '%x' % (int(groups[-1], 16) + count)
+    return ':'.join(groups)
+
+
+class FabricAddressPlan(object):
+    """
+    Addresses of every switch of the fabric, computed in one pass from the
+    spine and leaf lists and the address ranges, as the ZTP modules number
+    them: loopback ip (also the router id), loopback ipv6, in-band ip,
+    mgmt ipv6 and the first link number of every leaf, plus the iOSPF link
+    addresses of every cluster number. The plan is returned by the
+    pn_address_plan module as a compact table, which the ZTP modules read
+    through address_plan() instead of redoing the math on every switch.
+
+    Ranges are given as strings, the link and iOSPF ranges as lists of
+    address, range mask and link mask. Unset ranges leave their column
+    empty.
+    """
+
+    COLUMNS = ('switch', 'role', 'loopback_ip', 'loopback_ipv6', 'inband_ip',
+               'mgmt_ipv6', 'first_link', 'links')
+    RANGES = ('loopback_ip', 'loopback_ipv6', 'inband_ip', 'mgmt_ipv6',
+              'link_ipv4', 'link_ipv6', 'iospf_ipv4', 'iospf_ipv6')
+    TABLE_VERSION = 1
+
+    def __init__(self, spines, leafs, ranges, leaf_links=None):
+        """
+        :param spines: List of spine names.
+        :param leafs: List of leaf names.
+        :param ranges: Dictionary of the ranges, keyed by RANGES names.
+        :param leaf_links: Optional dictionary of the number of spine links
+        of every leaf, to number the first link of every leaf.
+        """
+        self.spines = [spine.strip() for spine in spines or []]
+        self.leafs = [leaf.strip() for leaf in leafs or []]
+        self.ranges = self.normalize(ranges)
+        self.rows = []
+        self.iospf_rows = []
+        self._build(leaf_links)
+        self._index()
+
+    @classmethod
+    def normalize(cls, ranges):
+        """
+        Method to put ranges in their serialized form.
+        :param ranges: Dictionary of the ranges.
+        :return: Dictionary of every range, None when unset.
+        """
+        normal = {}
+        for key in cls.RANGES:
+            value = ranges.get(key)
+            if isinstance(value, (list, tuple)):
+                value = [str(part) for part in value]
+                if not value[0] or None in ranges.get(key):
+                    value = None
+            elif value:
+                value = str(value)
+            normal[key] = value or None
+        return normal
+
+    def _build(self, leaf_links):
+        ranges = self.ranges
+        switches = self.spines + self.leafs
+
+        loopback = loopback_v6 = inband = inband_mask = mgmt_v6 = None
+        if ranges['loopback_ip']:
+            loopback = ipv4_to_int(ranges['loopback_ip'])
+        if ranges['loopback_ipv6']:
+            loopback_v6 = ranges['loopback_ipv6'].split('/')[0]
+        if ranges['inband_ip']:
+            inband = ipv4_to_int(ranges['inband_ip'])
+            inband_mask = ranges['inband_ip'].split('/')[1]
+        if ranges['mgmt_ipv6']:
+            mgmt_v6, mgmt_mask = ranges['mgmt_ipv6'].split('/')
+
+        first_link = 0
+        for count, switch in enumerate(switches):
+            role = 'spine' if count < len(self.spines) else 'leaf'
+            # mgmt ipv6 numbers the leafs after two spines.
+            mgmt_count = count if role == 'spine' else (
+                count - len(self.spines) + 2)
+            row = [switch, role, None, None, None, None, None, None]
+            if loopback is not None:
+                row[2] = int_to_ipv4(loopback + count)
+            if loopback_v6 is not None:
+                row[3] = add_to_ipv6_last_group(loopback_v6, count)
+            if inband is not None:
+                row[4] = '%s/%s' % (int_to_ipv4(inband + count), inband_mask)
+            if mgmt_v6 is not None:
+                row[5] = '%s/%s' % (add_to_ipv6_last_group(mgmt_v6, mgmt_count),
+                                    mgmt_mask)
+            if role == 'leaf' and leaf_links is not None:
+                links = int(leaf_links.get(switch, 0))
+                row[6], row[7] = first_link, links
+                first_link += links
+            self.rows.append(row)
+
+        v4 = self.allocator('iospf_ipv4')
+        v6 = self.allocator('iospf_ipv6')
+        for number in range(len(switches) // 2):
+            self.iospf_rows.append(self._iospf_row(number, v4, v6))
+
+    @staticmethod
+    def _iospf_row(number, v4, v6):
+        # Every cluster number gets the next two iOSPF addresses, in the
+        # order calculate_link_ip_addresses_ipv4 listed them, and the next
+        # ipv6 link.
+        row = [None, None, None, None]
+        if v4 is not None:
+            per_link = v4.size - 2 * v4.host
+            first = 2 * number
+            if first + 1 < per_link * v4.count:
+                row[0], row[1] = [
+                    v4.addresses(host // per_link, v4.host + host % per_link,
+                                 1)[0]
+                    for host in (first, first + 1)]
+        if v6 is not None and number < v6.count:
+            row[2], row[3] = v6.link(number)
+        return row
+
+    def _index(self):
+        self.by_switch = dict((row[0], row) for row in self.rows)
+
+    def allocator(self, name):
+        """
+        Method to get the link allocator of a link range.
+        :param name: link_ipv4, link_ipv6, iospf_ipv4 or iospf_ipv6.
+        :return: A new LinkAllocator, or None if the range is unset.
+        """
+        value = self.ranges.get(name)
+        if not value:
+            return None
+        if name.endswith('ipv4'):
+            return Ipv4LinkAllocator(*value)
+        return Ipv6LinkAllocator(*value)
+
+    def covers(self, spines, leafs, ranges):
+        """
+        Method to check the plan was computed for the given switches and
+        ranges.
+        :param spines: List of spine names.
+        :param leafs: List of leaf names.
+        :param ranges: Dictionary of the ranges the caller uses.
+        :return: True if the plan can be used.
+        """
+        if ([spine.strip() for spine in spines or []] != self.spines or
+                [leaf.strip() for leaf in leafs or []] != self.leafs):
+            return False
+        normal = self.normalize(ranges)
+        return all(self.ranges[key] == normal[key] for key in ranges)
+
+    def switch(self, name):
+        """
+        :param name: Name of the switch.
+        :return: Dictionary of the addresses of the switch, or None.
+        """
+        row = self.by_switch.get(name.strip())
+        return dict(zip(self.COLUMNS, row)) if row else None
+
+    def router_id(self, name):
+        """
+        :param name: Name of the switch.
+        :return: The router id of the switch vrouter, or None.
+        """
+        row = self.by_switch.get(name.strip())
+        return row[2] if row else None
+
+    def first_link(self, leaf):
+        """
+        :param leaf: Name of the leaf.
+        :return: Number of the first link of the leaf, or None if the link
+        counts were not given.
+        """
+        row = self.by_switch.get(leaf.strip())
+        return row[6] if row else None
+
+    def iospf(self, number):
+        """
+        :param number: Number of the cluster.
+        :return: Tuple of the ipv4 and ipv6 address pairs of the cluster,
+        None for the unset ranges.
+        """
+        if 0 <= number < len(self.iospf_rows):
+            row = self.iospf_rows[number]
         else:
-            while count < 8:
-                add_str += ':0'
-                count += 1
-            add_str += ':'
-
-        address_str = address_str.replace('::', add_str)
-
-    address = address_str.split(':')
-    cidr = int(cidr_str)
-    supernet = int(supernet_str)
-
-    mask_cidr = find_mask_v6(cidr)
-    network = find_network_v6(address, mask_cidr)
-    broadcast = find_broadcast_v6(network, cidr)
-
-    mask_supernet = find_mask_v6(supernet)
-    network_hex = []
-    for i in range(8):
-        network_hex.append(hex(network[i])[2:])
-    network_supernet = find_network_v6(address, mask_supernet)
-    broadcast_supernet = find_broadcast_v6(network_supernet, supernet)
-
-    initial_ip = network_supernet[7]
-    ip_checking = list(network_supernet)
-    while not(initial_ip >= broadcast[7] and ip_checking[:7] == broadcast[:7]):
-        initial_ip = network_supernet[7]
-        ips_list = []
-        no_of_ip = 0
-        while initial_ip <= broadcast_supernet[7] and no_of_ip < ip_count:
-            ip = list(network_supernet)
-            ip[7] = initial_ip
-
-            for i in range(0, 8):
-                ip[i] = hex(ip[i])[2:]
-
-            ip = ':'.join(ip)
-            ip += '/' + str(supernet)
-            ips_list.append(ip)
-            initial_ip += 1
-            no_of_ip += 1
-            ip_checking = list(broadcast_supernet)
-        initial_ip = broadcast_supernet[7]
-        network_supernet = find_network_supernet_v6(broadcast_supernet, cidr, supernet)
-        broadcast_supernet = find_broadcast_v6(network_supernet, supernet)
-
-        yield ips_list
+            # More clusters than switch pairs in the lists.
+            row = self._iospf_row(number, self.allocator('iospf_ipv4'),
+                                  self.allocator('iospf_ipv6'))
+        return (tuple(row[:2]) if row[0] else None,
+                tuple(row[2:]) if row[2] else None)
+
+    def to_table(self):
+        """
+        Method to serialize the plan.
+        :return: Dictionary of JSON serializable lists.
+        """
+        return {
+            'version': self.TABLE_VERSION,
+            'spines': self.spines,
+            'leafs': self.leafs,
+            'ranges': self.ranges,
+            'columns': list(self.COLUMNS),
+            'rows': self.rows,
+            'iospf': self.iospf_rows,
+        }
+
+    @classmethod
+    def from_table(cls, table):
+        """
+        Method to load a plan serialized by to_table(), without computing
+        it again.
+        :param table: Dictionary returned by to_table().
+        :return: The FabricAddressPlan, or None if the table is not usable.
+        """
+        if not table or table.get('version') != cls.TABLE_VERSION or \
+                list(table.get('columns', ())) != list(cls.COLUMNS):
+            return None
+        plan = cls.__new__(cls)
+        plan.spines = list(table['spines'])
+        plan.leafs = list(table['leafs'])
+        plan.ranges = cls.normalize(table['ranges'])
+        plan.rows = [list(row) for row in table['rows']]
+        plan.iospf_rows = [list(row) for row in table['iospf']]
+        plan._index()
+        return plan
+
+
+def address_plan(module, ranges):
+    """
+    Method to get the FabricAddressPlan of a module run, from the
+    pn_address_plan module parameter when it was computed for the same
+    switches and ranges, otherwise computed for the ranges given.
+    :param module: The Ansible module to fetch input parameters.
+    :param ranges: Dictionary of the ranges the module uses.
+    :return: The FabricAddressPlan object.
+    """
+    spines = module.params.get('pn_spine_list') or []
+    leafs = module.params.get('pn_leaf_list') or []
+    plan = FabricAddressPlan.from_table(module.params.get('pn_address_plan'))
+    if plan is None or not plan.covers(spines, leafs, ranges):
+        plan = FabricAddressPlan(spines, leafs, ranges)
+    return plan
+
+
+def prefix_interval(prefix):
+    """
+    Method to get the addresses a prefix covers.
+    :param prefix: IPv4 or IPv6 address with a /mask, host bits allowed.
+    :return: Tuple of the family, first and last address as integers.
+    """
+    if '/' not in prefix:
+        raise ValueError('invalid prefix %s' % prefix)
+    address, mask = prefix.strip().split('/', 1)
+    if ':' in address:
+        family, bits, value = 'ipv6', 128, ipv6_to_int(address)
+    else:
+        family, bits, value = 'ipv4', 32, ipv4_to_int(address)
+    mask = int(mask)
+    if not 0 <= mask <= bits:
+        raise ValueError('invalid prefix %s' % prefix)
+    size = 1 << (bits - mask)
+    first = value & ~(size - 1)
+    return family, first, first + size - 1
+
+
+class PrefixIndex(object):
+    """
+    Interval tree of the address ranges configured on the fabric, the
+    subnets of the csv files and the ranges of the module parameters, to
+    find the ranges that overlap. Entries are kept per family sorted by
+    first address, the tree being implicit in the sorted list: the middle
+    entry of every slice is a node, annotated with the highest last address
+    of its slice. Building it is O(n log n), finding the entries that
+    overlap a range O(log n + k) and listing every overlap O(n log n + k).
+
+    An entry is a tuple of the first and last address as integers, the
+    range as written and the source it was read from, e.g. a csv line.
+    """
+
+    def __init__(self):
+        self.entries = {'ipv4': [], 'ipv6': []}
+        self.trees = {}
+
+    def __len__(self):
+        return sum(len(entries) for entries in self.entries.values())
+
+    def add(self, prefix, source):
+        """
+        Method to add a prefix.
+        :param prefix: IPv4 or IPv6 address with a /mask.
+        :param source: Where the prefix was read from.
+        """
+        family, first, last = prefix_interval(prefix)
+        self.add_range(family, first, last, prefix, source)
+
+    def add_range(self, family, first, last, label, source):
+        """
+        Method to add a range of addresses that is not a single prefix.
+        :param family: ipv4 or ipv6.
+        :param first: First address as an integer.
+        :param last: Last address as an integer.
+        :param label: The range as written.
+        :param source: Where the range was read from.
+        """
+        self.entries[family].append((first, last, label, source))
+        self.trees.pop(family, None)
+
+    def add_plan(self, plan):
+        """
+        Method to add the ranges a FabricAddressPlan assigns addresses from:
+        the link and iOSPF pools, the span of the loopbacks and the subnets
+        spanned by the in-band and mgmt ipv6 addresses.
+        :param plan: The FabricAddressPlan object.
+        """
+        for name in ('link_ipv4', 'link_ipv6', 'iospf_ipv4', 'iospf_ipv6'):
+            links = plan.allocator(name)
+            if links is None or not links.count:
+                continue
+            family = 'ipv4' if name.endswith('ipv4') else 'ipv6'
+            self.add_range(family, links.first,
+                           links.first + links.count * links.size - 1,
+                           '%s/%s' % tuple(plan.ranges[name][:2]), name)
+
+        for column, name in ((2, 'loopback_ip'), (3, 'loopback_ipv6'),
+                             (4, 'inband_ip'), (5, 'mgmt_ipv6')):
+            values = [row[column] for row in plan.rows if row[column]]
+            if not values:
+                continue
+            if '/' not in values[0]:
+                values = [value + ('/128' if ':' in value else '/32')
+                          for value in values]
+            family, first = prefix_interval(values[0])[:2]
+            last_first, last = prefix_interval(values[-1])[1:]
+            label = values[0] if last_first == first else '%s-%s' % (
+                values[0].split('/')[0], values[-1].split('/')[0])
+            self.add_range(family, first, last, label, name)
+
+    def _tree(self, family):
+        tree = self.trees.get(family)
+        if tree is None:
+            entries = sorted(self.entries[family])
+            highest = [0] * len(entries)
+
+            def annotate(low, high):
+                if low >= high:
+                    return -1
+                middle = (low + high) // 2
+                highest[middle] = max(entries[middle][1],
+                                      annotate(low, middle),
+                                      annotate(middle + 1, high))
+                return highest[middle]
+
+            annotate(0, len(entries))
+            tree = self.trees[family] = (entries, highest)
+        return tree
+
+    def search(self, family, first, last):
+        """
+        Method to find the entries overlapping a range of addresses.
+        :param family: ipv4 or ipv6.
+        :param first: First address as an integer.
+        :param last: Last address as an integer.
+        :return: List of the overlapping entries, by first address.
+        """
+        entries, highest = self._tree(family)
+        found = []
+        slices = [(0, len(entries))]
+        while slices:
+            low, high = slices.pop()
+            if low >= high:
+                continue
+            middle = (low + high) // 2
+            if highest[middle] < first:
+                continue
+            slices.append((low, middle))
+            if entries[middle][0] <= last:
+                if entries[middle][1] >= first:
+                    found.append(entries[middle])
+                slices.append((middle + 1, high))
+        return sorted(found)
+
+    def find(self, prefix):
+        """
+        Method to find the entries overlapping a prefix.
+        :param prefix: IPv4 or IPv6 address with a /mask.
+        :return: List of the overlapping entries, by first address.
+        """
+        return self.search(*prefix_interval(prefix))
+
+    def overlaps(self):
+        """
+        Method to list every pair of overlapping entries. In first address
+        order, an entry overlaps exactly the entries that follow it and
+        start before it ends, so every step of the scan is an overlap.
+        :return: List of pairs of entries, the first one starting first.
+        """
+        pairs = []
+        for family in sorted(self.entries):
+            entries = self._tree(family)[0]
+            for index, entry in enumerate(entries):
+                following = index + 1
+                while (following < len(entries) and
+                       entries[following][0] <= entry[1]):
+                    pairs.append((entry, entries[following]))
+                    following += 1
+        return pairs
+
+
+def prefix_overlap_messages(index):
+    """
+    Method to describe the overlaps of a PrefixIndex, for the csv
+    validation modules.
+    :param index: The PrefixIndex object.
+    :return: String with one line per overlap, empty without overlaps.
+    """
+    output = ''
+    for entry, other in index.overlaps():
+        output += '{} ({}) overlaps {} ({})\n'.format(
+            other[2], other[3], entry[2], entry[3])
+    return output
@@ -0,0 +1,346 @@
+#!/usr/bin/python
+""" PN Fabric Address Plan """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import shlex
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_nvos import *
+
+DOCUMENTATION = """
+---
+module: pn_address_plan
+author: 'Pluribus Networks (devops@pluribusnetworks.com)'
+short_description: Compute the fabric address plan once per play.
+description:
+    Numbers the loopback ips and router ids, in-band ips, mgmt ipv6, the
+    first link of every leaf and the iOSPF link ips of the fabric in one
+    pass, and returns them as the pn_address_plan fact. ZTP modules given
+    the fact through their pn_address_plan parameter read their addresses
+    from it, as long as it was computed for the same switches and ranges.
+    The range defaults are the defaults of the ZTP modules.
+options:
+    pn_spine_list:
+      description:
+        - Specify list of Spine hosts.
+      required: False
+      type: list
+    pn_leaf_list:
+      description:
+        - Specify list of leaf hosts.
+      required: False
+      type: list
+    pn_loopback_ip:
+      description:
+        - Loopback ip of the first switch, as given to pn_ztp_vrouter_setup.
+      required: False
+      default: 109.109.109.1/32
+      type: str
+    pn_loopback_ip_v6:
+      description:
+        - Loopback ipv6 of the first switch.
+      required: False
+      type: str
+    pn_inband_ipv4:
+      description:
+        - In-band ip of the first switch, as given to pn_ztp_initial_setup.
+      required: False
+      default: 192.16.0.1/24
+      type: str
+    pn_mgmt_ipv6:
+      description:
+        - Mgmt ipv6 of the first switch.
+      required: False
+      type: str
+    pn_net_address_ipv4:
+      description:
+        - Link ipv4 range, as given to pn_ztp_l3_links.
+      required: False
+      default: 172.168.1.1
+      type: str
+    pn_cidr_ipv4:
+      description:
+        - Mask of the link ipv4 range.
+      required: False
+      default: 24
+      type: str
+    pn_subnet_ipv4:
+      description:
+        - Mask of the ipv4 links.
+      required: False
+      default: 31
+      type: str
+    pn_net_address_ipv6:
+      description:
+        - Link ipv6 range.
+      required: False
+      type: str
+    pn_cidr_ipv6:
+      description:
+        - Mask of the link ipv6 range.
+      required: False
+      type: str
+    pn_subnet_ipv6:
+      description:
+        - Mask of the ipv6 links.
+      required: False
+      type: str
+    pn_iospf_ipv4_range:
+      description:
+        - iOSPF ipv4 range, as given to pn_ztp_ospf.
+      required: False
+      default: 75.75.75.1
+      type: str
+    pn_ospf_cidr_ipv4:
+      description:
+        - Mask of the iOSPF ipv4 range.
+      required: False
+      default: 24
+      type: str
+    pn_ospf_subnet_ipv4:
+      description:
+        - Mask of the iOSPF ipv4 links.
+      required: False
+      default: 31
+      type: str
+    pn_iospf_ipv6_range:
+      description:
+        - iOSPF ipv6 range.
+      required: False
+      type: str
+    pn_iospf_cidr_ipv6:
+      description:
+        - Mask of the iOSPF ipv6 range, pn_cidr_ipv6 of pn_ztp_ospf.
+      required: False
+      default: 112
+      type: str
+    pn_iospf_subnet_ipv6:
+      description:
+        - Mask of the iOSPF ipv6 links, pn_subnet_ipv6 of pn_ztp_ospf.
+      required: False
+      default: 127
+      type: str
+    pn_count_links:
+      description:
+        - Flag to count the spine links of every leaf, so the first link of
+          every leaf is numbered in the plan. Needs the links to be up.
+      required: False
+      default: False
+      type: bool
+"""
+
+EXAMPLES = """
+- name: Compute the address plan
+  pn_address_plan:
+    pn_spine_list: "{{ groups['spine'] }}"
+    pn_leaf_list: "{{ groups['leaf'] }}"
+    pn_cidr_ipv4: '16'
+    pn_count_links: true
+  run_once: true
+
+- name: Auto configure link IPs
+  pn_ztp_l3_links:
+    pn_current_switch: "{{ inventory_hostname }}"
+    pn_spine_list: "{{ groups['spine'] }}"
+    pn_leaf_list: "{{ groups['leaf'] }}"
+    pn_cidr_ipv4: '16'
+    pn_address_plan: "{{ pn_address_plan }}"
+"""
+
+RETURN = """
+ansible_facts:
+  description: The pn_address_plan fact with the switches, ranges, columns,
+  one row per switch and the iOSPF rows per cluster number.
+  returned: always
+  type: dict
+summary:
+  description: It contains output of each configuration along with switch name.
+  returned: always
+  type: str
+changed:
+  description: Indicates whether the CLI caused changes on the target.
+  returned: always
+  type: bool
+unreachable:
+  description: Indicates whether switch was unreachable to connect.
+  returned: always
+  type: bool
+failed:
+  description: Indicates whether or not the execution failed on the target.
+  returned: always
+  type: bool
+exception:
+  description: Describes error/exception occurred while executing CLI command.
+  returned: always
+  type: str
+task:
+  description: Name of the task getting executed on switch.
+  returned: always
+  type: str
+msg:
+  description: Indicates whether configuration made was successful or failed.
+  returned: always
+  type: str
+metrics:
+  description: Call count, wall time in seconds, bytes returned and error count
+  of the CLI commands run by the module, per command verb.
+  returned: always
+  type: dict
+"""
+
+
+def run_cli(module, cli):
+    """
+    Method to execute the cli command on the target node(s) and returns the
+    output.
+    :param module: The Ansible module to fetch input parameters.
+    :param cli: The complete cli string to be executed on the target node(s).
+    :return: Output/Error or Success msg depending upon the response from cli.
+    """
+    cli = shlex.split(cli)
+    rc, out, err = run_in_session(module, cli)
+    results = []
+    if out:
+        return out
+
+    if err:
+        json_msg = {
+            'switch': '',
+            'output': u'Operation Failed: {}'.format(' '.join(cli))
+        }
+        results.append(json_msg)
+        module.exit_json(
+            unreachable=False,
+            failed=True,
+            exception=err.strip(),
+            summary=results,
+            task='Compute address plan',
+            msg='Address plan computation failed',
+            changed=False,
+            metrics=cli_metrics()
+        )
+    else:
+        return 'Success'
+
+
+def count_leaf_links(module, spine_list, leaf_list):
+    """
+    Method to count the spine links of every leaf, as finding_initial_ip()
+    of pn_ztp_l3_links does.
+    :param module: The Ansible module to fetch input parameters.
+    :param spine_list: The list of all spines.
+    :param leaf_list: The list of all leafs.
+    :return: Dictionary of the number of spine links per leaf.
+    """
+    cli = pn_cli(module)
+    leaf_links = {}
+    for leaf in leaf_list:
+        leaf_links[leaf] = count_spine_links(module, run_cli, cli, leaf,
+                                             spine_list)
+    return leaf_links
+
+
+def main():
+    """ This section is for arguments parsing """
+    module = AnsibleModule(
+        argument_spec=dict(
+            pn_spine_list=dict(required=False, type='list', default=[]),
+            pn_leaf_list=dict(required=False, type='list', default=[]),
+            pn_loopback_ip=dict(required=False, type='str',
+                                default='109.109.109.1/32'),
+            pn_loopback_ip_v6=dict(required=False, type='str'),
+            pn_inband_ipv4=dict(required=False, type='str',
+                                default='192.16.0.1/24'),
+            pn_mgmt_ipv6=dict(required=False, type='str'),
+            pn_net_address_ipv4=dict(required=False, type='str',
+                                     default='172.168.1.1'),
+            pn_cidr_ipv4=dict(required=False, type='str', default='24'),
+            pn_subnet_ipv4=dict(required=False, type='str', default='31'),
+            pn_net_address_ipv6=dict(required=False, type='str'),
+            pn_cidr_ipv6=dict(required=False, type='str'),
+            pn_subnet_ipv6=dict(required=False, type='str'),
+            pn_iospf_ipv4_range=dict(required=False, type='str',
+                                     default='75.75.75.1'),
+            pn_ospf_cidr_ipv4=dict(required=False, type='str', default='24'),
+            pn_ospf_subnet_ipv4=dict(required=False, type='str', default='31'),
+            pn_iospf_ipv6_range=dict(required=False, type='str', default=''),
+            pn_iospf_cidr_ipv6=dict(required=False, type='str', default='112'),
+            pn_iospf_subnet_ipv6=dict(required=False, type='str',
+                                      default='127'),
+            pn_count_links=dict(required=False, type='bool', default=False),
+        )
+    )
+
+    params = module.params
+    spine_list = [spine.strip() for spine in params['pn_spine_list']]
+    leaf_list = [leaf.strip() for leaf in params['pn_leaf_list']]
+
+    leaf_links = None
+    if params['pn_count_links']:
+        leaf_links = count_leaf_links(module, spine_list, leaf_list)
+
+    try:
+        plan = FabricAddressPlan(spine_list, leaf_list, {
+            'loopback_ip': params['pn_loopback_ip'],
+            'loopback_ipv6': params['pn_loopback_ip_v6'],
+            'inband_ip': params['pn_inband_ipv4'],
+            'mgmt_ipv6': params['pn_mgmt_ipv6'],
+            'link_ipv4': [params['pn_net_address_ipv4'],
+                          params['pn_cidr_ipv4'], params['pn_subnet_ipv4']],
+            'link_ipv6': [params['pn_net_address_ipv6'],
+                          params['pn_cidr_ipv6'], params['pn_subnet_ipv6']],
+            'iospf_ipv4': [params['pn_iospf_ipv4_range'],
+                           params['pn_ospf_cidr_ipv4'],
+                           params['pn_ospf_subnet_ipv4']],
+            'iospf_ipv6': [params['pn_iospf_ipv6_range'],
+                           params['pn_iospf_cidr_ipv6'],
+                           params['pn_iospf_subnet_ipv6']],
+        }, leaf_links)
+    except (ValueError, IndexError) as error:
+        module.exit_json(
+            unreachable=False,
+            failed=True,
+            exception=str(error),
+            summary=[{'switch': '', 'output': str(error)}],
+            task='Compute address plan',
+            msg='Address plan computation failed',
+            changed=False,
+            metrics=cli_metrics()
+        )
+
+    results = [{
+        'switch': '',
+        'output': 'Address plan of %d switches computed%s' % (
+            len(plan.rows), ' with leaf links' if leaf_links else '')
+    }]
+
+    module.exit_json(
+        unreachable=False,
+        msg='Address plan computation succeeded',
+        summary=results,
+        exception='',
+        failed=False,
+        changed=False,
+        task='Compute address plan',
+        ansible_facts={'pn_address_plan': plan.to_table()},
+        metrics=cli_metrics()
+    )
+
+if __name__ == '__main__':
+    main()
@@ -21,6 +21,7 @@
 import shlex
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_nvos import run_in_session, fabric_snapshot, cli_metrics
 
 DOCUMENTATION = """
 ---
@@ -151,6 +152,11 @@ msg:
   description: Indicates whether configuration made was successful or failed.
   returned: always
   type: str
+metrics:
+  description: Call count, wall time in seconds, bytes returned and error count
+  of the CLI commands run by the module, per command verb.
+  returned: always
+  type: dict
 """
 
 CHANGED_FLAG = []
@@ -182,7 +188,7 @@ def run_cli(module, cli):
     :return: Output/Error or Success msg depending upon the response from cli.
     """
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_in_session(module, cli)
     results = []
     if out:
         return out
@@ -201,7 +207,8 @@ def run_cli(module, cli):
             task='Configure eBGP/OSPF',
             stderr=err.strip(),
             msg='eBGP/OSPF configuration failed',
-            changed=False
+            changed=False,
+            metrics=cli_metrics()
         )
     else:
         return 'Success'
@@ -387,41 +394,20 @@ def add_bgp_neighbor(module, dict_bgp_as):
     output = ''
     cli = pn_cli(module)
     clicopy = cli
+    snapshot = fabric_snapshot(module, run_cli, clicopy)
 
     for spine in module.params['pn_spine_list']:
-        cli = clicopy
-        cli += ' vrouter-show location %s' % spine
-        cli += ' format name no-show-headers'
-        vrouter_spine = run_cli(module, cli).split()[0]
-
-        cli = clicopy
-        cli += ' vrouter-interface-show vrouter-name %s ' % vrouter_spine
-        cli += ' format l3-port no-show-headers '
-        port_list = run_cli(module, cli).split()
-        port_list = list(set(port_list))
-        port_list.remove(vrouter_spine)
+        vrouter_spine = snapshot.vrouter(spine)
+        port_list = snapshot.l3_ports(vrouter_spine)
 
         for port in port_list:
-            cli = clicopy
-            cli += ' switch %s port-show port %s ' % (spine, port)
-            cli += ' format hostname no-show-headers '
-            leaf = run_cli(module, cli).split()[0]
-
-            cli = clicopy
-            cli += ' vrouter-show location %s' % leaf
-            cli += ' format name no-show-headers'
-            vrouter_leaf = run_cli(module, cli).split()[0]
+            leaf = snapshot.port(spine, port).hostname
+            vrouter_leaf = snapshot.vrouter(leaf)
 
             bgp_leaf = dict_bgp_as[leaf]
             bgp_spine = dict_bgp_as[spine]
 
-            cli = clicopy
-            cli += ' vrouter-interface-show vrouter-name %s ' % vrouter_spine
-            cli += ' l3-port %s format ip no-show-headers ' % port
-            ip = run_cli(module, cli).split()
-            ip = list(set(ip))
-            ip.remove(vrouter_spine)
-            ip = ip[0]
+            ip = snapshot.interfaces(vrouter_spine, port)[0].ip
 
             ip = ip.split('/')[0]
             ip_spine = ip
@@ -469,10 +455,7 @@ def add_bgp_neighbor(module, dict_bgp_as):
                 if module.params['pn_bfd']:
                     cli += ' bfd '
 
-                temp_cli = clicopy
-                temp_cli += ' cluster-show format name no-show-headers'
-                cluster_list = run_cli(module, temp_cli).split()
-                for cluster in cluster_list:
+                for cluster in snapshot.cluster_names():
                     if leaf in cluster:
                         cli += ' weight 100 allowas-in '
                         break
@@ -1133,7 +1116,8 @@ def main():
         exception='',
         failed=False,
         changed=True if True in CHANGED_FLAG else False,
-        task='Configure eBGP/OSPF'
+        task='Configure eBGP/OSPF',
+        metrics=cli_metrics()
     )
 
 if __name__ == '__main__':
@@ -0,0 +1,239 @@
+#!/usr/bin/python
+""" PN CLI Fabric Facts """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import shlex
+import time
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_nvos import *
+
+DOCUMENTATION = """
+---
+module: pn_fabric_facts
+author: 'Pluribus Networks (devops@pluribusnetworks.com)'
+short_description: Gather the fabric inventory once per play.
+description:
+    Gathers vrouters, vrouter interfaces, clusters and the ports, trunks,
+    lldp neighbors and vlans of the given switches, and returns them as the
+    pn_fabric fact. The facts are also cached on disk keyed by fabric name
+    and configuration generation. ZTP modules given the fact through their
+    pn_fabric_facts parameter use it instead of querying the fabric again,
+    as long as the fabric generation did not change and the TTL did not
+    expire.
+options:
+    pn_switch_list:
+      description:
+        - Specify list of switches whose local tables are gathered.
+      required: False
+      type: list
+      default: []
+    pn_cache_ttl:
+      description:
+        - Specify number of seconds the gathered facts stay valid.
+      required: False
+      type: int
+      default: 1800
+    pn_refresh:
+      description:
+        - Flag to gather the facts even if a valid cache exists.
+      required: False
+      default: False
+      type: bool
+    pn_invalidate:
+      description:
+        - Flag to drop the cached facts, for use after mutating tasks.
+      required: False
+      default: False
+      type: bool
+"""
+
+EXAMPLES = """
+- name: Gather fabric facts
+  pn_fabric_facts:
+    pn_switch_list: "{{ groups['all'] }}"
+  run_once: true
+
+- name: Configure OSPF
+  pn_ztp_ospf:
+    pn_current_switch: "{{ inventory_hostname }}"
+    pn_spine_list: "{{ groups['spine'] }}"
+    pn_leaf_list: "{{ groups['leaf'] }}"
+    pn_fabric_facts: "{{ pn_fabric }}"
+
+- name: Drop fabric facts
+  pn_fabric_facts:
+    pn_invalidate: true
+  run_once: true
+"""
+
+RETURN = """
+ansible_facts:
+  description: The pn_fabric fact with name, generation, gathered, ttl and
+  the gathered tables.
+  returned: always
+  type: dict
+summary:
+  description: It contains output of each configuration along with switch name.
+  returned: always
+  type: str
+changed:
+  description: Indicates whether the CLI caused changes on the target.
+  returned: always
+  type: bool
+unreachable:
+  description: Indicates whether switch was unreachable to connect.
+  returned: always
+  type: bool
+failed:
+  description: Indicates whether or not the execution failed on the target.
+  returned: always
+  type: bool
+exception:
+  description: Describes error/exception occurred while executing CLI command.
+  returned: always
+  type: str
+task:
+  description: Name of the task getting executed on switch.
+  returned: always
+  type: str
+msg:
+  description: Indicates whether configuration made was successful or failed.
+  returned: always
+  type: str
+metrics:
+  description: Call count, wall time in seconds, bytes returned and error count
+  of the CLI commands run by the module, per command verb.
+  returned: always
+  type: dict
+"""
+
+
+def run_cli(module, cli):
+    """
+    Method to execute the cli command on the target node(s) and returns the
+    output.
+    :param module: The Ansible module to fetch input parameters.
+    :param cli: The complete cli string to be executed on the target node(s).
+    :return: Output/Error or Success msg depending upon the response from cli.
+    """
+    cli = shlex.split(cli)
+    rc, out, err = run_in_session(module, cli)
+    results = []
+    if out:
+        return out
+
+    if err:
+        json_msg = {
+            'switch': '',
+            'output': u'Operation Failed: {}'.format(' '.join(cli))
+        }
+        results.append(json_msg)
+        module.exit_json(
+            unreachable=False,
+            failed=True,
+            exception=err.strip(),
+            summary=results,
+            task='Gather fabric facts',
+            msg='Fabric facts gathering failed',
+            changed=False,
+            metrics=cli_metrics()
+        )
+    else:
+        return 'Success'
+
+
+def gather_fabric_facts(module, cache):
+    """
+    Method to gather the fabric facts or read them from the cache.
+    :param module: The Ansible module to fetch input parameters.
+    :param cache: The FabricFactCache object.
+    :return: Tuple of the facts and a flag telling if they came from cache.
+    """
+    cli = pn_cli(module)
+    name, generation = fabric_generation(module, run_cli, cli)
+
+    if not module.params['pn_refresh']:
+        facts = cache.get(name, generation)
+        if facts:
+            return facts, True
+
+    snapshot = FabricSnapshot(module, run_cli, cli)
+    snapshot.load(module.params['pn_switch_list'])
+    facts = {
+        'name': name,
+        'generation': generation,
+        'gathered': time.time(),
+        'ttl': cache.ttl,
+        'tables': snapshot.to_facts(),
+    }
+    cache.put(facts)
+
+    return facts, False
+
+
+def main():
+    """ This section is for arguments parsing """
+    module = AnsibleModule(
+        argument_spec=dict(
+            pn_switch_list=dict(required=False, type='list', default=[]),
+            pn_cache_ttl=dict(required=False, type='int', default=1800),
+            pn_refresh=dict(required=False, type='bool', default=False),
+            pn_invalidate=dict(required=False, type='bool', default=False),
+        )
+    )
+
+    cache = FabricFactCache(ttl=module.params['pn_cache_ttl'])
+
+    if module.params['pn_invalidate']:
+        cache.invalidate()
+        module.exit_json(
+            unreachable=False,
+            msg='Fabric facts invalidated',
+            summary=[],
+            exception='',
+            failed=False,
+            changed=False,
+            task='Gather fabric facts',
+            ansible_facts={'pn_fabric': {}},
+            metrics=cli_metrics()
+        )
+
+    facts, cached = gather_fabric_facts(module, cache)
+    results = [{
+        'switch': '',
+        'output': 'Fabric %s generation %s facts %s' % (
+            facts['name'], facts['generation'],
+            'read from cache' if cached else 'gathered')
+    }]
+
+    module.exit_json(
+        unreachable=False,
+        msg='Fabric facts gathering succeeded',
+        summary=results,
+        exception='',
+        failed=False,
+        changed=False,
+        task='Gather fabric facts',
+        ansible_facts={'pn_fabric': facts},
+        metrics=cli_metrics()
+    )
+
+if __name__ == '__main__':
+    main()
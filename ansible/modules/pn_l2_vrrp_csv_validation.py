@@ -22,6 +22,8 @@ import re
 import socket
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_nvos import PrefixIndex, FabricAddressPlan
+from ansible.module_utils.pn_nvos import prefix_interval, prefix_overlap_messages
 
 DOCUMENTATION = """
 ---
@@ -41,6 +43,13 @@ options:
       description: Specify list of spine switches.
       required: True
       type: list
+    pn_address_plan:
+      description:
+        - The pn_address_plan fact. The subnets of the csv file are also
+          checked against the link, loopback, in-band, mgmt and iOSPF ranges
+          it was computed for, and against each other.
+      required: False
+      type: dict
 """
 
 EXAMPLES = """
@@ -88,6 +97,7 @@ def main():
         argument_spec=dict(
             pn_csv_data=dict(required=True, type='str'),
             pn_spine_list=dict(required=False, type='list'),
+            pn_address_plan=dict(required=False, type='dict'),
         )
     )
 
@@ -95,6 +105,8 @@ def main():
     line_count = 0
     switch_vlan_dict = {}
     csv_data = module.params['pn_csv_data'].replace(' ', '')
+    prefixes = PrefixIndex()
+    vlan_subnets = set()
 
     if csv_data:
         csv_data_list = csv_data.split('\n')
@@ -146,6 +158,13 @@ def main():
                         except socket.error:
                             output += 'Invalid IP {} '.format(ip)
                             output += 'at line number {}\n'.format(line_count)
+                        else:
+                            # Every switch of a vlan has an address in the
+                            # same subnet, which is added once per vlan.
+                            subnet = prefix_interval(ip)
+                            if (vlan, subnet) not in vlan_subnets:
+                                vlan_subnets.add((vlan, subnet))
+                                prefixes.add(ip, 'line {}'.format(line_count))
 
                         # Vlan ID validation
                         if (not vlan.isdigit() or
@@ -180,6 +199,16 @@ def main():
     else:
         output += 'Csv file should not be empty\n'
 
+    if module.params['pn_address_plan']:
+        plan = FabricAddressPlan.from_table(module.params['pn_address_plan'])
+        if plan is None:
+            output += 'Invalid address plan\n'
+        else:
+            prefixes.add_plan(plan)
+
+    # Subnets overlapping each other or the ranges of the address plan.
+    output += prefix_overlap_messages(prefixes)
+
     if not output:
         msg = 'Valid csv file'
         failed_flag = False
@@ -22,6 +22,8 @@ import re
 import socket
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_nvos import PrefixIndex, FabricAddressPlan
+from ansible.module_utils.pn_nvos import prefix_overlap_messages
 
 DOCUMENTATION = """
 ---
@@ -43,6 +45,13 @@ options:
       description: Specify list of leaf switches.
       required: True
       type: list
+    pn_address_plan:
+      description:
+        - The pn_address_plan fact. The subnets of the csv file are also
+          checked against the link, loopback, in-band, mgmt and iOSPF ranges
+          it was computed for, and against each other.
+      required: False
+      type: dict
 """
 
 EXAMPLES = """
@@ -105,6 +114,7 @@ def main():
         argument_spec=dict(
             pn_csv_data=dict(required=True, type='str'),
             pn_leaf_list=dict(required=False, type='list'),
+            pn_address_plan=dict(required=False, type='dict'),
         )
     )
 
@@ -114,6 +124,7 @@ def main():
     vlan_list = []
     existing_ip = []
     csv_data = module.params['pn_csv_data'].replace(' ', '')
+    prefixes = PrefixIndex()
     switch_id_dict = {}
 
     if csv_data:
@@ -175,6 +186,8 @@ def main():
                         except socket.error:
                             output += 'Invalid vrrp ip {} '.format(ip)
                             output += 'at line number {}\n'.format(line_count)
+                        else:
+                            prefixes.add(ip, 'line {}'.format(line_count))
 
                         # Switch1 name validation
                         if not validate_switch_name(switch1, leaf_list):
@@ -235,6 +248,16 @@ def main():
     else:
         output += 'Csv file should not be empty\n'
 
+    if module.params['pn_address_plan']:
+        plan = FabricAddressPlan.from_table(module.params['pn_address_plan'])
+        if plan is None:
+            output += 'Invalid address plan\n'
+        else:
+            prefixes.add_plan(plan)
+
+    # Subnets overlapping each other or the ranges of the address plan.
+    output += prefix_overlap_messages(prefixes)
+
     if not output:
         msg = 'Valid csv file'
         failed_flag = False
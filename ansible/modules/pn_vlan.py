@@ -20,7 +20,7 @@
 
 import shlex
 from ansible.module_utils.basic import AnsibleModule
-from ansible.module_utils.pn_nvos import pn_cli
+from ansible.module_utils.pn_nvos import pn_cli, run_in_session, CliQueue, cli_metrics
 
 
 DOCUMENTATION = """
@@ -125,6 +125,11 @@ changed:
   target.
   returned: always
   type: bool
+metrics:
+  description: Call count, wall time in seconds, bytes returned and error count
+  of the CLI commands run by the module, per command verb.
+  returned: always
+  type: dict
 """
 
 MAX_VLAN_ID = 4092
@@ -141,8 +146,19 @@ def run_cli(module, cli):
     :return: Output/Error or Success msg depending upon the response from cli.
     """
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_in_session(module, cli)
+    return check_cli_output(module, cli, out, err)
+
 
+def check_cli_output(module, cli, out, err):
+    """
+    Method to interpret the response of a cli command.
+    :param module: The Ansible module to fetch input parameters.
+    :param cli: The executed cli command split into arguments.
+    :param out: Output of the cli command.
+    :param err: Error of the cli command.
+    :return: Output/Error or Success msg depending upon the response from cli.
+    """
     if out:
         return out
     if err:
@@ -196,13 +212,14 @@ def expand_range(range_str):
     return range_to_list
 
 
-def create_vlan(module, switch, vlanid):
+def create_vlan(module, queue, switch, vlanid):
     """
-    Method to create VLAN.
+    Method to queue VLAN creation.
     :param module: The Ansible module to fetch input parameters.
+    :param queue: The CliQueue collecting vlan-create commands.
     :param switch: Name of the target switch
     :param vlanid: VLAN ID
-    :return: message string
+    :return: Index of the message string in queue.results
     """
     scope = module.params['pn_scope']
     vnet = module.params['pn_vnet']
@@ -233,10 +250,12 @@ def create_vlan(module, switch, vlanid):
     if untagged_ports:
         cli += ' untagged-ports ' + untagged_ports
 
-    output = run_cli(module, cli)
+    def vlan_created(output):
+        if 'created' in output:
+            return ' %s: VLAN %s created \n' % (switch, vlanid)
+        return ''
 
-    if 'created' in output:
-        return ' %s: VLAN %s created \n' % (switch, vlanid)
+    return queue.add(cli, vlan_created)
 
 
 def delete_vlan(module, switch, vlanid):
@@ -325,18 +344,22 @@ def main():
             module.exit_json(
                 skipped=True,
                 stderr=message,
-                msg="VLAN configuration failed"
+                msg="VLAN configuration failed",
+                metrics=cli_metrics()
             )
 
     if action == 'create':
+        queue = CliQueue(module, check=check_cli_output)
         for vlan_id in vlan_list:
             if str(vlan_id) not in existing_vlans:
-                message += create_vlan(module, cliswitch, str(vlan_id))
+                create_vlan(module, queue, cliswitch, str(vlan_id))
                 CHANGED_FLAG.append(True)
                 existing_vlans.append(str(vlan_id))
             else:
                 message += 'VLAN %s already exists \n' % vlan_id
                 CHANGED_FLAG.append(False)
+        queue.flush()
+        message += ''.join(queue.results)
 
     if action == 'delete':
         for vlan_id in vlan_list:
@@ -360,7 +383,8 @@ def main():
     module.exit_json(
         stdout=message,
         msg="VLAN configuration succeeded",
-        changed=True if True in CHANGED_FLAG else False
+        changed=True if True in CHANGED_FLAG else False,
+        metrics=cli_metrics()
     )
 
 if __name__ == '__main__':
@@ -172,7 +172,7 @@ def run_cli(module, cli):
     :return: Output/Error or Success msg depending upon the response from cli.
     """
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_in_session(module, cli)
     results = []
     if out:
         return out
@@ -1177,6 +1177,9 @@ def main():
         )
     )
 
+    # The module polls no state, see memoize_shows().
+    memoize_shows(True)
+
     global CHANGED_FLAG
     routing_protocol = module.params['pn_routing_protocol']
     current_switch = module.params['pn_current_switch']
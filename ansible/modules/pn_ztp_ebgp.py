@@ -117,6 +117,14 @@ options:
       required: False
       default: False
       type: bool
+    pn_plan:
+      description:
+        - The plan returned by a check mode run of this task. Only the
+          planned commands are run, without comparing against the fabric
+          again.
+      required: False
+      type: list
+      default: []
 """
 
 EXAMPLES = """
@@ -155,6 +163,16 @@ msg:
   description: Indicates whether configuration made was successful or failed.
   returned: always
   type: str
+metrics:
+  description: Call count, wall time in seconds, bytes returned and error count
+  of the CLI commands run by the module, per command verb.
+  returned: always
+  type: dict
+plan:
+  description: Mutating commands run by the module in order, or in check mode
+  the commands it would run against the existing configuration.
+  returned: always
+  type: list
 """
 
 CHANGED_FLAG = []
@@ -169,7 +187,19 @@ def run_cli(module, cli):
     :return: Output/Error or Success msg depending upon the response from cli.
     """
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_in_session(module, cli)
+    return check_cli_output(module, cli, out, err)
+
+
+def check_cli_output(module, cli, out, err):
+    """
+    Method to interpret the response of a cli command.
+    :param module: The Ansible module to fetch input parameters.
+    :param cli: The executed cli command split into arguments.
+    :param out: Output of the cli command.
+    :param err: Error of the cli command.
+    :return: Output/Error or Success msg depending upon the response from cli.
+    """
     results = []
     if out:
         return out
@@ -188,7 +218,8 @@ def run_cli(module, cli):
             task='Configure eBGP',
             stderr=err.strip(),
             msg='eBGP configuration failed',
-            changed=False
+            changed=False,
+            metrics=cli_metrics()
         )
     else:
         return 'Success'
@@ -427,6 +458,52 @@ def assign_ibgp_interface(module, dict_bgp_as):
     return output
 
 
+def add_bgp_neighbors(module, neighbors):
+    """
+    Method to add bgp neighbors to the vrouters of several switches, the
+    switches being configured concurrently.
+    :param module: The Ansible module to fetch input parameters.
+    :param neighbors: List of tuples of switch name, neighbor ip, remote-as,
+    neighbor name for the output and extra vrouter-bgp-add arguments.
+    :return: String describing if bgp neighbors got added or not.
+    """
+    global CHANGED_FLAG
+    output = ''
+    cli = pn_cli(module)
+    clicopy = cli
+
+    with CliExecutor(module, check=check_cli_output) as executor:
+        for switch, neighbor, remote_as, name, extra in neighbors:
+            cli = clicopy
+            cli += ' switch %s vrouter-bgp-show remote-as %s' % (switch, remote_as)
+            cli += ' neighbor %s format switch no-show-headers ' % neighbor
+            executor.add(cli)
+
+    missing = [bgp_neighbor for bgp_neighbor, already_added in
+               zip(neighbors, executor.results)
+               if already_added is not None and
+               bgp_neighbor[0] + '-vrouter' not in already_added.split()]
+
+    with CliExecutor(module, check=check_cli_output) as executor:
+        for switch, neighbor, remote_as, name, extra in missing:
+            cli = clicopy
+            cli += ' switch %s vrouter-bgp-add vrouter-name %s-vrouter' % (switch, switch)
+            cli += ' neighbor %s remote-as %s ' % (neighbor, remote_as)
+            cli += extra
+            if module.params['pn_bfd']:
+                cli += ' bfd '
+            executor.add(cli)
+
+    for bgp_neighbor, result in zip(missing, executor.results):
+        if result and 'Success' in result:
+            output += ' %s: Added BGP Neighbor %s for %s \n' % (
+                bgp_neighbor[0], bgp_neighbor[3], bgp_neighbor[0] + '-vrouter'
+            )
+            CHANGED_FLAG.append(True)
+
+    return output
+
+
 def add_bgp_neighbor(module, dict_bgp_as):
     """
     Method to add bgp_neighbor to the vrouters.
@@ -434,7 +511,6 @@ def add_bgp_neighbor(module, dict_bgp_as):
     :param dict_bgp_as: Dictionary containing bgp-as of all switches.
     :return: String describing if bgp neighbors got added or not.
     """
-    global CHANGED_FLAG
     output = ''
     cli = pn_cli(module)
     addr_type = module.params['pn_addr_type']
@@ -468,51 +544,18 @@ def add_bgp_neighbor(module, dict_bgp_as):
             spine_dict[spine].append(leaf_input[count])
             count += 1
 
+    neighbors = []
     for spine in module.params['pn_spine_list']:
         for bgp_neighbor in spine_dict[spine]:
-            cli = clicopy
-            cli += ' vrouter-bgp-show remote-as ' + dict_bgp_as[bgp_neighbor[0][:-8]]
-            cli += ' neighbor %s format switch no-show-headers ' % bgp_neighbor[2]
-            already_added = run_cli(module, cli).split()
-
-            if spine+'-vrouter' in already_added:
-                output += ''
-            else:
-                cli = clicopy
-                cli += ' vrouter-bgp-add vrouter-name ' + spine + '-vrouter'
-                cli += ' neighbor %s remote-as %s ' % (bgp_neighbor[2],
-                                                       dict_bgp_as[bgp_neighbor[0][:-8]])
-                if module.params['pn_bfd']:
-                    cli += ' bfd '
-
-                if 'Success' in run_cli(module, cli):
-                    output += ' %s: Added BGP Neighbor %s for %s \n' % (
-                        spine, bgp_neighbor[1], spine+'vrouter'
-                    )
-                    CHANGED_FLAG.append(True)
-
+            remote_as = dict_bgp_as[bgp_neighbor[0][:-8]]
+            neighbors.append((spine, bgp_neighbor[2], remote_as,
+                              bgp_neighbor[1], ''))
             if addr_type == 'ipv4_ipv6':
-                cli = clicopy
-                cli += ' vrouter-bgp-show remote-as ' + dict_bgp_as[bgp_neighbor[0][:-8]]
-                cli += ' neighbor %s format switch no-show-headers ' % bgp_neighbor[3]
-                already_added = run_cli(module, cli).split()
+                neighbors.append((spine, bgp_neighbor[3], remote_as,
+                                  bgp_neighbor[1],
+                                  ' multi-protocol ipv6-unicast'))
 
-                if spine+'-vrouter' in already_added:
-                    output += ''
-                else:
-                    cli = clicopy
-                    cli += ' vrouter-bgp-add vrouter-name ' + spine + '-vrouter'
-                    cli += ' neighbor %s remote-as %s ' % (bgp_neighbor[3],
-                                                           dict_bgp_as[bgp_neighbor[0][:-8]])
-                    cli += ' multi-protocol ipv6-unicast'
-                    if module.params['pn_bfd']:
-                        cli += ' bfd '
-
-                    if 'Success' in run_cli(module, cli):
-                        output += ' %s: Added BGP Neighbor %s for %s \n' % (
-                            spine, bgp_neighbor[1], spine+'vrouter'
-                        )
-                        CHANGED_FLAG.append(True)
+    output += add_bgp_neighbors(module, neighbors)
 
     leaf_dict = dict()
     for leaf in module.params['pn_leaf_list']:
@@ -540,51 +583,18 @@ def add_bgp_neighbor(module, dict_bgp_as):
             leaf_dict[leaf].append(spine_input[count])
             count += 1
 
+    neighbors = []
     for leaf in module.params['pn_leaf_list']:
         for bgp_neighbor in leaf_dict[leaf]:
-            cli = clicopy
-            cli += ' vrouter-bgp-show remote-as ' + dict_bgp_as[bgp_neighbor[0][:-8]]
-            cli += ' neighbor %s format switch no-show-headers ' % bgp_neighbor[2]
-            already_added = run_cli(module, cli).split()
-
-            if leaf+'-vrouter' in already_added:
-                output += ''
-            else:
-                cli = clicopy
-                cli += ' vrouter-bgp-add vrouter-name ' + leaf + '-vrouter'
-                cli += ' neighbor %s remote-as %s ' % (bgp_neighbor[2],
-                                                       dict_bgp_as[bgp_neighbor[0][:-8]])
-                if module.params['pn_bfd']:
-                    cli += ' bfd '
-
-                if 'Success' in run_cli(module, cli):
-                    output += ' %s: Added BGP Neighbor %s for %s \n' % (
-                        leaf, bgp_neighbor[1], leaf+'-vrouter'
-                    )
-                    CHANGED_FLAG.append(True)
-
+            remote_as = dict_bgp_as[bgp_neighbor[0][:-8]]
+            neighbors.append((leaf, bgp_neighbor[2], remote_as,
+                              bgp_neighbor[1], ''))
             if addr_type == 'ipv4_ipv6':
-                cli = clicopy
-                cli += ' vrouter-bgp-show remote-as ' + dict_bgp_as[bgp_neighbor[0][:-8]]
-                cli += ' neighbor %s format switch no-show-headers ' % bgp_neighbor[3]
-                already_added = run_cli(module, cli).split()
+                neighbors.append((leaf, bgp_neighbor[3], remote_as,
+                                  bgp_neighbor[1],
+                                  ' multi-protocol ipv6-unicast'))
 
-                if leaf+'-vrouter' in already_added:
-                    output += ''
-                else:
-                    cli = clicopy
-                    cli += ' vrouter-bgp-add vrouter-name ' + leaf + '-vrouter'
-                    cli += ' neighbor %s remote-as %s' % (bgp_neighbor[3],
-                                                          dict_bgp_as[bgp_neighbor[0][:-8]])
-                    cli += ' multi-protocol ipv6-unicast'
-                    if module.params['pn_bfd']:
-                        cli += ' bfd '
-
-                    if 'Success' in run_cli(module, cli):
-                        output += ' %s: Added BGP Neighbor %s for %s \n' % (
-                            leaf, bgp_neighbor[1], leaf+'-vrouter'
-                        )
-                        CHANGED_FLAG.append(True)
+    output += add_bgp_neighbors(module, neighbors)
 
     return output
 
@@ -786,9 +796,29 @@ def main():
             pn_ibgp_vlan=dict(required=False, type='str', default='4040'),
             pn_routing_protocol=dict(required=False, type='str',
                                      choices=['ebgp'], default='ebgp'),
-        )
+            pn_plan=dict(required=False, type='list', default=[]),
+        ),
+        supports_check_mode=True
     )
 
+    # The module polls no state, see memoize_shows().
+    memoize_shows(True)
+
+    if module.params['pn_plan']:
+        plan = module.params['pn_plan']
+        apply_cli_plan(module, plan, check_cli_output)
+        module.exit_json(
+            unreachable=False,
+            msg='eBGP configuration succeeded',
+            summary=[{'switch': '', 'output': command} for command in plan],
+            exception='',
+            failed=False,
+            changed=True,
+            task='Configure eBGP',
+            plan=cli_plan(),
+            metrics=cli_metrics()
+        )
+
     global CHANGED_FLAG
     routing_protocol = module.params['pn_routing_protocol']
 
@@ -830,7 +860,9 @@ def main():
         exception='',
         failed=False,
         changed=True if True in CHANGED_FLAG else False,
-        task='Configure eBGP'
+        task='Configure eBGP',
+        plan=cli_plan(),
+        metrics=cli_metrics()
     )
 
 if __name__ == '__main__':
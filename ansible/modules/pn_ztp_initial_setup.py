@@ -21,7 +21,8 @@ import shlex
 import time
 
 from ansible.module_utils.basic import AnsibleModule
-from ansible.module_utils.pn_nvos import pn_cli
+from ansible.module_utils.pn_nvos import pn_cli, run_in_session, cli_metrics
+from ansible.module_utils.pn_nvos import address_plan
 
 DOCUMENTATION = """
 ---
@@ -153,6 +154,13 @@ options:
         - Flag to enable/disable auto-neg for T2+ platforms.
       required: False
       type: bool
+    pn_address_plan:
+      description:
+        - The pn_address_plan fact returned by pn_address_plan, used instead
+        of numbering the in-band and mgmt ips again when computed for the
+        same switches and ranges.
+      required: False
+      type: dict
 """
 
 EXAMPLES = """
@@ -193,6 +201,11 @@ msg:
   description: Indicates whether configuration made was successful or failed.
   returned: always
   type: str
+metrics:
+  description: Call count, wall time in seconds, bytes returned and error count
+  of the CLI commands run by the module, per command verb.
+  returned: always
+  type: dict
 """
 
 CHANGED_FLAG = []
@@ -208,7 +221,7 @@ def run_cli(module, cli):
     """
     results = []
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_in_session(module, cli)
 
     if out:
         return out
@@ -225,7 +238,8 @@ def run_cli(module, cli):
             summary=results,
             task='Fabric creation',
             msg='Fabric creation failed',
-            changed=False
+            changed=False,
+            metrics=cli_metrics()
         )
     else:
         return 'Success'
@@ -430,7 +444,7 @@ def create_or_join_fabric(module, fabric_name, fabric_network):
     cli = clicopy
     cli += ' fabric-info format name no-show-headers'
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_in_session(module, cli)
 
 
     if out and fabric_name in out.split()[1]:
@@ -462,7 +476,7 @@ def modify_auto_neg(module):
         cli = pn_cli(module)
         cli += ' switch-local bezel-portmap-show format port no-show-headers '
         cli = shlex.split(cli)
-        out = module.run_command(cli)[1]
+        out = run_in_session(module, cli)[1]
         all_ports = out.splitlines()
         all_ports = [port.strip() for port in all_ports]
         time.sleep(1)
@@ -470,7 +484,7 @@ def modify_auto_neg(module):
         cli = pn_cli(module)
         cli += ' switch-local lldp-show format local-port no-show-headers '
         cli = shlex.split(cli)
-        out = module.run_command(cli)[1]
+        out = run_in_session(module, cli)[1]
         lldp_ports = out.splitlines()
         lldp_ports = [port.strip() for port in lldp_ports]
         time.sleep(1)
@@ -479,13 +493,13 @@ def modify_auto_neg(module):
         cli = pn_cli(module)
         cli += ' switch-local port-config-modify port %s autoneg ' % ','.join(idle_ports)
         cli = shlex.split(cli)
-        module.run_command(cli)
+        run_in_session(module, cli)
         time.sleep(1)
 
         cli = pn_cli(module)
         cli += ' switch-local lldp-show format local-port no-show-headers '
         cli = shlex.split(cli)
-        out = module.run_command(cli)[1]
+        out = run_in_session(module, cli)[1]
         lldp_ports = out.splitlines()
         lldp_ports = [port.strip() for port in lldp_ports]
         time.sleep(1)
@@ -493,7 +507,7 @@ def modify_auto_neg(module):
         idle_ports = list(set(all_ports) ^ set(lldp_ports))
         cli = pn_cli(module)
         cli += ' switch-local port-config-modify port %s no-autoneg ' % ','.join(idle_ports)
-        module.run_command(cli)
+        run_in_session(module, cli)
         time.sleep(1)
 
         return "Auto-neg Configured"
@@ -716,26 +730,10 @@ def assign_ipv6_address(module, ipv6_address, current_switch, ip_type):
     global CHANGED_FLAG
     output = ''
 
-    leaf_list = module.params['pn_leaf_list']
-    spine_list = module.params['pn_spine_list']
-    cli = pn_cli(module)
-
-    if current_switch in spine_list:
-        count = spine_list.index(current_switch)
-    elif current_switch in leaf_list:
-        count = leaf_list.index(current_switch) + 2
-
     if ipv6_address:
-        ipv6 = ipv6_address.split('/')
-        subnet_ipv6 = ipv6[1]
-        ipv6 = ipv6[0]
-        ipv6 = ipv6.split(':')
-        if not ipv6[-1]:
-            ipv6[-1] = "0"
-        host_count_ipv6 = int(ipv6[-1], 16)
-        host_count_ipv6 += count
-        ipv6[-1] = str(hex(host_count_ipv6)[2:])
-        ipv6_ip = ':'.join(ipv6)
+        addresses = address_plan(module, {'mgmt_ipv6': ipv6_address})
+        ipv6_ip, subnet_ipv6 = addresses.switch(current_switch)[
+            'mgmt_ipv6'].split('/')
 
     cli = pn_cli(module)
     clicopy = cli
@@ -758,33 +756,16 @@ def assign_ipv6_address(module, ipv6_address, current_switch, ip_type):
 def assign_inband_ipv4(module):
 
     global CHANGED_FLAG
-    switches_list = []
     switch_ip = {}
-    spines = module.params['pn_spine_list']
-    leafs = module.params['pn_leaf_list']
     switch = module.params['pn_current_switch']
 
     if module.params['pn_inband_ipv4']:
-        address = module.params['pn_inband_ipv4'].split('.')
-        static_part = str(address[0]) + '.' + str(address[1]) + '.'
-        static_part += str(address[2]) + '.'
-        last_octet = str(address[3]).split('/')
-        subnet = last_octet[1]
-        count = int(last_octet[0])
+        addresses = address_plan(module,
+                                 {'inband_ip': module.params['pn_inband_ipv4']})
+        switch_ip[switch] = addresses.switch(switch)['inband_ip']
     else:
         return 'in-band ipv4 not specified '
 
-    if spines:
-        switches_list += spines
-
-    if leafs:
-        switches_list += leafs
-
-
-    for sw in switches_list:
-        switch_ip[sw] = static_part + str(count) + '/' + subnet
-        count += 1
-
     # Get existing in-band ip.
     cli = pn_cli(module)
     clicopy = cli
@@ -830,7 +811,8 @@ def main():
             pn_stp=dict(required=False, type='bool', default=True),
             pn_autotrunk=dict(required=False, type='str',
                               choices=['enable', 'disable']),
-            pn_autoneg=dict(required=False, type='bool')
+            pn_autoneg=dict(required=False, type='bool'),
+            pn_address_plan=dict(required=False, type='dict'),
         )
     )
 
@@ -876,7 +858,8 @@ def main():
             exception='',
             task='Fabric creation',
             failed=True,
-            changed=False
+            changed=False,
+            metrics=cli_metrics()
         )
     else:
         results.append({
@@ -978,7 +961,8 @@ def main():
         exception='',
         task='Fabric creation',
         failed=False,
-        changed=True if True in CHANGED_FLAG else False
+        changed=True if True in CHANGED_FLAG else False,
+        metrics=cli_metrics()
     )
 
 if __name__ == '__main__':
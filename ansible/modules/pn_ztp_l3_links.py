@@ -116,6 +116,38 @@ options:
       required: False
       default: False
       type: bool
+    pn_fabric_facts:
+      description:
+        - The pn_fabric fact returned by pn_fabric_facts, used instead of
+        querying vrouters, clusters and lldp neighbors again.
+      required: False
+      type: dict
+    pn_address_plan:
+      description:
+        - The pn_address_plan fact returned by pn_address_plan. When it was
+        computed for the same switches and ranges, with the link counts of
+        the leafs, the first link of the leaf is read from it instead of
+        counting the links of every preceding leaf.
+      required: False
+      type: dict
+    pn_link_ledger:
+      description:
+        - The links of the leaf recorded in the link ledger, with the ranges,
+          as passed by the pn_ztp_l3_links action plugin from its
+          pn_link_ledger_file. With list set the module only lists the links
+          of the leaf, for the plugin to number the new ones; otherwise
+          every link is addressed by its recorded number and the links of
+          the preceding leafs are not counted.
+      required: False
+      type: dict
+    pn_plan:
+      description:
+        - The plan returned by a check mode run of this task. Only the
+          planned commands are run, without comparing against the fabric
+          again.
+      required: False
+      type: list
+      default: []
 """
 
 EXAMPLES = """
@@ -157,6 +189,23 @@ msg:
   description: Indicates whether configuration made was successful or failed.
   returned: always
   type: str
+metrics:
+  description: Call count, wall time in seconds, bytes returned and error count
+  of the CLI commands run by the module, per command verb.
+  returned: always
+  type: dict
+plan:
+  description: Mutating commands run by the module in order, or in check mode
+  the commands it would run against the existing configuration.
+  returned: always
+  type: list
+link_ledger:
+  description: When pn_link_ledger asks for the links to be listed, the link
+  ranges and the links of the leaf keyed by spine, leaf and leaf port, plus
+  the numbers of the links of every leaf and the next free link number to
+  seed an empty ledger.
+  returned: success
+  type: dict
 """
 
 CHANGED_FLAG = []
@@ -171,7 +220,19 @@ def run_cli(module, cli):
     :return: Output/Error or Success msg depending upon the response from cli.
     """
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_in_session(module, cli)
+    return check_cli_output(module, cli, out, err)
+
+
+def check_cli_output(module, cli, out, err):
+    """
+    Method to interpret the response of a cli command.
+    :param module: The Ansible module to fetch input parameters.
+    :param cli: The executed cli command split into arguments.
+    :param out: Output of the cli command.
+    :param err: Error of the cli command.
+    :return: Output/Error or Success msg depending upon the response from cli.
+    """
     results = []
     if out:
         return out
@@ -189,7 +250,8 @@ def run_cli(module, cli):
             summary=results,
             task='Configure L3 ZTP',
             msg='L3 ZTP configuration failed',
-            changed=False
+            changed=False,
+            metrics=cli_metrics()
         )
     else:
         return 'Success'
@@ -207,8 +269,10 @@ def modify_stp(module, modify_flag, switch):
     clicopy = cli
 
     cli = clicopy
-    cli += ' switch %s stp-show format enable ' % switch
-    current_state = run_cli(module, cli).split()[1]
+    cli += ' switch %s stp-show ' % switch
+    current_state = None
+    for stp in show_records(module, run_cli, cli, ('enable',), ('switch',)):
+        current_state = stp.enable
     if current_state != 'yes':
         cli = clicopy
         cli += ' switch ' + switch
@@ -289,8 +353,14 @@ def create_interface(module, switch, ip_ipv4, ip_ipv6, port, addr_type):
     global CHANGED_FLAG
     cli = pn_cli(module)
     clicopy = cli
-    cli += ' vrouter-show location %s format name no-show-headers ' % switch
-    vrouter_name = run_cli(module, cli).split()[0]
+    vrouter_name = fabric_snapshot(module, run_cli, clicopy).vrouter(switch)
+    if vrouter_name is None:
+        if not module.check_mode:
+            cli = clicopy + ' vrouter-show location %s' % switch
+            check_cli_output(module, cli.split(), '',
+                             'No vrouter found on %s\n' % switch)
+        # Only planned by pn_ztp_vrouter_setup in check mode.
+        vrouter_name = switch + '-vrouter'
 
     if addr_type == 'ipv4':
         ip = ip_ipv4
@@ -302,9 +372,10 @@ def create_interface(module, switch, ip_ipv4, ip_ipv6, port, addr_type):
 
     cli = clicopy
     cli += ' vrouter-interface-show l3-port %s ip %s ' % (port, ip)
-    cli += ' format switch no-show-headers '
-    existing_vrouter = run_cli(module, cli).split()
-    existing_vrouter = list(set(existing_vrouter))
+    existing_vrouter = set(
+        interface.vrouter_name for interface in
+        show_records(module, run_cli, cli, ('switch',), ('vrouter-name',))
+    )
 
     point_to_point = False
     if vrouter_name not in existing_vrouter:
@@ -330,8 +401,11 @@ def create_interface(module, switch, ip_ipv4, ip_ipv6, port, addr_type):
         if config_args or point_to_point:
             cli = clicopy
             cli += ' vrouter-interface-show vrouter-name ' + vrouter_name
-            cli += ' l3-port %s format nic no-show-headers ' % port
-            nic = run_cli(module, cli).split()[1]
+            cli += ' l3-port %s ' % port
+            for interface in show_records(module, run_cli, cli, ('nic',),
+                                          ('vrouter-name',)):
+                nic = interface.nic
+                break
 
             cli = clicopy
             cli += ' vrouter-interface-config-add '
@@ -359,21 +433,28 @@ def create_interface(module, switch, ip_ipv4, ip_ipv6, port, addr_type):
     return output
 
 
-def modify_auto_trunk_setting(module, switch, flag):
+def modify_auto_trunk_setting(module, switch_list, flag):
     """
-    Method to enable/disable auto trunk setting of a switch.
+    Method to enable/disable auto trunk setting of switches, concurrently.
     :param module: The Ansible module to fetch input parameters.
-    :param switch: Name of the local switch.
+    :param switch_list: Names of the switches.
     :param flag: Enable/disable flag for the cli command.
-    :return: The output of run_cli() method.
+    :return: List of outputs of run_cli() method, in switch order.
     """
-    cli = pn_cli(module)
     if flag.lower() == 'enable':
-        cli += ' switch %s system-settings-modify auto-trunk ' % switch
-        return run_cli(module, cli)
+        setting = 'auto-trunk'
     elif flag.lower() == 'disable':
-        cli += ' switch %s system-settings-modify no-auto-trunk ' % switch
-        return run_cli(module, cli)
+        setting = 'no-auto-trunk'
+    else:
+        return []
+
+    with CliExecutor(module, check=check_cli_output) as executor:
+        for switch in switch_list:
+            cli = pn_cli(module)
+            cli += ' switch %s system-settings-modify %s ' % (switch, setting)
+            executor.add(cli)
+
+    return executor.results
 
 
 def delete_trunk(module, switch, switch_port, peer_switch):
@@ -390,10 +471,12 @@ def delete_trunk(module, switch, switch_port, peer_switch):
 
     cli += ' switch %s port-show port %s hostname %s ' % (switch, switch_port,
                                                           peer_switch)
-    cli += ' format trunk no-show-headers '
-    trunk = run_cli(module, cli).split()
-    trunk = list(set(trunk))
-    if 'Success' not in trunk and len(trunk) > 0:
+    trunk = sorted(set(
+        port.trunk for port in
+        show_records(module, run_cli, cli, ('trunk',), ('switch',))
+        if port.trunk
+    ))
+    if len(trunk) > 0:
         cli = clicopy
         cli += ' switch %s trunk-delete name %s ' % (switch, trunk[0])
         if 'Success' in run_cli(module, cli):
@@ -413,36 +496,242 @@ def finding_initial_ip(module, current_switch, leaf_list):
     """
     spine_list = list(module.params['pn_spine_list'])
     spine_list = [x.strip() for x in spine_list]
-    spines = ','.join(spine_list)
     count_output = 0
 
     cli = pn_cli(module)
-    clicopy = cli
 
     for leaf in leaf_list:
         if leaf.strip() == current_switch.strip():
             break
-        cli = clicopy
-        cli += " switch %s port-show hostname %s count-output | grep Count" %  (leaf, spines)
-        count_output += int(run_cli(module, cli).split(':')[1].strip())
+        count_output += count_spine_links(module, run_cli, cli, leaf,
+                                          spine_list)
 
     return count_output
 
 
+def link_range_exhausted(module, family):
+    """
+    Method to fail the module when the link address range is used up.
+    :param module: The Ansible module to fetch input parameters.
+    :param family: Address family of the range, ipv4 or ipv6.
+    """
+    msg = 'Error: %s range exhausted' % family
+    results = {
+        'switch': '',
+        'output': msg
+    }
+    module.exit_json(
+        unreachable=False,
+        failed=True,
+        exception=msg,
+        summary=results,
+        task='L3 ZTP',
+        msg='L3 ZTP failed',
+        changed=False,
+        metrics=cli_metrics()
+    )
+
+
+def take_link(module, links, family, number=None):
+    """
+    Method to get the addresses of the next link of the range, or of the
+    given link.
+    :param module: The Ansible module to fetch input parameters.
+    :param links: The LinkAllocator of the range.
+    :param family: Address family of the range, ipv4 or ipv6.
+    :param number: Number of the link, None for the next link.
+    :return: Tuple of the spine and leaf addresses of the link.
+    """
+    try:
+        if number is None:
+            return next(links)
+        return links.link(number)
+    except (StopIteration, IndexError):
+        link_range_exhausted(module, family)
+
+
+def check_link_ledger(module, ledger, ranges):
+    """
+    Method to check the link ledger was recorded for the link ranges in
+    use, and record the ranges it has none for.
+    :param module: The Ansible module to fetch input parameters.
+    :param ledger: The pn_link_ledger dictionary.
+    :param ranges: Dictionary of the link ranges in use.
+    """
+    recorded = ledger.setdefault('ranges', {})
+    normal = FabricAddressPlan.normalize(ranges)
+    for key in ranges:
+        if recorded.get(key) and recorded[key] != normal[key]:
+            msg = 'Error: link ledger was recorded for %s range %s' % (
+                key.split('_')[1], '/'.join(recorded[key][:2]))
+            module.exit_json(
+                unreachable=False,
+                failed=True,
+                exception=msg,
+                summary={'switch': '', 'output': msg},
+                task='L3 ZTP',
+                msg='L3 ZTP failed',
+                changed=False,
+                metrics=cli_metrics()
+            )
+        recorded[key] = normal[key]
+
+
+def switch_name(name):
+    """
+    Method to normalize a switch name the way the link ledger keys it.
+    :param name: Name of the switch, as given in the task.
+    :return: The name without surrounding whitespace.
+    """
+    return name.strip()
+
+
+def ledger_key(spine, leaf, port):
+    """
+    Method to get the key of a link in the link ledger.
+    :param spine: Name of the spine.
+    :param leaf: Name of the leaf.
+    :param port: The leaf port of the link.
+    :return: The key string.
+    """
+    return '%s,%s,%s' % (switch_name(spine), switch_name(leaf), port)
+
+
+def ledger_link_number(module, ledger, spine, leaf, port):
+    """
+    Method to get the number of a link from the link ledger.
+    :param module: The Ansible module to fetch input parameters.
+    :param ledger: The pn_link_ledger dictionary.
+    :param spine: Name of the spine.
+    :param leaf: Name of the leaf.
+    :param port: The leaf port of the link.
+    :return: The link number.
+    """
+    key = ledger_key(spine, leaf, port)
+    links = ledger.get('links', {})
+    if key not in links:
+        # The link came up after the action plugin numbered the links.
+        msg = 'Error: link %s has no number in the link ledger, ' \
+              'run the task again' % key
+        module.exit_json(
+            unreachable=False,
+            failed=True,
+            exception=msg,
+            summary={'switch': leaf, 'output': msg},
+            task='L3 ZTP',
+            msg='L3 ZTP failed',
+            changed=False,
+            metrics=cli_metrics()
+        )
+    return int(links[key])
+
+
+def spine_ports(module, leaf, spine):
+    """
+    Method to get the ports of a leaf connected to a spine.
+    :param module: The Ansible module to fetch input parameters.
+    :param leaf: Name of the leaf.
+    :param spine: Name of the spine.
+    :return: Sorted list of the leaf ports, the order their links are
+    numbered in.
+    """
+    cli = pn_cli(module)
+    cli += ' switch %s port-show hostname %s ' % (leaf, spine)
+    cli += ' format port no-show-headers '
+    ports = sorted(set(run_cli(module, cli).split()))
+    if 'Success' in ports:
+        return []
+    return ports
+
+
+def link_ranges(module):
+    """
+    Method to get the link ranges in use.
+    :param module: The Ansible module to fetch input parameters.
+    :return: Dictionary of the link_ipv4 and link_ipv6 ranges.
+    """
+    addr_type = module.params['pn_addr_type']
+    ranges = {}
+    if addr_type == 'ipv4' or addr_type == 'ipv4_ipv6':
+        ranges['link_ipv4'] = [module.params['pn_net_address_ipv4'],
+                               module.params['pn_cidr_ipv4'],
+                               module.params['pn_subnet_ipv4']]
+    if addr_type == 'ipv6' or addr_type == 'ipv4_ipv6':
+        ranges['link_ipv6'] = [module.params['pn_net_address_ipv6'],
+                               module.params['pn_cidr_ipv6'],
+                               module.params['pn_subnet_ipv6']]
+    return ranges
+
+
+def seed_link_ledger(module, addresses, spine_list, leaf_list):
+    """
+    Method to number the links of every leaf as they are numbered without a
+    link ledger, from the address plan or the link counts of the preceding
+    leafs, so an empty ledger keeps the links configured before it.
+    :param module: The Ansible module to fetch input parameters.
+    :param addresses: The FabricAddressPlan of the link ranges.
+    :param spine_list: The list of all spines.
+    :param leaf_list: The list of all leafs.
+    :return: Tuple of the dictionary of link numbers by ledger key and the
+    next free link number.
+    """
+    cli = pn_cli(module)
+    links = {}
+    next_number = count_output = 0
+    spine_list = [switch_name(spine) for spine in spine_list]
+    for leaf in [switch_name(leaf) for leaf in leaf_list]:
+        first = addresses.first_link(leaf)
+        if first is None:
+            first = count_output
+        count_output += count_spine_links(module, run_cli, cli, leaf,
+                                          spine_list)
+        number = first
+        for spine in spine_list:
+            for port in spine_ports(module, leaf, spine):
+                links[ledger_key(spine, leaf, port)] = number
+                number += 1
+        next_number = max(next_number, number, count_output)
+    return links, next_number
+
+
+def list_ledger_links(module, ledger):
+    """
+    Method to list the links of the current leaf for the link ledger,
+    without configuring them. The action plugin numbers the new ones under
+    the ledger lock.
+    :param module: The Ansible module to fetch input parameters.
+    :param ledger: The pn_link_ledger dictionary.
+    :return: Dictionary of the link ranges and the keys of the leaf links,
+    with the seed links and next free number when asked for.
+    """
+    spine_list = [switch_name(spine) for spine in module.params['pn_spine_list']]
+    leaf_list = [switch_name(leaf) for leaf in module.params['pn_leaf_list']]
+    current_switch = switch_name(module.params['pn_current_switch'])
+    ranges = link_ranges(module)
+    check_link_ledger(module, ledger, ranges)
+
+    listed = {'ranges': ledger['ranges'], 'links': []}
+    if current_switch in leaf_list:
+        listed['links'] = [ledger_key(spine, current_switch, port)
+                           for spine in spine_list
+                           for port in spine_ports(module, current_switch,
+                                                   spine)]
+    if ledger.get('seed'):
+        listed['seed'], listed['next'] = seed_link_ledger(
+            module, address_plan(module, ranges), spine_list, leaf_list)
+    return listed
+
+
 def auto_configure_link_ips(module):
     """
     Method to auto configure link IPs for layer3 fabric.
     :param module: The Ansible module to fetch input parameters.
     :return: String describing output of configuration.
     """
-    spine_list = module.params['pn_spine_list']
-    leaf_list = module.params['pn_leaf_list']
+    spine_list = [switch_name(spine) for spine in module.params['pn_spine_list']]
+    leaf_list = [switch_name(leaf) for leaf in module.params['pn_leaf_list']]
     addr_type = module.params['pn_addr_type']
-    if addr_type == 'ipv4' or addr_type == 'ipv4_ipv6':
-        subnet_ipv4 = module.params['pn_subnet_ipv4']
-    if addr_type == 'ipv6' or addr_type == 'ipv4_ipv6':
-        subnet_ipv6 = module.params['pn_subnet_ipv6']
-    current_switch = module.params['pn_current_switch']
+    current_switch = switch_name(module.params['pn_current_switch'])
     output = ''
 
     cli = pn_cli(module)
@@ -450,69 +739,47 @@ def auto_configure_link_ips(module):
 
     if current_switch in leaf_list:
         # Disable auto trunk on all switches.
-        modify_auto_trunk_setting(module, current_switch, 'disable')
-        for spine in spine_list:
-            # Disable auto trunk.
-            modify_auto_trunk_setting(module, spine, 'disable')
+        modify_auto_trunk_setting(module, [current_switch] + spine_list,
+                                  'disable')
 
         # Get the list of available link ips to assign.
-        count_output = finding_initial_ip(module, current_switch, leaf_list)
+        ranges = link_ranges(module)
+        addresses = address_plan(module, ranges)
+
+        # With a ledger every link has the number the action plugin gave
+        # it. Without a ledger the leaf's links follow the links of the
+        # preceding leafs.
+        ledger = module.params['pn_link_ledger']
+        if ledger is not None:
+            check_link_ledger(module, ledger, ranges)
+            count_output = 0
+        else:
+            count_output = addresses.first_link(current_switch)
+            if count_output is None:
+                count_output = finding_initial_ip(module, current_switch, leaf_list)
         if addr_type == 'ipv4' or addr_type == 'ipv4_ipv6':
-            count = 0
-            available_ips_ipv4 = calculate_link_ip_addresses_ipv4(module.params['pn_net_address_ipv4'],
-                                                                  module.params['pn_cidr_ipv4'],
-                                                                  subnet_ipv4)
-
-            diff = 32 - int(subnet_ipv4)
-            count = (1 << diff) - 4
-            count = (count + 2) if count > 0 else 2
-            count = count * count_output
-            available_ips_ipv4 = available_ips_ipv4[count:]
-
-        # Get the list of available link ips to assign.
+            available_ips_ipv4 = addresses.allocator('link_ipv4').seek(count_output)
         if addr_type == 'ipv6' or addr_type == 'ipv4_ipv6':
-            get_count = 2 if subnet_ipv6 == '127' else 3
-            available_ips_ipv6 = calculate_link_ip_addresses_ipv6(module.params['pn_net_address_ipv6'],
-                                                                  module.params['pn_cidr_ipv6'],
-                                                                  subnet_ipv6, get_count)
-            for i in range(count_output):
-                available_ips_ipv6.next()
+            available_ips_ipv6 = addresses.allocator('link_ipv6').seek(count_output)
 
         for spine in spine_list:
-            cli = clicopy
-            cli += ' switch %s port-show hostname %s ' % (current_switch, spine)
-            cli += ' format port no-show-headers '
-            leaf_port = run_cli(module, cli).split()
-            leaf_port = list(set(leaf_port))
-
-            if 'Success' in leaf_port:
-                continue
+            leaf_port = spine_ports(module, current_switch, spine)
 
             while len(leaf_port) > 0:
                 ip_ipv6 = ''
                 ip_ipv4 = ''
-                if addr_type == 'ipv6' or addr_type == 'ipv4_ipv6':
-                    try:
-                        ip_list = available_ips_ipv6.next()
-                    except:
-                        msg = 'Error: ipv6 range exhausted'
-                        results = {
-                            'switch': '',
-                            'output': msg
-                        }
-                        module.exit_json(
-                            unreachable=False,
-                            failed=True,
-                            exception=msg,
-                            summary=results,
-                            task='L3 ZTP',
-                            msg='L3 ZTP failed',
-                            changed=False
-                        )
-                    ip_ipv6 = (ip_list[0] if subnet_ipv6 == '127' else ip_list[1])
-
                 lport = leaf_port[0]
 
+                number = None
+                if ledger is not None:
+                    number = ledger_link_number(module, ledger, spine,
+                                                current_switch, lport)
+
+                if addr_type == 'ipv6' or addr_type == 'ipv4_ipv6':
+                    ip_list = take_link(module, available_ips_ipv6, 'ipv6',
+                                        number)
+                    ip_ipv6 = ip_list[0]
+
                 cli = clicopy
                 cli += ' switch %s port-show port %s ' % (current_switch, lport)
                 cli += ' format rport no-show-headers '
@@ -521,35 +788,26 @@ def auto_configure_link_ips(module):
                 rport = rport[0]
 
                 if addr_type == 'ipv4' or addr_type == 'ipv4_ipv6':
-                    ip_ipv4 = available_ips_ipv4[0]
-                    available_ips_ipv4.remove(ip_ipv4)
+                    ip_list_ipv4 = take_link(module, available_ips_ipv4, 'ipv4',
+                                             number)
+                    ip_ipv4 = ip_list_ipv4[0]
 
                 delete_trunk(module, spine, rport, current_switch)
                 output += create_interface(module, spine, ip_ipv4, ip_ipv6, rport, addr_type)
 
                 leaf_port.remove(lport)
                 if addr_type == 'ipv6' or addr_type == 'ipv4_ipv6':
-                    ip_ipv6 = (ip_list[1] if subnet_ipv6 == '127' else ip_list[2])
+                    ip_ipv6 = ip_list[1]
 
                 if addr_type == 'ipv4' or addr_type == 'ipv4_ipv6':
-                    ip_ipv4 = available_ips_ipv4[0]
-                    available_ips_ipv4.remove(ip_ipv4)
-                    ip_count = 0
-                    diff = 32 - int(subnet_ipv4)
-                    count = (1 << diff) - 4
-                    if count > 0:
-                        while ip_count < count:
-                            available_ips_ipv4.pop(0)
-                            ip_count += 1
+                    ip_ipv4 = ip_list_ipv4[1]
 
                 delete_trunk(module, current_switch, lport, spine)
                 output += create_interface(module, current_switch, ip_ipv4, ip_ipv6, lport, addr_type)
 
         # Enable auto trunk on all switches.
-        modify_auto_trunk_setting(module, current_switch, 'enable')
-        for spine in spine_list:
-            # Enable auto trunk.
-            modify_auto_trunk_setting(module, spine, 'enable')
+        modify_auto_trunk_setting(module, [current_switch] + spine_list,
+                                  'enable')
 
     return output
 
@@ -579,9 +837,46 @@ def main():
             pn_bfd_multiplier=dict(required=False, type='str'),
             pn_stp=dict(required=False, type='bool', default=False),
             pn_jumbo_frames=dict(required=False, type='bool', default=False),
-        )
+            pn_fabric_facts=dict(required=False, type='dict'),
+            pn_address_plan=dict(required=False, type='dict'),
+            pn_link_ledger=dict(required=False, type='dict'),
+            pn_plan=dict(required=False, type='list', default=[]),
+        ),
+        supports_check_mode=True
     )
 
+    # The module polls no state, see memoize_shows().
+    memoize_shows(True)
+
+    if module.params['pn_plan']:
+        plan = module.params['pn_plan']
+        apply_cli_plan(module, plan, check_cli_output)
+        module.exit_json(
+            unreachable=False,
+            msg='L3 ZTP configuration succeeded',
+            summary=[{'switch': '', 'output': command} for command in plan],
+            exception='',
+            failed=False,
+            changed=True,
+            task='Configure L3 ZTP',
+            plan=cli_plan(),
+            metrics=cli_metrics()
+        )
+
+    ledger = module.params['pn_link_ledger']
+    if ledger is not None and ledger.get('list'):
+        module.exit_json(
+            unreachable=False,
+            msg='L3 ZTP links listed',
+            summary=[],
+            exception='',
+            failed=False,
+            changed=False,
+            task='Configure L3 ZTP',
+            link_ledger=list_ledger_links(module, ledger),
+            metrics=cli_metrics()
+        )
+
     global CHANGED_FLAG
 
     # L3 setup (link ips)
@@ -595,6 +890,9 @@ def main():
     if module.params['pn_stp']:
         message += modify_stp(module, 'enable', module.params['pn_current_switch'])
 
+    if True in CHANGED_FLAG:
+        invalidate_fabric_facts(module, run_cli, pn_cli(module))
+
     message_string = message
     results = []
     switch_list = module.params['pn_spine_list'] + module.params['pn_leaf_list']
@@ -617,7 +915,9 @@ def main():
         exception='',
         failed=False,
         changed=True if True in CHANGED_FLAG else False,
-        task='Configure L3 ZTP'
+        task='Configure L3 ZTP',
+        plan=cli_plan(),
+        metrics=cli_metrics()
     )
 
 if __name__ == '__main__':
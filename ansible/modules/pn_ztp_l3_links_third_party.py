@@ -465,6 +465,28 @@ def finding_initial_ip(module, current_switch, leaf_list):
     return count_output
 
 
+def link_range_exhausted(module, family):
+    """
+    Method to fail the module when the link address range is used up.
+    :param module: The Ansible module to fetch input parameters.
+    :param family: Address family of the range, ipv4 or ipv6.
+    """
+    msg = 'Error: %s range exhausted' % family
+    results = {
+        'switch': '',
+        'output': msg
+    }
+    module.exit_json(
+        unreachable=False,
+        failed=True,
+        exception=msg,
+        summary=results,
+        task='L3 ZTP',
+        msg='L3 ZTP failed',
+        changed=False
+    )
+
+
 def auto_configure_link_ips(module):
     """
     Method to auto configure link IPs for layer3 fabric.
@@ -489,22 +511,17 @@ def auto_configure_link_ips(module):
         # Get the list of available link ips to assign.
         count_output = finding_initial_ip(module, current_switch, leaf_list)
         if addr_type == 'ipv4' or addr_type == 'ipv4_ipv6':
-            count = 0
-            available_ips_ipv4 = calculate_link_ip_addresses_ipv4(module.params['pn_net_address_ipv4'],
-                                                                  module.params['pn_cidr_ipv4'],
-                                                                  subnet_ipv4)
-
-            available_ips_ipv4 = available_ips_ipv4[count_output:]
+            # count_output counts two addresses per link.
+            available_ips_ipv4 = Ipv4LinkAllocator(module.params['pn_net_address_ipv4'],
+                                                   module.params['pn_cidr_ipv4'],
+                                                   subnet_ipv4).seek(count_output // 2)
 
         # Get the list of available link ips to assign.
         if addr_type == 'ipv6' or addr_type == 'ipv4_ipv6':
-            get_count = 2 if subnet_ipv6 == '127' else 3
-            available_ips_ipv6 = calculate_link_ip_addresses_ipv6(module.params['pn_net_address_ipv6'],
-                                                                  module.params['pn_cidr_ipv6'],
-                                                                  subnet_ipv6, get_count)
-
-            for i in range(count_output - (leaf_list.index(current_switch) * 2)):
-                available_ips_ipv6.next()
+            available_ips_ipv6 = Ipv6LinkAllocator(module.params['pn_net_address_ipv6'],
+                                                   module.params['pn_cidr_ipv6'],
+                                                   subnet_ipv6)
+            available_ips_ipv6.seek(count_output - (leaf_list.index(current_switch) * 2))
 
         for spine in spine_list:
             cli = clicopy
@@ -521,23 +538,10 @@ def auto_configure_link_ips(module):
                 ip_ipv4 = ''
                 if addr_type == 'ipv6' or addr_type == 'ipv4_ipv6':
                     try:
-                        ip_list = available_ips_ipv6.next()
-                    except:
-                        msg = 'Error: ipv6 range exhausted'
-                        results = {
-                            'switch': '',
-                            'output': msg
-                        }
-                        module.exit_json(
-                            unreachable=False,
-                            failed=True,
-                            exception=msg,
-                            summary=results,
-                            task='L3 ZTP',
-                            msg='L3 ZTP failed',
-                            changed=False
-                        )
-                    ip_ipv6 = (ip_list[0] if subnet_ipv6 == '127' else ip_list[1])
+                        ip_list = next(available_ips_ipv6)
+                    except StopIteration:
+                        link_range_exhausted(module, 'ipv6')
+                    ip_ipv6 = ip_list[0]
 
                 lport = leaf_port[0]
 
@@ -549,23 +553,18 @@ def auto_configure_link_ips(module):
                 rport = rport[0]
 
                 if addr_type == 'ipv4' or addr_type == 'ipv4_ipv6':
-                    ip_ipv4 = available_ips_ipv4[0]
-                    available_ips_ipv4.remove(ip_ipv4)
+                    try:
+                        ip_list_ipv4 = next(available_ips_ipv4)
+                    except StopIteration:
+                        link_range_exhausted(module, 'ipv4')
+                    ip_ipv4 = ip_list_ipv4[0]
 
                 leaf_port.remove(lport)
                 if addr_type == 'ipv6' or addr_type == 'ipv4_ipv6':
-                    ip_ipv6 = (ip_list[1] if subnet_ipv6 == '127' else ip_list[2])
+                    ip_ipv6 = ip_list[1]
 
                 if addr_type == 'ipv4' or addr_type == 'ipv4_ipv6':
-                    ip_ipv4 = available_ips_ipv4[0]
-                    available_ips_ipv4.remove(ip_ipv4)
-                    ip_count = 0
-                    diff = 32 - int(subnet_ipv4)
-                    count = (1 << diff) - 4
-                    if count > 0:
-                        while ip_count < count:
-                            available_ips_ipv4.pop(0)
-                            ip_count += 1
+                    ip_ipv4 = ip_list_ipv4[1]
 
                 delete_trunk(module, current_switch, lport, spine)
                 output += create_interface(module, current_switch, ip_ipv4, ip_ipv6, lport, addr_type)
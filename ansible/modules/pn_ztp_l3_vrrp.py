@@ -45,6 +45,14 @@ options:
         - String containing vrrp data parsed from csv file.
       required: False
       type: str
+    pn_plan:
+      description:
+        - The plan returned by a check mode run of this task. Only the
+          planned commands are run, without comparing against the fabric
+          again.
+      required: False
+      type: list
+      default: []
 """
 
 EXAMPLES = """
@@ -84,6 +92,16 @@ msg:
   description: Indicates whether configuration made was successful or failed.
   returned: always
   type: str
+metrics:
+  description: Call count, wall time in seconds, bytes returned and error count
+  of the CLI commands run by the module, per command verb.
+  returned: always
+  type: dict
+plan:
+  description: Mutating commands run by the module in order, or in check mode
+  the commands it would run against the existing configuration.
+  returned: always
+  type: list
 """
 
 CHANGED_FLAG = []
@@ -98,7 +116,19 @@ def run_cli(module, cli):
     :return: Output/Error or Success msg depending upon the response from cli.
     """
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_in_session(module, cli)
+    return check_cli_output(module, cli, out, err)
+
+
+def check_cli_output(module, cli, out, err):
+    """
+    Method to interpret the response of a cli command.
+    :param module: The Ansible module to fetch input parameters.
+    :param cli: The executed cli command split into arguments.
+    :param out: Output of the cli command.
+    :param err: Error of the cli command.
+    :return: Output/Error or Success msg depending upon the response from cli.
+    """
     results = []
     if out:
         return out
@@ -116,7 +146,8 @@ def run_cli(module, cli):
             summary=results,
             task='Configure L3 vrrp',
             msg='L3 vrrp configuration failed',
-            changed=False
+            changed=False,
+            metrics=cli_metrics()
         )
     else:
         return 'Success'
@@ -134,9 +165,11 @@ def create_vlan(module, vlan_id, switch):
     global CHANGED_FLAG
     cli = pn_cli(module)
     clicopy = cli
-    cli += ' vlan-show format id no-show-headers '
-    existing_vlan_ids = run_cli(module, cli).split()
-    existing_vlan_ids = list(set(existing_vlan_ids))
+    cli += ' vlan-show '
+    existing_vlan_ids = set(
+        vlan.id for vlan in
+        show_records(module, run_cli, cli, ('id',), ('switch',))
+    )
 
     if vlan_id not in existing_vlan_ids:
         cli = clicopy
@@ -170,9 +203,10 @@ def create_vrouter_interface(module, switch, vlan_id, vrrp_id,
     cli = pn_cli(module)
     clicopy = cli
     cli += ' vrouter-interface-show vlan %s ip %s ' % (vlan_id, list_ips[0])
-    cli += ' format switch no-show-headers '
-    existing_vrouter = run_cli(module, cli).split()
-    existing_vrouter = list(set(existing_vrouter))
+    existing_vrouter = set(
+        interface.vrouter_name for interface in
+        show_records(module, run_cli, cli, ('switch',), ('vrouter-name',))
+    )
 
     if vrouter_name not in existing_vrouter:
         cli = clicopy
@@ -201,18 +235,19 @@ def create_vrouter_interface(module, switch, vlan_id, vrrp_id,
     cli += ' vrouter-interface-show vrouter-name %s ip %s vlan %s ' % (
         vrouter_name, list_ips[0], vlan_id
     )
-    cli += ' format nic no-show-headers '
-    eth_port = run_cli(module, cli).split()
-    eth_port.remove(vrouter_name)
+    eth_port = [interface.nic for interface in
+                show_records(module, run_cli, cli, ('nic',), ('vrouter-name',))]
 
+    queue = CliQueue(module, check=check_cli_output)
     for ip_vip in list_vips:
         cli = clicopy
         cli += ' vrouter-interface-show vlan %s ip %s vrrp-primary %s ' % (
             vlan_id, ip_vip, eth_port[0]
         )
-        cli += ' format switch no-show-headers '
-        existing_vrouter = run_cli(module, cli).split()
-        existing_vrouter = list(set(existing_vrouter))
+        existing_vrouter = set(
+            interface.vrouter_name for interface in
+            show_records(module, run_cli, cli, ('switch',), ('vrouter-name',))
+        )
 
         if vrouter_name not in existing_vrouter:
             cli = clicopy
@@ -226,11 +261,12 @@ def create_vrouter_interface(module, switch, vlan_id, vrrp_id,
                 cli += ' mtu 9216'
             if module.params['pn_pim_ssm'] is True:
                 cli += ' pim-cluster '
-            run_cli(module, cli)
+            queue.add(cli)
             CHANGED_FLAG.append(True)
             output += ' %s: Added vrouter interface with ip %s to %s \n' % (
                 switch, ip_vip, vrouter_name
             )
+    queue.flush()
 
     if addr_type == 'ipv4' or addr_type == 'ipv4_ipv6':
         ipv4 = list_ips[0]
@@ -262,13 +298,13 @@ def create_vrouter_interface(module, switch, vlan_id, vrrp_id,
         cli = clicopy
         cli += 'vrouter-interface-show vrouter-name %s' % vrouter_name
         if addr_type == 'ipv4_ipv6':
-            cli += ' ip2 %s format nic no-show-headers ' % ipv6
+            cli += ' ip2 %s ' % ipv6
         if addr_type == 'ipv6':
-            cli += ' ip %s format nic no-show-headers ' % ipv6
-        nic = run_cli(module, cli).split()
-        nic = list(set(nic))
-        nic.remove(vrouter_name)
-        nic = nic[0]
+            cli += ' ip %s ' % ipv6
+        for interface in show_records(module, run_cli, cli, ('nic',),
+                                      ('vrouter-name',)):
+            nic = interface.nic
+            break
 
         cli = clicopy
         cli += 'vrouter-ospf6-show nic %s format switch no-show-headers ' % nic
@@ -504,9 +540,29 @@ def main():
             pn_addr_type=dict(required=False, type='str',
                               choices=['ipv4', 'ipv6', 'ipv4_ipv6'],
                               default='ipv4'),
-        )
+            pn_plan=dict(required=False, type='list', default=[]),
+        ),
+        supports_check_mode=True
     )
 
+    # The module polls no state, see memoize_shows().
+    memoize_shows(True)
+
+    if module.params['pn_plan']:
+        plan = module.params['pn_plan']
+        apply_cli_plan(module, plan, check_cli_output)
+        module.exit_json(
+            unreachable=False,
+            msg='L3 vrrp configuration succeeded',
+            summary=[{'switch': '', 'output': command} for command in plan],
+            exception='',
+            failed=False,
+            changed=True,
+            task='Configure L3 vrrp',
+            plan=cli_plan(),
+            metrics=cli_metrics()
+        )
+
     global CHANGED_FLAG
     message = ''
     leaf_list = module.params['pn_leaf_list']
@@ -537,7 +593,9 @@ def main():
         summary=results,
         exception='',
         failed=False,
-        changed=True if True in CHANGED_FLAG else False
+        changed=True if True in CHANGED_FLAG else False,
+        plan=cli_plan(),
+        metrics=cli_metrics()
     )
 
 
@@ -101,6 +101,27 @@ options:
       required: False
       default: False
       type: bool
+    pn_fabric_facts:
+      description:
+        - The pn_fabric fact returned by pn_fabric_facts, used instead of
+        querying vrouters, clusters and lldp neighbors again.
+      required: False
+      type: dict
+    pn_address_plan:
+      description:
+        - The pn_address_plan fact returned by pn_address_plan, used instead
+        of numbering the iOSPF ips again when computed for the same switches
+        and ranges.
+      required: False
+      type: dict
+    pn_plan:
+      description:
+        - The plan returned by a check mode run of this task. Only the
+          planned commands are run, without comparing against the fabric
+          again.
+      required: False
+      type: list
+      default: []
 """
 
 EXAMPLES = """
@@ -139,6 +160,16 @@ msg:
   description: Indicates whether configuration made was successful or failed.
   returned: always
   type: str
+metrics:
+  description: Call count, wall time in seconds, bytes returned and error count
+  of the CLI commands run by the module, per command verb.
+  returned: always
+  type: dict
+plan:
+  description: Mutating commands run by the module in order, or in check mode
+  the commands it would run against the existing configuration.
+  returned: always
+  type: list
 """
 
 CHANGED_FLAG = []
@@ -153,7 +184,19 @@ def run_cli(module, cli):
     :return: Output/Error or Success msg depending upon the response from cli.
     """
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_in_session(module, cli)
+    return check_cli_output(module, cli, out, err)
+
+
+def check_cli_output(module, cli, out, err):
+    """
+    Method to interpret the response of a cli command.
+    :param module: The Ansible module to fetch input parameters.
+    :param cli: The executed cli command split into arguments.
+    :param out: Output of the cli command.
+    :param err: Error of the cli command.
+    :return: Output/Error or Success msg depending upon the response from cli.
+    """
     results = []
     if out:
         return out
@@ -172,7 +215,8 @@ def run_cli(module, cli):
             task='Configure OSPF',
             stderr=err.strip(),
             msg='eBGP/OSPF configuration failed',
-            changed=False
+            changed=False,
+            metrics=cli_metrics()
         )
     else:
         return 'Success'
@@ -185,13 +229,10 @@ def find_non_clustered_leafs(module):
     :return: List of non clustered leaf switches.
     """
     non_clustered_leafs = []
-    cli = pn_cli(module)
-    cli += ' cluster-show format cluster-node-1,cluster-node-2 '
-    cli += ' no-show-headers '
-    clustered_nodes = list(set(run_cli(module, cli).split()))
+    snapshot = fabric_snapshot(module, run_cli, pn_cli(module))
 
     for leaf in module.params['pn_leaf_list']:
-        if leaf not in clustered_nodes:
+        if snapshot.cluster(leaf) is None:
             non_clustered_leafs.append(leaf)
 
     return non_clustered_leafs
@@ -241,11 +282,10 @@ def create_leaf_clusters(module):
             node1 = non_clustered_leafs[0]
             non_clustered_leafs.remove(node1)
 
-            cli = clicopy
-            cli += ' switch %s lldp-show ' % node1
-            cli += ' format sys-name no-show-headers '
-            system_names = run_cli(module, cli).split()
-            system_names = list(set(system_names))
+            system_names = list(set(
+                neighbor.sys_name for neighbor in
+                fabric_snapshot(module, run_cli, clicopy).lldp(node1)
+            ))
 
             cli = clicopy
             cli += ' switch %s fabric-node-show ' % node1
@@ -562,9 +602,14 @@ def vrouter_iospf_interface_add(module, switch_name, ip_addr, ip2_addr, ospf_are
 
     cli = pn_cli(module)
     clicopy = cli
-    cli += ' vrouter-show location %s format name' % switch_name
-    cli += ' no-show-headers'
-    vrouter = run_cli(module, cli).split()[0]
+    vrouter = fabric_snapshot(module, run_cli, clicopy).vrouter(switch_name)
+    if vrouter is None:
+        if not module.check_mode:
+            cli = clicopy + ' vrouter-show location %s' % switch_name
+            check_cli_output(module, cli.split(), '',
+                             'No vrouter found on %s\n' % switch_name)
+        # Only planned by pn_ztp_vrouter_setup in check mode.
+        vrouter = switch_name + '-vrouter'
 
     cli = clicopy
     cli += ' vrouter-interface-show ip %s vlan %s' % (ip_addr, vlan_id)
@@ -706,14 +751,12 @@ def assign_leafcluster_ospf_interface(module):
     cli = pn_cli(module)
     clicopy = cli
 
+    ranges = {}
     if addr_type == 'ipv4' or addr_type == 'ipv4_ipv6':
-        available_ips_ipv4 = calculate_link_ip_addresses_ipv4(iospf_v4_range, cidr_v4, subnet_v4)
-
+        ranges['iospf_ipv4'] = [iospf_v4_range, cidr_v4, subnet_v4]
     if addr_type == 'ipv6' or addr_type == 'ipv4_ipv6':
-        get_count = 2 if subnet_v6 == '127' else 3
-        available_ips_ipv6 = calculate_link_ip_addresses_ipv6(iospf_v6_range, cidr_v6, subnet_v6,
-                                                              get_count)
-
+        ranges['iospf_ipv6'] = [iospf_v6_range, cidr_v6, subnet_v6]
+    addresses = address_plan(module, ranges)
 
     cli += ' cluster-show format name no-show-headers '
     cluster_list = list(set(run_cli(module, cli).split()))
@@ -727,28 +770,19 @@ def assign_leafcluster_ospf_interface(module):
         point_to_point = False
         if subnet_v4 == '31' or subnet_v6 == '127':
             point_to_point = True
-        for cluster in cluster_list:
+        for number, cluster in enumerate(cluster_list):
             cli = clicopy
             cli += ' cluster-show name %s format cluster-node-1,' % cluster
             cli += 'ports,cluster-node-2,remote-ports no-show-headers'
             c_nod_1, c_por_1, c_nod_2, c_por_2 = run_cli(module, cli).splitlines()[0].split()
 
+            ips_ipv4, ips_ipv6 = addresses.iospf(number)
             if addr_type == 'ipv4' or addr_type == 'ipv4_ipv6':
-                ip_1, ip_2 = available_ips_ipv4[0:2]
-                available_ips_ipv4.remove(ip_1)
-                available_ips_ipv4.remove(ip_2)
+                ip_1, ip_2 = ips_ipv4
             if addr_type == 'ipv4_ipv6':
-                ip_list = available_ips_ipv6.next()
-                if subnet_v6 == '127':
-                    ip2_1, ip2_2 = ip_list[0:2]
-                else:
-                    ip2_1, ip2_2 = ip_list[1:3]
+                ip2_1, ip2_2 = ips_ipv6
             if addr_type == 'ipv6':
-                ip_list = available_ips_ipv6.next()
-                if subnet_v6 == '127':
-                    ip_1, ip_2 = ip_list[0:2]
-                else:
-                    ip_1, ip_2 = ip_list[1:3]
+                ip_1, ip_2 = ips_ipv6
             if c_nod_1 not in spine_list and c_nod_1 in leaf_list:
                 output += vrouter_iospf_vlan_ports_add(module, c_nod_1, c_por_1)
                 output += vrouter_iospf_interface_add(module, c_nod_1, ip_1, ip2_1,
@@ -854,9 +888,31 @@ def main():
             pn_addr_type=dict(required=False, type='str',
                               choices=['ipv4', 'ipv6', 'ipv4_ipv6'], default='ipv4'),
             pn_ospf_v6_area_id=dict(required=False, type='str', default='0.0.0.0'),
-        )
+            pn_fabric_facts=dict(required=False, type='dict'),
+            pn_address_plan=dict(required=False, type='dict'),
+            pn_plan=dict(required=False, type='list', default=[]),
+        ),
+        supports_check_mode=True
     )
 
+    # The module polls no state, see memoize_shows().
+    memoize_shows(True)
+
+    if module.params['pn_plan']:
+        plan = module.params['pn_plan']
+        apply_cli_plan(module, plan, check_cli_output)
+        module.exit_json(
+            unreachable=False,
+            msg='OSPF configuration succeeded',
+            summary=[{'switch': '', 'output': command} for command in plan],
+            exception='',
+            failed=False,
+            changed=True,
+            task='Configure OSPF',
+            plan=cli_plan(),
+            metrics=cli_metrics()
+        )
+
     global CHANGED_FLAG
     routing_protocol = module.params['pn_routing_protocol']
     current_switch = module.params['pn_current_switch']
@@ -874,6 +930,9 @@ def main():
     if current_switch in spine_list and spine_list.index(current_switch) == 0:
         message += assign_leafcluster_ospf_interface(module)
 
+    if True in CHANGED_FLAG:
+        invalidate_fabric_facts(module, run_cli, pn_cli(module))
+
     message_string = message
     results = []
     switch_list = spine_list + module.params['pn_leaf_list']
@@ -896,7 +955,9 @@ def main():
         exception='',
         failed=False,
         changed=True if True in CHANGED_FLAG else False,
-        task='Configure OSPF'
+        task='Configure OSPF',
+        plan=cli_plan(),
+        metrics=cli_metrics()
     )
 
 if __name__ == '__main__':
@@ -21,7 +21,9 @@
 import shlex
 
 from ansible.module_utils.basic import AnsibleModule
-from ansible.module_utils.pn_nvos import pn_cli
+from ansible.module_utils.pn_nvos import pn_cli, run_in_session, cli_metrics
+from ansible.module_utils.pn_nvos import fabric_snapshot, invalidate_fabric_facts
+from ansible.module_utils.pn_nvos import address_plan, memoize_shows
 
 DOCUMENTATION = """
 ---
@@ -45,6 +47,19 @@ options:
         - Specify loopback ip to be assigned to vrouters.
       required: False
       type: str
+    pn_fabric_facts:
+      description:
+        - The pn_fabric fact returned by pn_fabric_facts, used instead of
+        querying vrouters, clusters and lldp neighbors again.
+      required: False
+      type: dict
+    pn_address_plan:
+      description:
+        - The pn_address_plan fact returned by pn_address_plan, used instead
+        of numbering the loopback ips again when computed for the same
+        switches and ranges.
+      required: False
+      type: dict
 """
 
 EXAMPLES = """
@@ -83,6 +98,11 @@ msg:
   description: Indicates whether configuration made was successful or failed.
   returned: always
   type: str
+metrics:
+  description: Call count, wall time in seconds, bytes returned and error count
+  of the CLI commands run by the module, per command verb.
+  returned: always
+  type: dict
 """
 
 CHANGED_FLAG = []
@@ -97,7 +117,7 @@ def run_cli(module, cli):
     """
     results = []
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_in_session(module, cli)
 
     if out:
         return out
@@ -114,7 +134,8 @@ def run_cli(module, cli):
             summary=results,
             task='Create vrouter',
             msg='Vrouter creation failed',
-            changed=False
+            changed=False,
+            metrics=cli_metrics()
         )
     else:
         return None
@@ -133,26 +154,11 @@ def create_vrouter(module, switch):
     pn_ospf_redistribute = module.params['pn_ospf_redistribute']
     pn_pim_ssm = module.params['pn_pim_ssm']
 
-    cli = pn_cli(module)
-    cli += ' fabric-node-show format fab-name no-show-headers '
-    fabric_name = list(set(run_cli(module, cli).split()))[0]
-    vnet_name = fabric_name + '-global'
-
-    cli = pn_cli(module)
-    cli += ' vrouter-show format name no-show-headers '
-    existing_vrouter_names = run_cli(module, cli)
-
-    if existing_vrouter_names is not None:
-        existing_vrouter_names = existing_vrouter_names.split()
-
-    new_vrouter = False
+    snapshot = fabric_snapshot(module, run_cli, pn_cli(module))
+    vnet_name = snapshot.fabric_name + '-global'
     vrouter_name = switch + '-vrouter'
 
-    if (existing_vrouter_names is not None and vrouter_name not in
-            existing_vrouter_names):
-        new_vrouter = True
-
-    if new_vrouter or existing_vrouter_names is None:
+    if vrouter_name not in snapshot.vrouter_names():
         if pn_pim_ssm == True:
             pim_ssm = 'pim-ssm'
         else:
@@ -187,34 +193,18 @@ def assign_loopback_and_router_id(module, loopback_address, current_switch):
     global CHANGED_FLAG
     output = ''
 
-    leaf_list = module.params['pn_leaf_list']
-    spine_list = module.params['pn_spine_list']
-    address = loopback_address.split('.')
-    static_part = str(address[0]) + '.' + str(address[1]) + '.'
-    static_part += str(address[2]) + '.'
-    vrouter_count = int(address[3].split('/')[0])
     add_loopback = False
     vrouter = current_switch + '-vrouter'
     cli = pn_cli(module)
 
-    switch_list = spine_list + leaf_list
-
-    if current_switch in switch_list:
-        count = switch_list.index(current_switch)
+    addresses = address_plan(module, {
+        'loopback_ip': loopback_address,
+        'loopback_ipv6': module.params['pn_loopback_ip_v6'],
+    }).switch(current_switch)
 
     if module.params['pn_loopback_ip_v6']:
         add_loopback_v6 = False
-        loopback_ipv6 = module.params['pn_loopback_ip_v6']
-        ipv6 = loopback_ipv6.split('/')
-        subnet_ipv6 = ipv6[1]
-        ipv6 = ipv6[0]
-        ipv6 = ipv6.split(':')
-        if not ipv6[-1]:
-            ipv6[-1] = "0"
-        host_count_ipv6 = int(ipv6[-1], 16)
-        host_count_ipv6 += count
-        ipv6[-1] = str(hex(host_count_ipv6)[2:])
-        loopback_ipv6_ip = ':'.join(ipv6)
+        loopback_ipv6_ip = addresses['loopback_ipv6']
 
         # Check existing loopback ip v6
         cli = pn_cli(module)
@@ -236,8 +226,7 @@ def assign_loopback_and_router_id(module, loopback_address, current_switch):
             CHANGED_FLAG.append(True)
             output += '%s: Added loopback ip %s to %s\n' % (current_switch, loopback_ipv6_ip, vrouter)
 
-    count += vrouter_count
-    ip = static_part + str(count)
+    ip = addresses['loopback_ip']
 
     # Add router id
     cli = pn_cli(module)
@@ -289,9 +278,14 @@ def main():
                                       default='none'),
             pn_bgp_as=dict(required=False, type='str'),
             pn_loopback_ip_v6=dict(required=False, type='str'),
+            pn_fabric_facts=dict(required=False, type='dict'),
+            pn_address_plan=dict(required=False, type='dict'),
         )
     )
 
+    # The module polls no state, see memoize_shows().
+    memoize_shows(True)
+
     global CHANGED_FLAG
     results = []
     message = ''
@@ -304,6 +298,9 @@ def main():
     # Assign loopback ip to vrouters
     message += assign_loopback_and_router_id(module, loopback_address, current_switch)
 
+    if True in CHANGED_FLAG:
+        invalidate_fabric_facts(module, run_cli, pn_cli(module))
+
     replace_string = current_switch + ': '
     for line in message.splitlines():
         if replace_string in line:
@@ -320,7 +317,8 @@ def main():
         exception='',
         failed=False,
         changed=True if True in CHANGED_FLAG else False,
-        task='Create vrouter'
+        task='Create vrouter',
+        metrics=cli_metrics()
     )
 
 if __name__ == '__main__':
@@ -21,7 +21,8 @@
 import shlex
 
 from ansible.module_utils.basic import AnsibleModule
-from ansible.module_utils.pn_nvos import pn_cli
+from ansible.module_utils.pn_nvos import pn_cli, run_in_session, CliExecutor, cli_metrics
+from ansible.module_utils.pn_nvos import cli_plan, apply_cli_plan, memoize_shows
 from collections import OrderedDict
 
 DOCUMENTATION = """
@@ -76,6 +77,14 @@ options:
       required: False
       type: str
       default: ''
+    pn_plan:
+      description:
+        - The plan returned by a check mode run of this task. Only the
+          planned commands are run, without comparing against the fabric
+          again.
+      required: False
+      type: list
+      default: []
 """
 
 EXAMPLES = """
@@ -129,6 +138,16 @@ msg:
   description: Indicates whether configuration made was successful or failed.
   returned: always
   type: str
+metrics:
+  description: Call count, wall time in seconds, bytes returned and error count
+  of the CLI commands run by the module, per command verb.
+  returned: always
+  type: dict
+plan:
+  description: Mutating commands run by the module in order, or in check mode
+  the commands it would run against the existing configuration.
+  returned: always
+  type: list
 """
 
 CHANGED_FLAG = []
@@ -143,7 +162,19 @@ def run_cli(module, cli):
     :return: Output/Error or Success msg depending upon the response from cli.
     """
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_in_session(module, cli)
+    return check_cli_output(module, cli, out, err)
+
+
+def check_cli_output(module, cli, out, err):
+    """
+    Method to interpret the response of a cli command.
+    :param module: The Ansible module to fetch input parameters.
+    :param cli: The executed cli command split into arguments.
+    :param out: Output of the cli command.
+    :param err: Error of the cli command.
+    :return: Output/Error or Success msg depending upon the response from cli.
+    """
     results = []
     if out:
         return out
@@ -160,26 +191,26 @@ def run_cli(module, cli):
             summary=results,
             task='Configure VXLAN',
             msg='vxlan configuration failed',
-            changed=False
+            changed=False,
+            metrics=cli_metrics()
         )
     else:
         return 'Success'
 
 
-def tunnel_create_for_cluster_nodes(module, switch, peer_switch,
+def tunnel_create_for_cluster_nodes(module, executor, switch, peer_switch,
                                     local_ip, remote_ip, tunnel_name):
     """
-    Method to find ip of cluster node.
+    Method to queue the tunnel creation of a cluster node.
     :param module: The Ansible module to fetch input parameters.
+    :param executor: The CliExecutor running the commands.
     :param switch: The switch name.
     :param peer_switch: the remote switch.
     :param local_ip: ip of local switch.
     :param remote_ip: ip of peer switch.
     :param tunnel_name: Name of the tunnel.
-    :return: String describing if tunnel is created or not.
     """
     global CHANGED_FLAG
-    output = ''
     sw_name = switch[:-8]
     cli = pn_cli(module)
     clicopy = cli
@@ -194,25 +225,22 @@ def tunnel_create_for_cluster_nodes(module, switch, peer_switch,
         cli += ' remote-ip %s vrouter-name ' % remote_ip
         cli += ' %s peer-vrouter-name ' % switch
         cli += ' %s ' % (peer_switch[sw_name]+'-vrouter')
-        run_cli(module, cli)
+        executor.add(cli, lambda result: (
+            '%s: Tunnel creation successful for switch \n ' % sw_name))
         CHANGED_FLAG.append(True)
-        output += '%s: Tunnel creation successful for switch \n ' % sw_name
-
-    return output
 
 
-def tunnel_create_for_nc_nodes(module, switch, local_ip, remote_ip,
+def tunnel_create_for_nc_nodes(module, executor, switch, local_ip, remote_ip,
                                                          tunnel_name):
     """
-    Method to find ip of cluster node.
+    Method to queue the tunnel creation of a non clustered node.
     :param module: The Ansible module to fetch input parameters.
+    :param executor: The CliExecutor running the commands.
     :param switch: The switch name.
     :param local_ip: ip of local switch.
     :param remote_ip: ip of peer switch.
     :param tunnel_name: Name of the tunnel.
-    :return: String describing if tunnel is created or not.
     """
-    output = ''
     sw_name = switch[:-8]
     cli = pn_cli(module)
     clicopy = cli
@@ -226,12 +254,9 @@ def tunnel_create_for_nc_nodes(module, switch, local_ip, remote_ip,
         cli += ' scope local local-ip %s ' % local_ip
         cli += ' remote-ip %s vrouter-name ' % remote_ip
         cli += ' %s' % switch
-        run_cli(module, cli)
+        executor.add(cli, lambda result: (
+            '%s: Tunnel %s creation successful \n' % (sw_name, tunnel_name)))
         CHANGED_FLAG.append(True)
-        output += '%s: Tunnel %s creation ' % (sw_name, tunnel_name)
-        output += 'successful \n'
-
-    return output
 
 
 def add_vxlan_loopback_trunk_ports(module, ports, switch):
@@ -255,29 +280,30 @@ def add_vxlan_loopback_trunk_ports(module, ports, switch):
     return output
 
 
-def add_vxlan_to_tunnel(module, sw_name, vxlan_list, tunnel_name):
+def add_vxlan_to_tunnel(module, executor, sw_name, vxlan_list, tunnel_name):
     """
-    Method to add vxlan to tunnel.
+    Method to queue the addition of vxlans to a tunnel.
     :param module: The Ansible module to fetch input parameters.
+    :param executor: The CliExecutor running the commands.
     :param sw_name: The switch name.
     :param vxlan_list: vxlan input list.
     :param tunnel_name: String describing name of the tunnel.
-    :return: String describing if port is modified or not.
     """
-    output = ''
     cli = pn_cli(module)
     clicopy = cli
 
+    def added(result, vxlan):
+        if 'Success' in result:
+            return '%s: Added VXLAN-ID %s to tunnel %s \n ' % (
+                sw_name, vxlan, tunnel_name)
+        return ''
+
     for vxlan in vxlan_list:
         cli = clicopy
         cli += ' switch %s tunnel-vxlan-add ' % sw_name
         cli += ' name  %s '% tunnel_name
         cli += ' vxlan %s ' % vxlan
-        if 'Success' in run_cli(module, cli):
-            output += '%s: Added VXLAN-ID %s ' % (sw_name, vxlan)
-            output += 'to tunnel %s \n ' % tunnel_name
-
-    return output
+        executor.add(cli, lambda result, vxlan=vxlan: added(result, vxlan))
 
 
 def create_tunnel(module, full_nodes, cluster_pair):
@@ -299,6 +325,9 @@ def create_tunnel(module, full_nodes, cluster_pair):
     else:
         all_nodes = full_nodes
 
+    # The tunnels of a switch are created in order and the switches are
+    # configured concurrently.
+    executor = CliExecutor(module, check=check_cli_output)
     for node in all_nodes:
         endpoint1 = node[:-8]
         local_ip = all_nodes[node][0]
@@ -317,22 +346,26 @@ def create_tunnel(module, full_nodes, cluster_pair):
                 else:
                     if is_endpoint1_cluster is True and is_endpoint2_cluster is False:
                         tunnel_name = endpoint1+'-pair-'+endpoint2
-                        output += tunnel_create_for_cluster_nodes(module, node, cluster_pair,
-                                                                  local_ip, remote_ip, tunnel_name)
+                        tunnel_create_for_cluster_nodes(module, executor, node, cluster_pair,
+                                                        local_ip, remote_ip, tunnel_name)
                     elif is_endpoint1_cluster is False and is_endpoint2_cluster is False:
                         tunnel_name = endpoint1+'-'+endpoint2
-                        output += tunnel_create_for_nc_nodes(module, node, local_ip,
-                                                             remote_ip, tunnel_name)
+                        tunnel_create_for_nc_nodes(module, executor, node, local_ip,
+                                                   remote_ip, tunnel_name)
                     elif is_endpoint1_cluster is False and is_endpoint2_cluster is True:
                         tunnel_name = endpoint1+'-to-'+endpoint2+'-pair'
-                        output += tunnel_create_for_nc_nodes(module, node,
-                                                             local_ip, remote_ip, tunnel_name)
+                        tunnel_create_for_nc_nodes(module, executor, node,
+                                                   local_ip, remote_ip, tunnel_name)
                     elif is_endpoint1_cluster is True and is_endpoint2_cluster is True:
                         tunnel_name = endpoint1+'-pair-to-'+endpoint2+'-pair'
-                        output += tunnel_create_for_cluster_nodes(module, node, cluster_pair,
-                                                                  local_ip, remote_ip, tunnel_name)
+                        tunnel_create_for_cluster_nodes(module, executor, node, cluster_pair,
+                                                        local_ip, remote_ip, tunnel_name)
+
+                    add_vxlan_to_tunnel(module, executor, node[:-8], vxlan_id, tunnel_name)
 
-                    output += add_vxlan_to_tunnel(module, node[:-8], vxlan_id, tunnel_name)
+    executor.flush()
+    # Commands skipped after a failure have no result.
+    output += ''.join(result for result in executor.results if result)
     return all_nodes, output
 
 
@@ -395,9 +428,29 @@ def main():
         pn_tunnel_vxlan_id=dict(required=True, type='str'),
         pn_tunnel_endpoint1=dict(required=False, type='str', default=''),
         pn_tunnel_endpoint2=dict(required=False, type='str', default=''),
-        pn_tunnel_overlay_vlan=dict(required=True, type='str'), )
+        pn_tunnel_overlay_vlan=dict(required=True, type='str'),
+        pn_plan=dict(required=False, type='list', default=[]), ),
+        supports_check_mode=True
                           )
 
+    # The module polls no state, see memoize_shows().
+    memoize_shows(True)
+
+    if module.params['pn_plan']:
+        plan = module.params['pn_plan']
+        apply_cli_plan(module, plan, check_cli_output)
+        module.exit_json(
+            unreachable=False,
+            msg='VXLAN configuration succeeded',
+            summary=[{'switch': '', 'output': command} for command in plan],
+            exception='',
+            failed=False,
+            changed=True,
+            task='Configure VXLAN',
+            plan=cli_plan(),
+            metrics=cli_metrics()
+        )
+
     output1 = ''
     switch_list = []
     vlan_id = module.params['pn_tunnel_overlay_vlan']
@@ -443,7 +496,9 @@ def main():
         summary=results,
         exception='',
         failed=False,
-        changed=True if True in CHANGED_FLAG else False
+        changed=True if True in CHANGED_FLAG else False,
+        plan=cli_plan(),
+        metrics=cli_metrics()
     )
 
 if __name__ == '__main__':
@@ -0,0 +1,89 @@
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+
+# Action plugin saving the configuration of every fabric node to the
+# controller, the nodes being exported concurrently through pn_paramiko.
+# One file per host, named after the host, is written to dest. Install it
+# in the action_plugins path.
+#
+#   - name: Export the fabric configuration
+#     pn_config_export:
+#       dest: "backups/{{ ansible_date_time.date }}"
+#       hosts: "{{ groups['all'] }}"        # Default: the play hosts.
+#       compress: true                      # gzip the files. Default: true.
+#       command: running-config-show        # Netvisor command to save.
+#       workers: 16                         # Hosts exported at a time.
+#     run_once: true
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+import time
+
+from ansible.module_utils.parsing.convert_bool import boolean
+from ansible.plugins.action import ActionBase
+
+try:
+    from ansible.plugins.loader import connection_loader
+except ImportError:
+    from ansible.plugins import connection_loader
+
+
+class ActionModule(ActionBase):
+
+    TRANSFERS_FILES = False
+
+    def run(self, tmp=None, task_vars=None):
+        result = super(ActionModule, self).run(tmp, task_vars)
+        task_vars = task_vars or {}
+
+        dest = self._task.args.get('dest')
+        if not dest:
+            result['failed'] = True
+            result['msg'] = 'dest is required'
+            return result
+        dest = os.path.expanduser(dest)
+
+        hosts = self._task.args.get('hosts') or task_vars.get('ansible_play_hosts', [])
+        compress = boolean(self._task.args.get('compress', True))
+        command = self._task.args.get('command', 'running-config-show')
+        workers = int(self._task.args.get('workers', 16))
+        hostvars = task_vars.get('hostvars', {})
+
+        connection = connection_loader.get('pn_paramiko', self._play_context,
+                                           self._connection._new_stdin)
+        play_contexts = dict((host, connection.play_context_for(host, hostvars.get(host, {})))
+                             for host in hosts)
+
+        start = time.time()
+        exported, failed_hosts = connection.export_configs(
+            play_contexts, dest, compress=compress, command=command, workers=workers)
+
+        result.update(
+            changed=bool(exported),
+            exported=exported,
+            failed_hosts=failed_hosts,
+            elapsed=round(time.time() - start, 3),
+        )
+        if failed_hosts:
+            result['failed'] = True
+            result['msg'] = 'Could not export %s' % ', '.join(sorted(failed_hosts))
+        else:
+            result['msg'] = 'Exported %d configurations' % len(exported)
+
+        return result
@@ -18,10 +18,124 @@
 # Make coding more python3-ish
 from __future__ import (absolute_import, division, print_function)
 from ansible.plugins.callback import CallbackBase
+import gzip
+import io
 import json
+import math
+import os
+import struct
+import sys
+import time
 
 __metaclass__ = type
 
+# Output format: 'json' prints the accumulated plays document after every
+# host result, 'ndjson' prints one compact line per event.
+OUTPUT_FORMAT = os.getenv('PN_JSON_FORMAT', 'json').lower()
+
+# Keep the accumulated plays document in ndjson mode too.
+KEEP_RESULTS = os.getenv('PN_JSON_KEEP_RESULTS', '').lower() in (
+    '1', 'yes', 'true', 'on')
+
+# Result keys the GUI driver expects on every host result.
+RESULT_DEFAULTS = ('task', 'summary', 'msg', 'failed', 'exception',
+                   'unreachable')
+
+# Number of hosts listed in the slowest hosts of the timing summary.
+SLOWEST_HOSTS = int(os.getenv('PN_JSON_SLOWEST_HOSTS', '5'))
+
+# File the completed task results are spilled to, none by default; with
+# PN_JSON_RESULTS_COMPRESS set every record is written as a gzip member.
+RESULTS_FILE = os.getenv('PN_JSON_RESULTS_FILE', '')
+RESULTS_COMPRESS = os.getenv('PN_JSON_RESULTS_COMPRESS', '').lower() in (
+    '1', 'yes', 'true', 'on')
+
+# Index entry of a record: offset and length in the results file.
+INDEX_ENTRY = struct.Struct('!QI')
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def percentile(values, pct):
+    """Nearest rank percentile of a sorted list"""
+    if not values:
+        return 0.0
+    rank = int(math.ceil(pct / 100.0 * len(values))) - 1
+    return values[min(max(rank, 0), len(values) - 1)]
+
+
+class ResultStore(object):
+    """
+    Append-only store of task result records. Records are written to the
+    results file as json lines, or gzip members when compressed, and the
+    offset and length of each record to the index file next to it, so a
+    page of records is read with one seek into each file. The index entry
+    is written after the record, a reader never sees a partial record.
+
+        store = ResultStore('/tmp/results.ndjson', mode='r')
+        for record in store.page(len(store) - 10, 10):
+            ...
+    """
+
+    def __init__(self, path, compress=False, mode='w'):
+        self.path = path
+        self.index_path = path + '.idx'
+        self.compress = compress
+        self.offset = 0
+        # The writer reads back through the same files.
+        mode = 'w+b' if mode == 'w' else 'rb'
+        self.data = open(path, mode)
+        self.index = open(self.index_path, mode)
+
+    def __len__(self):
+        return os.fstat(self.index.fileno()).st_size // INDEX_ENTRY.size
+
+    def append(self, record):
+        """Write a record and return its number"""
+        data = json.dumps(record, separators=(',', ':')).encode('utf-8')
+        if self.compress:
+            buf = io.BytesIO()
+            with gzip.GzipFile(fileobj=buf, mode='wb') as member:
+                member.write(data + b'\n')
+            data = buf.getvalue()
+        else:
+            data += b'\n'
+        self.data.write(data)
+        self.data.flush()
+        self.index.write(INDEX_ENTRY.pack(self.offset, len(data)))
+        self.index.flush()
+        self.offset += len(data)
+        return len(self) - 1
+
+    def page(self, start, count):
+        """Read up to count records from record number start"""
+        start = max(start, 0)
+        self.index.seek(start * INDEX_ENTRY.size)
+        entries = self.index.read(count * INDEX_ENTRY.size)
+        self.index.seek(0, os.SEEK_END)
+        records = []
+        for pos in range(0, len(entries) - INDEX_ENTRY.size + 1,
+                         INDEX_ENTRY.size):
+            offset, length = INDEX_ENTRY.unpack_from(entries, pos)
+            self.data.seek(offset)
+            data = self.data.read(length)
+            if data[:2] == GZIP_MAGIC:
+                data = gzip.GzipFile(fileobj=io.BytesIO(data)).read()
+            records.append(json.loads(data.decode('utf-8')))
+        self.data.seek(0, os.SEEK_END)
+        return records
+
+    def get(self, number):
+        """Read one record by number"""
+        records = self.page(number, 1)
+        if not records:
+            raise IndexError('no result record %d in %s' % (number,
+                                                             self.path))
+        return records[0]
+
+    def close(self):
+        self.data.close()
+        self.index.close()
+
 
 class CallbackModule(CallbackBase):
     CALLBACK_VERSION = 2.0
@@ -32,6 +146,23 @@ class CallbackModule(CallbackBase):
         super(CallbackModule, self).__init__(display)
         # It is initialised at the start of the playbook
         self.results = []
+        self.ndjson = OUTPUT_FORMAT == 'ndjson'
+        # Completed tasks are spilled to the store, only the current task
+        # stays in self.results.
+        self.store = None
+        self.unspilled = False
+        if RESULTS_FILE:
+            self.store = ResultStore(RESULTS_FILE, RESULTS_COMPRESS)
+        self.keep_results = (KEEP_RESULTS or not self.ndjson or
+                             self.store is not None)
+        # Timing of the playbook: start time, task timings in start order
+        # keyed by task id, and host start times and retry counts of the
+        # running tasks keyed by (task id, host).
+        self.start = time.time()
+        self.task_timing = {}
+        self.task_order = []
+        self.host_start = {}
+        self.retries = {}
 
     def _new_play(self, play):
         return {
@@ -52,49 +183,190 @@ class CallbackModule(CallbackBase):
             'status': {}
         }
 
+    def _emit(self, event, **fields):
+        """Print one compact event line"""
+        line = {'event': event}
+        line.update(fields)
+        sys.stdout.write(json.dumps(line, separators=(',', ':')) + '\n')
+        sys.stdout.flush()
+
+    def _task_started(self, task):
+        """Start the timing of a task, once per task across batches"""
+        task_id = str(task._uuid)
+        now = time.time()
+        if task_id not in self.task_timing:
+            self.task_timing[task_id] = {
+                'name': task.name,
+                'start': now,
+                'end': now,
+                'durations': [],
+                'hosts': {},
+                'retries': 0,
+            }
+            self.task_order.append(task_id)
+        self.task_timing[task_id]['batch_start'] = now
+
+    def _host_finished(self, result, event):
+        """End the timing of a task on a host and return it"""
+        task_id = str(result._task._uuid)
+        host = result._host.name
+        if task_id not in self.task_timing:
+            self._task_started(result._task)
+        timing = self.task_timing[task_id]
+
+        end = time.time()
+        start = self.host_start.pop((task_id, host), timing['batch_start'])
+        retries = self.retries.pop((task_id, host), 0)
+        duration = end - start
+
+        timing['end'] = max(timing['end'], end)
+        timing['retries'] += retries
+        if event != 'skipped':
+            timing['durations'].append(duration)
+            timing['hosts'][host] = duration
+        return {
+            'start': round(start, 3),
+            'end': round(end, 3),
+            'duration': round(duration, 3),
+            'retries': retries,
+        }
+
+    def _timing_summary(self):
+        """Summarize the task and host timings of the playbook"""
+        tasks = []
+        host_totals = {}
+        for task_id in self.task_order:
+            timing = self.task_timing[task_id]
+            durations = sorted(timing['durations'])
+            tasks.append({
+                'name': timing['name'],
+                'id': task_id,
+                'hosts': len(durations),
+                'start': round(timing['start'], 3),
+                'end': round(timing['end'], 3),
+                'duration': round(timing['end'] - timing['start'], 3),
+                'retries': timing['retries'],
+                'p50': round(percentile(durations, 50), 3),
+                'p95': round(percentile(durations, 95), 3),
+                'max': round(durations[-1] if durations else 0.0, 3),
+            })
+            for host, duration in timing['hosts'].items():
+                total, slowest, slowest_task = host_totals.get(
+                    host, (0.0, -1.0, ''))
+                if duration > slowest:
+                    slowest, slowest_task = duration, timing['name']
+                host_totals[host] = (total + duration, slowest, slowest_task)
+
+        slowest_hosts = sorted(host_totals.items(), key=lambda item: -item[1][0])
+        return {
+            'wall_time': round(time.time() - self.start, 3),
+            'tasks': tasks,
+            'slowest_hosts': [{
+                'host': host,
+                'duration': round(total, 3),
+                'slowest_task': slowest_task,
+                'slowest_task_duration': round(slowest, 3),
+            } for host, (total, slowest, slowest_task)
+                in slowest_hosts[:SLOWEST_HOSTS]],
+        }
+
+    def _spill(self):
+        """Append the current task results to the store"""
+        if self.store is None or not self.unspilled:
+            return
+        self.unspilled = False
+        play = self.results[-1]
+        self.store.append({'play': play['play'], 'task': play['tasks'][-1]})
+
+    def v2_playbook_on_start(self, playbook):
+        self.start = time.time()
+
+    def v2_runner_on_start(self, host, task):
+        # Only called by ansible 2.8 and later, the task start time of the
+        # batch is used for the host before that.
+        self.host_start[(str(task._uuid), host.name)] = time.time()
+
+    def v2_runner_retry(self, result):
+        key = (str(result._task._uuid), result._host.name)
+        self.retries[key] = self.retries.get(key, 0) + 1
+
     def v2_playbook_on_play_start(self, play):
         # This part is only at the start of the play.
         # So, in between tasks, this part doesn't comes into picture.
-        self.results = []
-        self.results.append(self._new_play(play))
+        if self.ndjson:
+            self._emit('play_start', play={'name': play.name,
+                                           'id': str(play._uuid)})
+        if self.keep_results:
+            self._spill()
+            self.results = []
+            self.results.append(self._new_play(play))
 
     def v2_playbook_on_task_start(self, task, is_conditional):
-        self.results[-1]['tasks'] = []
-        self.results[-1]['tasks'].append(self._new_task(task))
+        self._task_started(task)
+        if self.ndjson:
+            self._emit('task_start', task={'name': task.name,
+                                           'id': str(task._uuid)})
+        if self.keep_results:
+            self._spill()
+            self.results[-1]['tasks'] = []
+            self.results[-1]['tasks'].append(self._new_task(task))
 
-    def v2_runner_on_ok(self, result, **kwargs):
+    def _runner_result(self, result, event):
         host = result._host
-        if 'task' not in result._result.keys():
-            result._result['task'] = ''
-        if 'summary' not in result._result.keys():
-            result._result['summary'] = ''
-        if 'msg' not in result._result.keys():
-            result._result['msg'] = ''
-        if 'failed' not in result._result.keys():
-            result._result['failed'] = ''
-        if 'exception' not in result._result.keys():
-            result._result['exception'] = ''
-        if 'unreachable' not in result._result.keys():
-            result._result['unreachable'] = ''
-        self.results[-1]['tasks'][-1]['hosts'][host.name] = result._result
+        timing = self._host_finished(result, event)
+        for key in RESULT_DEFAULTS:
+            if key not in result._result:
+                result._result[key] = ''
 
         if result._result['unreachable'] == True or result._result[
             'failed'] == True:
-            self.results[-1]['tasks'][-1]['status'] = '1'
+            status = '1'
         elif result._result['failed'] == False:
-            self.results[-1]['tasks'][-1]['status'] = '0'
+            status = '0'
         else:
-            self.results[-1]['tasks'][-1]['status'] = '-1'
+            status = '-1'
+
+        if self.ndjson:
+            self._emit(event, host=host.name, status=status,
+                       task={'name': result._task.name,
+                             'id': str(result._task._uuid)},
+                       timing=timing, result=result._result)
+        if not self.keep_results:
+            return
+
+        self.results[-1]['tasks'][-1]['hosts'][host.name] = result._result
+        self.results[-1]['tasks'][-1]['status'] = status
+        self.unspilled = True
 
         output = {
             'plays': self.results,
         }
 
-        if self.results[-1]['tasks'][-1]['status'] != "-1":
+        if status != "-1" and not self.ndjson:
             print('__________ANSIBLE_TASK_BOUNDARY_STARTS__________')
             print(json.dumps(output, indent=4, sort_keys=True))
             print('__________ANSIBLE_TASK_BOUNDARY_ENDS__________')
 
+    def v2_runner_on_ok(self, result, **kwargs):
+        self._runner_result(result, 'ok')
+
+    def _runner_not_ok(self, result, event):
+        """Report a failed, unreachable or skipped result in ndjson mode;
+        the json output only reports ok results, the host is only timed"""
+        if self.ndjson:
+            self._runner_result(result, event)
+        else:
+            self._host_finished(result, event)
+
+    def v2_runner_on_failed(self, result, **kwargs):
+        self._runner_not_ok(result, 'failed')
+
+    def v2_runner_on_unreachable(self, result, **kwargs):
+        self._runner_not_ok(result, 'unreachable')
+
+    def v2_runner_on_skipped(self, result, **kwargs):
+        self._runner_not_ok(result, 'skipped')
+
     def v2_playbook_on_stats(self, stats):
         """Display info about playbook statistics"""
 
@@ -105,12 +377,25 @@ class CallbackModule(CallbackBase):
             s = stats.summarize(h)
             summary[h] = s
 
+        timing = self._timing_summary()
+        extra = {}
+        if self.store is not None:
+            self._spill()
+            extra['results'] = {'file': self.store.path,
+                                'index': self.store.index_path,
+                                'records': len(self.store)}
+            self.store.close()
+
+        if self.ndjson:
+            if KEEP_RESULTS:
+                extra['plays'] = self.results
+            self._emit('stats', stats=summary, timing=timing, **extra)
+            return
+
         output = {
-            'stats': summary
+            'stats': summary,
+            'timing': timing
         }
+        output.update(extra)
 
         print(json.dumps(output, indent=4, sort_keys=True))
-
-    v2_runner_on_failed = v2_runner_on_ok
-    v2_runner_on_unreachable = v2_runner_on_ok
-    v2_runner_on_skipped = v2_runner_on_ok
@@ -50,6 +50,11 @@ DOCUMENTATION = """
 #C.PARAMIKO_RECORD_HOST_KEYS
 """
 
+import atexit
+import gzip
+import hashlib
+import multiprocessing
+import multiprocessing.util
 import warnings
 import os
 import socket
@@ -58,6 +63,8 @@ import traceback
 import fcntl
 import sys
 import re
+import select
+import threading
 import time
 
 from termios import tcflush, TCIFLUSH
@@ -66,7 +73,7 @@ from binascii import hexlify
 from ansible import constants as C
 from ansible.errors import AnsibleError, AnsibleConnectionFailure, AnsibleFileNotFound
 from ansible.module_utils.six import iteritems
-from ansible.module_utils.six.moves import input
+from ansible.module_utils.six.moves import input, shlex_quote
 from ansible.plugins.connection import ConnectionBase
 from ansible.utils.path import makedirs_safe
 from ansible.module_utils._text import to_bytes, to_native
@@ -98,6 +105,31 @@ with warnings.catch_warnings():
         pass
 
 
+def read_channel(chan, bufsize=4096, timeout=None, sink=None):
+    """
+    Reads stdout and stderr of a channel as data arrives, until the command
+    exited, so a command writing a lot to stderr does not stall while stdout
+    is read; with a sink, stdout is passed to it instead of being kept.
+    Returns (rc, stdout, stderr).
+    """
+
+    stdout = []
+    stderr = []
+    while True:
+        if not select.select([chan], [], [], timeout)[0]:
+            raise socket.timeout()
+        while chan.recv_ready():
+            if sink:
+                sink(chan.recv(bufsize))
+            else:
+                stdout.append(chan.recv(bufsize))
+        while chan.recv_stderr_ready():
+            stderr.append(chan.recv_stderr(bufsize))
+        if (chan.exit_status_ready() and chan.eof_received and
+                not chan.recv_ready() and not chan.recv_stderr_ready()):
+            return chan.recv_exit_status(), b''.join(stdout), b''.join(stderr)
+
+
 class MyAddPolicy(object):
     """
     Based on AutoAddPolicy in paramiko so we can determine when keys are added
@@ -146,29 +178,322 @@ class MyAddPolicy(object):
         # in order to control ordering.
 
 
-# keep connection objects on a per host basis to avoid repeated attempts to reconnect
+# keep connection objects on a per host basis to avoid repeated attempts to
+# reconnect within one process; ansible forks a worker per task, so every
+# task still opens its own transport and only the connections a process
+# makes itself, like export_configs() does, share one.
 
 SSH_CONNECTION_CACHE = {}
 SFTP_CONNECTION_CACHE = {}
 
+# Hosts whose network-admin role was given shell access by this process.
+SHELL_ROLE_HOSTS = set()
+
+# Directory of the per run markers of the hosts bootstrapped by any worker
+# process, and the days the markers of a finished run are kept.
+SHELL_ROLE_MARKER_DIR = os.path.expanduser('~/.ansible/pn_paramiko_shell_role')
+SHELL_ROLE_MARKER_DAYS = 1
+
+# Seconds to wait for the role-modify bootstrap to finish.
+ROLE_MODIFY_TIMEOUT = 10
+
+# Directory on the switch keeping transferred files by content hash, and
+# the days an unused one is kept.
+PAYLOAD_CACHE_DIR = '/tmp/.pn_ansible_payloads'
+PAYLOAD_CACHE_DAYS = 1
+
+# Size of the chunks files are read and sent in.
+TRANSFER_CHUNK_SIZE = 65536
+
+# Seconds fetch_file() and export_configs() wait for more output of a
+# transfer, 0 for no limit. The connect timeout of the play context is too
+# short for a switch building a large running config.
+TRANSFER_TIMEOUT = float(os.getenv('PN_PARAMIKO_TRANSFER_TIMEOUT', '300')) or None
+
+# Hosts exported at the same time by Connection.export_configs().
+EXPORT_WORKERS = 16
+
+# Command whose output export_configs() saves for every host.
+CONFIG_EXPORT_COMMAND = 'running-config-show'
+
+# Inventory variables of the connection settings, by precedence.
+HOST_VARS = ('ansible_host', 'ansible_ssh_host', 'ansible_paramiko_host')
+USER_VARS = ('ansible_user', 'ansible_ssh_user', 'ansible_paramiko_user')
+PASSWORD_VARS = ('ansible_password', 'ansible_ssh_pass')
+PORT_VARS = ('ansible_port', 'ansible_ssh_port')
+
+
+def close_cached_connections():
+    ''' close the cached connections when the process exits '''
+
+    for ssh in SSH_CONNECTION_CACHE.values():
+        try:
+            ssh.close()
+        except Exception:
+            pass
+    SSH_CONNECTION_CACHE.clear()
+    SFTP_CONNECTION_CACHE.clear()
+
+
+atexit.register(close_cached_connections)
+
+
+def shell_role_marker(cache_key):
+    ''' path of the marker recording that a host was bootstrapped during
+    this run; tasks run in worker processes forked by the controller, so the
+    run is the parent process of a worker '''
+
+    if multiprocessing.current_process().name != 'MainProcess':
+        run_id = os.getppid()
+    else:
+        run_id = os.getpid()
+    run_dir = os.path.join(SHELL_ROLE_MARKER_DIR, str(run_id))
+    if not os.path.isdir(run_dir):
+        makedirs_safe(run_dir)
+        prune_shell_role_markers(run_dir)
+    return os.path.join(run_dir, re.sub(r'[^\w.@-]', '_', cache_key))
+
+
+def prune_shell_role_markers(keep):
+    ''' remove the marker directories of runs older than
+    SHELL_ROLE_MARKER_DAYS '''
+
+    cutoff = time.time() - SHELL_ROLE_MARKER_DAYS * 86400
+    for name in os.listdir(SHELL_ROLE_MARKER_DIR):
+        run_dir = os.path.join(SHELL_ROLE_MARKER_DIR, name)
+        try:
+            if run_dir != keep and os.path.getmtime(run_dir) < cutoff:
+                for marker in os.listdir(run_dir):
+                    os.remove(os.path.join(run_dir, marker))
+                os.rmdir(run_dir)
+        except OSError:
+            # another run is pruning it
+            pass
+
+
+# Per known_hosts file, the lines it holds or this process recorded, the
+# size of the file already read into them, and the new lines waiting to be
+# appended.
+KNOWN_HOST_KEYS = {}
+KNOWN_HOST_OFFSETS = {}
+PENDING_HOST_KEYS = {}
+
+# Process which registered the flush of its queued host keys at exit.
+HOST_KEY_FLUSH_PID = None
+
+
+def known_hosts_lines(path, offset=0):
+    ''' the host key lines of a known_hosts file from offset on, and the
+    size of the file; read from the start when the file was rewritten '''
+
+    try:
+        with open(path, 'rb') as known_hosts:
+            known_hosts.seek(0, os.SEEK_END)
+            if known_hosts.tell() < offset:
+                offset = 0
+            known_hosts.seek(offset)
+            lines = set(to_native(line).strip() for line in known_hosts
+                        if line.strip() and not line.startswith(b'#'))
+            return lines, known_hosts.tell()
+    except IOError:
+        return set(), 0
+
+
+def flush_host_keys():
+    ''' append the queued host keys to their known_hosts files, one write
+    per file, under the lock shared with other ansible processes '''
+
+    for keyfile in list(PENDING_HOST_KEYS):
+        # Connection.close() of another _for_each_host() thread may have taken them
+        lines = PENDING_HOST_KEYS.pop(keyfile, None)
+        if not lines:
+            continue
+        lockfile = keyfile.replace("known_hosts", ".known_hosts.lock")
+        makedirs_safe(os.path.dirname(keyfile))
+
+        with open(lockfile, 'w') as key_lock:
+            fcntl.lockf(key_lock, fcntl.LOCK_EX)
+            try:
+                # only the lines other processes appended since the file was
+                # indexed are read
+                appended, size = known_hosts_lines(keyfile, KNOWN_HOST_OFFSETS.get(keyfile, 0))
+                KNOWN_HOST_KEYS.setdefault(keyfile, set()).update(appended)
+                KNOWN_HOST_OFFSETS[keyfile] = size
+                lines = [line for line in lines if line not in appended]
+                if lines:
+                    with open(keyfile, 'a') as known_hosts:
+                        known_hosts.write(''.join(line + '\n' for line in lines))
+                        KNOWN_HOST_OFFSETS[keyfile] = known_hosts.tell()
+            except Exception:
+                # unable to save keys
+                traceback.print_exc()
+            finally:
+                fcntl.lockf(key_lock, fcntl.LOCK_UN)
+
+
+def flush_host_keys_at_exit():
+    ''' flush the queued host keys once when this process exits; the
+    worker processes ansible forks do not run atexit handlers but do run
+    multiprocessing finalizers '''
+
+    global HOST_KEY_FLUSH_PID
+
+    if HOST_KEY_FLUSH_PID == os.getpid():
+        return
+    HOST_KEY_FLUSH_PID = os.getpid()
+    if multiprocessing.current_process().name != 'MainProcess':
+        multiprocessing.util.Finalize(None, flush_host_keys, exitpriority=10)
+
+
+atexit.register(flush_host_keys)
+
 
 class Connection(ConnectionBase):
     ''' SSH based connections with Paramiko '''
 
     transport = 'paramiko'
+    has_pipelining = True
 
     def _cache_key(self):
         return "%s__%s__" % (self._play_context.remote_addr, self._play_context.remote_user)
 
     def _connect(self):
+        self.keyfile = os.path.expanduser("~/.ssh/known_hosts")
         cache_key = self._cache_key()
-        if cache_key in SSH_CONNECTION_CACHE:
-            # self.ssh = SSH_CONNECTION_CACHE[cache_key]
-            self.ssh = SSH_CONNECTION_CACHE[cache_key] = self._connect_uncached()
+        ssh = SSH_CONNECTION_CACHE.get(cache_key)
+        if ssh is not None and self._transport_alive(ssh):
+            display.vvv("CACHED TRANSPORT IN THIS PROCESS FOR %s" % self._play_context.remote_addr,
+                        host=self._play_context.remote_addr)
+            self.ssh = ssh
         else:
+            if ssh is not None:
+                ssh.close()
             self.ssh = SSH_CONNECTION_CACHE[cache_key] = self._connect_uncached()
+
+        if cache_key not in SHELL_ROLE_HOSTS:
+            marker = shell_role_marker(cache_key)
+            if not os.path.exists(marker) and self._enable_shell_role():
+                open(marker, 'w').close()
+            SHELL_ROLE_HOSTS.add(cache_key)
         return self
 
+    @staticmethod
+    def _transport_alive(ssh):
+        ''' check that a cached connection can still carry channels '''
+
+        transport = ssh.get_transport()
+        if transport is None or not transport.is_active():
+            return False
+        try:
+            transport.send_ignore()
+        except Exception:
+            return False
+        return True
+
+    def _enable_shell_role(self):
+        ''' give the network-admin role shell access, once per host and
+        run, see shell_role_marker(); returns whether role-modify finished '''
+
+        # Custom ssh logic for PN
+        try:
+            chan = self.ssh.get_transport().open_session()
+            chan.exec_command("role-modify name network-admin shell")
+        except Exception as e:
+            msg = str(e)
+            raise AnsibleConnectionFailure(msg)
+
+        # role-modify takes some time to finish, the shell is usable once
+        # the command exited.
+        deadline = time.time() + ROLE_MODIFY_TIMEOUT
+        while not chan.exit_status_ready():
+            if time.time() > deadline:
+                display.warning("role-modify did not finish within %ss on %s" % (
+                    ROLE_MODIFY_TIMEOUT, self._play_context.remote_addr))
+                chan.close()
+                return False
+            time.sleep(0.05)
+        chan.close()
+        return True
+
+    def play_context_for(self, host, variables):
+        ''' copy of the play context with the connection settings of an
+        inventory host '''
+
+        def first(names, default):
+            for name in names:
+                if variables.get(name) is not None:
+                    return variables[name]
+            return default
+
+        play_context = self._play_context.copy()
+        play_context.remote_addr = first(HOST_VARS, host)
+        play_context.remote_user = first(USER_VARS, play_context.remote_user)
+        play_context.password = first(PASSWORD_VARS, play_context.password)
+        play_context.port = first(PORT_VARS, play_context.port)
+        return play_context
+
+    def _for_each_host(self, play_contexts, action, workers):
+        ''' call action(host, connection) with the connection of every host
+        of a dict of host to play context, from a pool of threads; returns
+        the dicts of host to result and to error '''
+
+        pending = list(play_contexts.items())
+        results = {}
+        failures = {}
+        lock = threading.Lock()
+
+        def work():
+            while True:
+                with lock:
+                    if not pending:
+                        return
+                    host, play_context = pending.pop(0)
+                connection = Connection(play_context, self._new_stdin)
+                try:
+                    connection._connect()
+                    try:
+                        result = action(host, connection)
+                    finally:
+                        # records the new host keys
+                        connection.close()
+                except Exception as e:
+                    with lock:
+                        failures[host] = to_native(e)
+                else:
+                    with lock:
+                        results[host] = result
+
+        threads = [threading.Thread(target=work)
+                   for i in range(min(workers, len(pending)))]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return results, failures
+
+    def export_configs(self, play_contexts, dest, compress=True,
+                       command=CONFIG_EXPORT_COMMAND, workers=EXPORT_WORKERS):
+        ''' save the output of a Netvisor command, the running config by
+        default, of many hosts, given as a dict of host to play context,
+        concurrently into dest, one file per host; returns the dicts of host
+        to file and to error '''
+
+        makedirs_safe(dest)
+
+        def export(host, connection):
+            out_path = os.path.join(dest, '%s.conf' % host)
+            if compress:
+                out_path += '.gz'
+            connection._stream_command('--quiet %s' % command, out_path, compress)
+            return out_path
+
+        results, failures = self._for_each_host(play_contexts, export, workers)
+
+        display.vvv("EXPORTED %d CONFIGS, %d FAILED" % (len(results), len(failures)))
+        return results, failures
+
     def _parse_proxy_command(self, port=22):
         proxy_command = None
         # Parse ansible_ssh_common_args, specifically looking for ProxyCommand
@@ -226,8 +551,6 @@ class Connection(ConnectionBase):
 
         ssh = paramiko.SSHClient()
 
-        self.keyfile = os.path.expanduser("~/.ssh/known_hosts")
-
         if C.HOST_KEY_CHECKING:
             for ssh_known_hosts in ("/etc/ssh/ssh_known_hosts", "/etc/openssh/ssh_known_hosts"):
                 try:
@@ -276,17 +599,6 @@ class Connection(ConnectionBase):
             else:
                 raise AnsibleConnectionFailure(msg)
 
-        # Custom ssh logic for PN
-        try:
-            cli = "role-modify name network-admin shell"
-            ssh.exec_command(cli)
-        except Exception as e:
-            msg = str(e)
-            raise AnsibleConnectionFailure(msg)
-
-        # Sleep for 1s here. as role-modify takes some time to finish
-        time.sleep(1)
-
         return ssh
 
     def exec_command(self, cmd, in_data=None, sudoable=True):
@@ -294,9 +606,6 @@ class Connection(ConnectionBase):
 
         super(Connection, self).exec_command(cmd, in_data=in_data, sudoable=sudoable)
 
-        if in_data:
-            raise AnsibleError("Internal Error: this module does not support optimized module pipelining")
-
         bufsize = 4096
 
         try:
@@ -310,8 +619,10 @@ class Connection(ConnectionBase):
 
         # sudo usually requires a PTY (cf. requiretty option), therefore
         # we give it one by default (pty=True in ansble.cfg), and we try
-        # to initialise from the calling environment when sudoable is enabled
-        if C.PARAMIKO_PTY and sudoable:
+        # to initialise from the calling environment when sudoable is enabled.
+        # A pipelined module is read from stdin until end of file, which a
+        # PTY would echo and never deliver.
+        if C.PARAMIKO_PTY and sudoable and not in_data:
             chan.get_pty(term=os.getenv('TERM', 'vt100'), width=int(os.getenv('COLUMNS', 0)), height=int(os.getenv('LINES', 0)))
 
         display.vvv("EXEC %s" % cmd, host=self._play_context.remote_addr)
@@ -358,13 +669,21 @@ class Connection(ConnectionBase):
                 else:
                     no_prompt_out += become_output
                     no_prompt_err += become_output
+
+            if in_data:
+                # Pipelining: the module is streamed on stdin of the shell
+                # running the interpreter, on the same channel.
+                chan.sendall(to_bytes(in_data, errors='surrogate_or_strict'))
+                chan.shutdown_write()
         except socket.timeout:
             raise AnsibleError('ssh timed out waiting for privilege escalation.\n' + become_output)
 
-        stdout = b''.join(chan.makefile('rb', bufsize))
-        stderr = b''.join(chan.makefile_stderr('rb', bufsize))
+        try:
+            rc, stdout, stderr = read_channel(chan, bufsize)
+        finally:
+            chan.close()
 
-        return (chan.recv_exit_status(), no_prompt_out + stdout, no_prompt_out + stderr)
+        return (rc, no_prompt_out + stdout, no_prompt_out + stderr)
 
     def put_file(self, in_path, out_path):
         ''' transfer a file from local to remote '''
@@ -375,14 +694,53 @@ class Connection(ConnectionBase):
             raise AnsibleFileNotFound("file or module does not exist: %s" % in_path)
 
         try:
+            digest = self._file_digest(in_path)
+            cached = '%s/%s' % (PAYLOAD_CACHE_DIR, digest)
+            quoted = {
+                'dir': shlex_quote(PAYLOAD_CACHE_DIR),
+                'cached': shlex_quote(cached),
+                'tmp': shlex_quote(cached) + '.$$',
+                'out': shlex_quote(out_path),
+                'days': PAYLOAD_CACHE_DAYS,
+            }
+            # The switch answers hit and copies its cached file, or answers
+            # miss and reads the file from stdin into the cache first.
+            script = ('if [ -f %(cached)s ]; then '
+                      'touch %(cached)s && cp %(cached)s %(out)s && echo hit; '
+                      'else echo miss && mkdir -p %(dir)s && cat > %(tmp)s && '
+                      'mv %(tmp)s %(cached)s && cp %(cached)s %(out)s && '
+                      'find %(dir)s -type f -mtime +%(days)s -delete; fi') % quoted
+
             transport = self.ssh.get_transport()
             with transport.open_channel(kind='session') as channel:
-                file_data = open('{}'.format(in_path), 'rb').read()
-                channel.exec_command('shell cat > {}'.format(out_path))
-                channel.sendall(file_data)
+                channel.exec_command('--quiet shell %s' % script)
+                answer = channel.makefile('rb', 64).readline().strip()
+                if answer == b'miss':
+                    with open(in_path, 'rb') as in_file:
+                        for chunk in iter(lambda: in_file.read(TRANSFER_CHUNK_SIZE), b''):
+                            channel.sendall(chunk)
+                channel.shutdown_write()
+                status = channel.recv_exit_status()
+                if status != 0 or answer not in (b'hit', b'miss'):
+                    stderr = b''.join(channel.makefile_stderr('rb', 4096))
+                    raise AnsibleError("exit status %s: %s" % (
+                        status, to_native(stderr).strip()))
         except Exception as e:
             raise AnsibleError("failed to transfer file (%s)" % e)
 
+        display.vvv("PUT %s %s" % (digest, 'from switch cache' if answer == b'hit' else 'sent'),
+                    host=self._play_context.remote_addr)
+
+    @staticmethod
+    def _file_digest(path):
+        ''' sha256 of a local file, read in chunks '''
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as in_file:
+            for chunk in iter(lambda: in_file.read(TRANSFER_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
     def fetch_file(self, in_path, out_path):
         ''' save a remote file to the specified path '''
 
@@ -390,52 +748,96 @@ class Connection(ConnectionBase):
 
         display.vvv("FETCH %s TO %s" % (in_path, out_path), host=self._play_context.remote_addr)
 
-    def _any_keys_added(self):
-
-        for hostname, keys in iteritems(self.ssh._host_keys):
-            for keytype, key in iteritems(keys):
-                added_this_time = getattr(key, '_added_by_ansible_this_time', False)
-                if added_this_time:
-                    return True
-        return False
-
-    def _save_ssh_host_keys(self, filename):
-        '''
-        not using the paramiko save_ssh_host_keys function as we want to add new SSH keys at the bottom so folks
-        don't complain about it :)
-        '''
+        # A .gz destination of a plain file is compressed while it is written.
+        compress = out_path.endswith('.gz') and not in_path.endswith('.gz')
+        try:
+            self._stream_command('--quiet shell cat %s' % shlex_quote(in_path), out_path, compress)
+        except Exception as e:
+            raise AnsibleError("failed to transfer file from %s (%s)" % (in_path, e))
 
-        if not self._any_keys_added():
-            return False
+    def _stream_command(self, command, out_path, compress=False):
+        ''' run a command on its own channel, writing its stdout to a local
+        file as it arrives, gzip compressed if asked; the file is moved into
+        place once the command succeeded; fails when no output arrived for
+        TRANSFER_TIMEOUT seconds '''
 
-        path = os.path.expanduser("~/.ssh")
-        makedirs_safe(path)
+        out_dir = os.path.dirname(os.path.abspath(out_path))
+        makedirs_safe(out_dir)
+        tmp_file = tempfile.NamedTemporaryFile(dir=out_dir, delete=False)
+        try:
+            if compress:
+                out_file = gzip.GzipFile(fileobj=tmp_file, mode='wb')
+            else:
+                out_file = tmp_file
 
-        f = open(filename, 'w')
+            chan = self.ssh.get_transport().open_session()
+            chan.exec_command(command)
+            try:
+                rc, stdout, stderr = read_channel(chan, TRANSFER_CHUNK_SIZE, TRANSFER_TIMEOUT,
+                                                  sink=out_file.write)
+            except socket.timeout:
+                raise AnsibleConnectionFailure('no output of %s on %s within %ss' % (
+                    command, self._play_context.remote_addr, TRANSFER_TIMEOUT))
+            finally:
+                chan.close()
+
+            if compress:
+                out_file.close()
+            tmp_file.close()
+
+            if rc != 0:
+                raise AnsibleError("%s exited with %s: %s" % (
+                    command, rc, to_native(stderr).strip()))
+            os.rename(tmp_file.name, out_path)
+        except BaseException:
+            tmp_file.close()
+            os.remove(tmp_file.name)
+            raise
+
+    def _queue_host_keys(self):
+        ''' queue the keys added by this connection for the known_hosts
+        file, skipping those already recorded '''
+
+        if self.keyfile not in KNOWN_HOST_KEYS:
+            KNOWN_HOST_KEYS[self.keyfile], KNOWN_HOST_OFFSETS[self.keyfile] = \
+                known_hosts_lines(self.keyfile)
+        recorded = KNOWN_HOST_KEYS[self.keyfile]
+        flush_host_keys_at_exit()
 
         for hostname, keys in iteritems(self.ssh._host_keys):
-
             for keytype, key in iteritems(keys):
+                if getattr(key, '_added_by_ansible_this_time', False):
+                    line = "%s %s %s" % (hostname, keytype, key.get_base64())
+                    if line not in recorded:
+                        recorded.add(line)
+                        PENDING_HOST_KEYS.setdefault(self.keyfile, []).append(line)
+                    key._added_by_ansible_this_time = False
 
-                # was f.write
-                added_this_time = getattr(key, '_added_by_ansible_this_time', False)
-                if not added_this_time:
-                    f.write("%s %s %s\n" % (hostname, keytype, key.get_base64()))
+    def _any_keys_added(self):
 
         for hostname, keys in iteritems(self.ssh._host_keys):
-
             for keytype, key in iteritems(keys):
                 added_this_time = getattr(key, '_added_by_ansible_this_time', False)
                 if added_this_time:
-                    f.write("%s %s %s\n" % (hostname, keytype, key.get_base64()))
+                    return True
+        return False
 
-        f.close()
+    def reset(self):
+        ''' drop the cached connection of the host and reconnect '''
+
+        cache_key = self._cache_key()
+        ssh = SSH_CONNECTION_CACHE.pop(cache_key, None)
+        if ssh is not None:
+            ssh.close()
+        self._connect()
 
     def close(self):
-        ''' terminate the connection '''
+        ''' release the connection; the transport stays cached for later
+        connections to the host made by this process and is closed when the
+        process exits.  Transports are not shared between the worker
+        processes ansible forks per task, only the shell role bootstrap is '''
 
         cache_key = self._cache_key()
-        SSH_CONNECTION_CACHE.pop(cache_key, None)
         SFTP_CONNECTION_CACHE.pop(cache_key, None)
 
         if hasattr(self, 'sftp'):
@@ -443,57 +845,8 @@ class Connection(ConnectionBase):
                 self.sftp.close()
 
         if C.HOST_KEY_CHECKING and C.PARAMIKO_RECORD_HOST_KEYS and self._any_keys_added():
+            self._queue_host_keys()
 
-            # add any new SSH host keys -- warning -- this could be slow
-            # (This doesn't acquire the connection lock because it needs
-            # to exclude only other known_hosts writers, not connections
-            # that are starting up.)
-            lockfile = self.keyfile.replace("known_hosts", ".known_hosts.lock")
-            dirname = os.path.dirname(self.keyfile)
-            makedirs_safe(dirname)
-
-            KEY_LOCK = open(lockfile, 'w')
-            fcntl.lockf(KEY_LOCK, fcntl.LOCK_EX)
-
-            try:
-                # just in case any were added recently
-
-                self.ssh.load_system_host_keys()
-                self.ssh._host_keys.update(self.ssh._system_host_keys)
-
-                # gather information about the current key file, so
-                # we can ensure the new file has the correct mode/owner
-
-                key_dir = os.path.dirname(self.keyfile)
-                if os.path.exists(self.keyfile):
-                    key_stat = os.stat(self.keyfile)
-                    mode = key_stat.st_mode
-                    uid = key_stat.st_uid
-                    gid = key_stat.st_gid
-                else:
-                    mode = 33188
-                    uid = os.getuid()
-                    gid = os.getgid()
-
-                # Save the new keys to a temporary file and move it into place
-                # rather than rewriting the file. We set delete=False because
-                # the file will be moved into place rather than cleaned up.
-
-                tmp_keyfile = tempfile.NamedTemporaryFile(dir=key_dir, delete=False)
-                os.chmod(tmp_keyfile.name, mode & 0o7777)
-                os.chown(tmp_keyfile.name, uid, gid)
-
-                self._save_ssh_host_keys(tmp_keyfile.name)
-                tmp_keyfile.close()
-
-                os.rename(tmp_keyfile.name, self.keyfile)
-
-            except:
-
-                # unable to save keys, including scenario when key was invalid
-                # and caught earlier
-                traceback.print_exc()
-                pass
-            fcntl.lockf(KEY_LOCK, fcntl.LOCK_UN)
-
-        self.ssh.close()
+        if not self._transport_alive(self.ssh):
+            SSH_CONNECTION_CACHE.pop(cache_key, None)
+            self.ssh.close()
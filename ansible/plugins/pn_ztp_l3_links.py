@@ -0,0 +1,185 @@
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+
+# Action plugin running pn_ztp_l3_links with a link ledger kept on the
+# controller. The ledger records the number of every link the module
+# addressed, keyed by spine, leaf and leaf port, so a re-run or an added leaf
+# looks its links up instead of counting the links of the preceding leafs,
+# and existing links are never renumbered. The module first lists the links
+# of the leaf; the plugin numbers the new ones under the ledger lock, then
+# the module configures the leaf without the lock held, so forks run side by
+# side. An empty ledger is seeded with the numbers the links get without a
+# ledger, so links configured before it keep their addresses. Check mode
+# leaves the ledger file as is. Without pn_link_ledger_file the module runs
+# as is. Install it in the action_plugins path, next to the module in the
+# library path.
+#
+#   - name: Configure L3 links
+#     pn_ztp_l3_links:
+#       pn_current_switch: "{{ inventory_hostname }}"
+#       pn_spine_list: "{{ groups['spine'] }}"
+#       pn_leaf_list: "{{ groups['leaf'] }}"
+#       pn_link_ledger_file: "{{ playbook_dir }}/links.json"
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import fcntl
+import json
+import os
+
+from ansible.plugins.action import ActionBase
+
+LEDGER_VERSION = 1
+
+
+def load_ledger(path):
+    """
+    Method to read the link ledger, empty if the file does not exist.
+    :param path: Path of the ledger file.
+    :return: Dictionary of the ranges, next free link number and links.
+    """
+    ledger = {'version': LEDGER_VERSION, 'ranges': {}, 'next': 0, 'links': {}}
+    if os.path.exists(path):
+        with open(path) as ledger_file:
+            ledger.update(json.load(ledger_file))
+    if ledger['version'] != LEDGER_VERSION:
+        raise ValueError('%s is a version %s link ledger' % (
+            path, ledger['version']))
+    return ledger
+
+
+def save_ledger(path, ledger):
+    """
+    Method to replace the link ledger file in one rename.
+    :param path: Path of the ledger file.
+    :param ledger: The ledger dictionary.
+    """
+    temp = '%s.%d.tmp' % (path, os.getpid())
+    with open(temp, 'w') as ledger_file:
+        json.dump(ledger, ledger_file, indent=1, sort_keys=True)
+    os.rename(temp, path)
+
+
+def reserve_links(ledger, listed):
+    """
+    Method to record the link ranges and number the new links listed by
+    the module, seeding an empty ledger first.
+    :param ledger: The ledger dictionary.
+    :param listed: The link_ledger returned by the module listing the links.
+    :return: True if the ledger changed.
+    """
+    changed = False
+    for key, value in listed['ranges'].items():
+        recorded = ledger['ranges'].get(key)
+        if recorded and recorded != value:
+            raise ValueError('the ledger was recorded for %s range %s' % (
+                key.split('_')[1], '/'.join(recorded[:2])))
+        if not recorded:
+            ledger['ranges'][key] = value
+            changed = True
+
+    if not ledger['links'] and listed.get('seed'):
+        ledger['links'].update(listed['seed'])
+        ledger['next'] = max(ledger['next'], listed['next'])
+        changed = True
+
+    for key in listed['links']:
+        if key not in ledger['links']:
+            ledger['links'][key] = ledger['next']
+            ledger['next'] += 1
+            changed = True
+    return changed
+
+
+def update_ledger(path, listed, save=True):
+    """
+    Method to number the links listed by the module under the ledger lock,
+    reloading the ledger so the links other forks numbered are kept.
+    :param path: Path of the ledger file.
+    :param listed: The link_ledger returned by the module listing the links.
+    :param save: False to leave the ledger file as is, as in check mode.
+    :return: The updated ledger dictionary.
+    """
+    with open(path + '.lock', 'a') as lock:
+        fcntl.lockf(lock, fcntl.LOCK_EX)
+        ledger = load_ledger(path)
+        if reserve_links(ledger, listed) and save:
+            save_ledger(path, ledger)
+    return ledger
+
+
+class ActionModule(ActionBase):
+
+    TRANSFERS_FILES = False
+
+    def run(self, tmp=None, task_vars=None):
+        result = super(ActionModule, self).run(tmp, task_vars)
+        task_vars = task_vars or {}
+
+        args = dict(self._task.args)
+        path = args.pop('pn_link_ledger_file', None)
+        if not path:
+            result.update(self._execute_module(module_name='pn_ztp_l3_links',
+                                               module_args=args,
+                                               task_vars=task_vars))
+            return result
+        path = os.path.abspath(os.path.expanduser(path))
+
+        # save_ledger() replaces the file in one rename, so it can be read
+        # without the lock.
+        try:
+            ledger = load_ledger(path)
+        except ValueError as error:
+            result['failed'] = True
+            result['msg'] = 'Could not read the link ledger: %s' % error
+            return result
+
+        listing = self._execute_module(module_name='pn_ztp_l3_links',
+                                       module_args=dict(args, pn_link_ledger={
+                                           'ranges': ledger['ranges'],
+                                           'list': True,
+                                           'seed': not ledger['links'],
+                                       }),
+                                       task_vars=task_vars)
+        if listing.get('failed') or not listing.get('link_ledger'):
+            result.update(listing)
+            return result
+
+        # Check mode numbers the new links without saving them, so forks
+        # checked side by side may plan the same number for different links.
+        try:
+            ledger = update_ledger(path, listing['link_ledger'],
+                                   save=not self._play_context.check_mode)
+        except ValueError as error:
+            result['failed'] = True
+            result['msg'] = 'Could not update the link ledger: %s' % error
+            return result
+
+        # The module built the keys of the leaf's links, so the plugin
+        # never parses or normalizes a switch name itself.
+        args['pn_link_ledger'] = {
+            'ranges': ledger['ranges'],
+            'links': dict((key, ledger['links'][key])
+                          for key in listing['link_ledger']['links']),
+        }
+        result.update(self._execute_module(module_name='pn_ztp_l3_links',
+                                           module_args=args,
+                                           task_vars=task_vars))
+
+        result['link_ledger_file'] = path
+        return result
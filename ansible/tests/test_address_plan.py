@@ -0,0 +1,146 @@
+"""
+Tests of the FabricAddressPlan of pn_nvos and of its table form, as
+returned by pn_address_plan.
+
+    python -m unittest discover -s tests
+"""
+
+import json
+import os
+import sys
+import unittest
+
+TREE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(TREE_DIR, 'module_utils'))
+
+import pn_nvos
+
+SPINES = ['spine1', 'spine2']
+LEAFS = ['leaf1', 'leaf2', 'leaf3', 'leaf4']
+
+# The defaults of pn_address_plan, with ipv6 ranges set.
+RANGES = {
+    'loopback_ip': '109.109.109.1/32',
+    'loopback_ipv6': '2001:db8:109::1/128',
+    'inband_ip': '192.16.0.1/24',
+    'mgmt_ipv6': '2001:db8:200::1/64',
+    'link_ipv4': ['172.168.1.1', '24', '31'],
+    'link_ipv6': ['2001:db8:1::', '112', '127'],
+    'iospf_ipv4': ['75.75.75.1', '24', '31'],
+    'iospf_ipv6': ['2001:db8:75::', '112', '127'],
+}
+
+
+class PlanModule(object):
+    """
+    The parts of an AnsibleModule address_plan() uses.
+    """
+
+    def __init__(self, params):
+        self.params = params
+
+
+class FabricAddressPlanTest(unittest.TestCase):
+
+    def setUp(self):
+        self.plan = pn_nvos.FabricAddressPlan(
+            SPINES, LEAFS, RANGES,
+            dict((leaf, len(SPINES)) for leaf in LEAFS))
+
+    def test_switch_addresses(self):
+        self.assertEqual(self.plan.switch('spine1'), {
+            'switch': 'spine1',
+            'role': 'spine',
+            'loopback_ip': '109.109.109.1',
+            'loopback_ipv6': '2001:db8:109::1',
+            'inband_ip': '192.16.0.1/24',
+            'mgmt_ipv6': '2001:db8:200::1/64',
+            'first_link': None,
+            'links': None,
+        })
+        self.assertEqual(self.plan.router_id('leaf2'), '109.109.109.4')
+        self.assertEqual(self.plan.first_link('leaf3'), 4)
+        self.assertEqual(self.plan.switch('unknown'), None)
+
+    def test_iospf(self):
+        ipv4, ipv6 = self.plan.iospf(1)
+        self.assertEqual(ipv4, ('75.75.75.2/31', '75.75.75.3/31'))
+        self.assertEqual(ipv6, pn_nvos.Ipv6LinkAllocator(
+            *RANGES['iospf_ipv6']).link(1))
+        # Cluster numbers past the switch pairs are computed on demand.
+        self.assertEqual(self.plan.iospf(10)[0],
+                         ('75.75.75.20/31', '75.75.75.21/31'))
+
+    def test_table_round_trip(self):
+        table = json.loads(json.dumps(self.plan.to_table()))
+        plan = pn_nvos.FabricAddressPlan.from_table(table)
+        self.assertEqual(plan.rows, self.plan.rows)
+        self.assertEqual(plan.iospf_rows, self.plan.iospf_rows)
+        self.assertEqual(plan.ranges, self.plan.ranges)
+        for switch in SPINES + LEAFS:
+            self.assertEqual(plan.switch(switch), self.plan.switch(switch))
+        self.assertEqual(plan.iospf(10), self.plan.iospf(10))
+        self.assertTrue(plan.covers(SPINES, LEAFS, RANGES))
+
+    def test_unusable_tables(self):
+        table = self.plan.to_table()
+        self.assertEqual(pn_nvos.FabricAddressPlan.from_table(None), None)
+        for key, value in (('version', 0), ('columns', ['switch'])):
+            other = dict(table)
+            other[key] = value
+            self.assertEqual(pn_nvos.FabricAddressPlan.from_table(other), None)
+
+    def test_covers(self):
+        self.assertTrue(self.plan.covers(
+            [' spine1', 'spine2'], LEAFS, {'inband_ip': '192.16.0.1/24'}))
+        self.assertFalse(self.plan.covers(SPINES, LEAFS[:-1], RANGES))
+        self.assertFalse(self.plan.covers(
+            SPINES, LEAFS, {'link_ipv4': ['172.168.1.1', '24', '30']}))
+
+    def test_address_plan_parameter(self):
+        table = self.plan.to_table()
+        module = PlanModule({'pn_spine_list': SPINES, 'pn_leaf_list': LEAFS,
+                             'pn_address_plan': table})
+        plan = pn_nvos.address_plan(module, {'inband_ip': '192.16.0.1/24'})
+        self.assertEqual(plan.first_link('leaf3'), 4)
+
+        # Computed again, without link counts, for other ranges.
+        plan = pn_nvos.address_plan(module, {'inband_ip': '192.17.0.1/24'})
+        self.assertEqual(plan.switch('leaf1')['inband_ip'], '192.17.0.3/24')
+        self.assertEqual(plan.first_link('leaf3'), None)
+
+
+class AddressPlanOverlapTest(unittest.TestCase):
+
+    def overlaps(self, ranges):
+        index = pn_nvos.PrefixIndex()
+        index.add_plan(pn_nvos.FabricAddressPlan(SPINES, LEAFS, ranges))
+        return [(entry[3], other[3]) for entry, other in index.overlaps()]
+
+    def test_disjoint_ranges(self):
+        self.assertEqual(self.overlaps(RANGES), [])
+
+    def test_overlapping_ranges(self):
+        ranges = dict(RANGES)
+        ranges['iospf_ipv4'] = ['172.168.1.128', '25', '31']
+        ranges['loopback_ipv6'] = '2001:db8:1::10/128'
+        self.assertEqual(sorted(self.overlaps(ranges)), [
+            ('link_ipv4', 'iospf_ipv4'),
+            ('link_ipv6', 'loopback_ipv6'),
+        ])
+
+    def test_loaded_plan(self):
+        ranges = dict(RANGES)
+        ranges['inband_ip'] = '109.109.109.3/24'
+        plan = pn_nvos.FabricAddressPlan(SPINES, LEAFS, ranges)
+        plan = pn_nvos.FabricAddressPlan.from_table(
+            json.loads(json.dumps(plan.to_table())))
+        index = pn_nvos.PrefixIndex()
+        index.add_plan(plan)
+        self.assertEqual(
+            [(entry[3], other[3]) for entry, other in index.overlaps()],
+            [('inband_ip', 'loopback_ip')])
+
+
+if __name__ == '__main__':
+    unittest.main()
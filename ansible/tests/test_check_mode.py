@@ -0,0 +1,100 @@
+"""
+Check mode tests of pn_nvos against the cli simulator.
+
+    python -m unittest discover -s tests
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+TREE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SIMULATOR = os.path.join(TREE_DIR, 'benchmarks', 'cli_simulator.py')
+
+# CLI_PATH is read when pn_nvos is imported, which other tests may have
+# done already.
+os.environ['PN_CLI_PATH'] = SIMULATOR
+sys.path.insert(0, os.path.join(TREE_DIR, 'module_utils'))
+
+import pn_nvos
+
+pn_nvos.CLI_PATH = SIMULATOR
+
+
+class CheckModeModule(object):
+    """
+    The parts of an AnsibleModule run_in_session() uses.
+    """
+
+    check_mode = True
+    params = {}
+
+    def run_command(self, args):
+        process = subprocess.Popen(args, stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE,
+                                   universal_newlines=True)
+        out, err = process.communicate()
+        return process.returncode, out, err
+
+
+def run_cli(module, cli):
+    # run_cli() of the ZTP modules, without the failure handling.
+    rc, out, err = pn_nvos.run_in_session(module, cli)
+    return out if out else 'Success'
+
+
+class InbandCheckModeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        state = os.path.join(self.workdir, 'fabric.json')
+        subprocess.check_call([sys.executable, SIMULATOR, '--init',
+                               '--spines', '2', '--leafs', '2',
+                               '--state', state],
+                              stdout=open(os.devnull, 'w'))
+        os.environ['PN_CLI_SIM_STATE'] = state
+        os.environ['PN_CLI_SIM_SWITCH'] = 'leaf1'
+        subprocess.check_call([sys.executable, SIMULATOR, 'fabric-create',
+                               'name', 'check-fabric'],
+                              stdout=open(os.devnull, 'w'))
+        pn_nvos.close_cli_sessions()
+        pn_nvos.memoize_shows(True)
+        del pn_nvos._CLI_PLAN[:]
+        self.module = CheckModeModule()
+        self.cli = pn_nvos.pn_cli(self.module)
+
+    def tearDown(self):
+        pn_nvos.close_cli_sessions()
+        shutil.rmtree(self.workdir)
+
+    def test_fabric_info_is_read_only(self):
+        self.assertFalse(pn_nvos.is_mutating_verb('fabric-info'))
+        self.assertFalse(pn_nvos.is_mutating_verb('vlan-show'))
+        self.assertTrue(pn_nvos.is_mutating_verb('fabric-local-modify'))
+
+    def test_inband_path(self):
+        # The commands of update_fabric_network_to_inband in
+        # pn_ztp_l3_links.
+        output = run_cli(self.module,
+                         self.cli + ' fabric-info format fabric-network ')
+        fabric_network = output.split()[1]
+        self.assertEqual(fabric_network, 'mgmt')
+        self.assertEqual(pn_nvos.cli_plan(), [])
+
+        output = run_cli(self.module, self.cli + ' switch leaf1 '
+                         'fabric-local-modify fabric-network in-band ')
+        self.assertEqual(output, 'Success')
+        self.assertEqual(pn_nvos.cli_plan(), [
+            'switch leaf1 fabric-local-modify fabric-network in-band'])
+
+        # Nothing was changed in check mode.
+        output = run_cli(self.module,
+                         self.cli + ' fabric-info format fabric-network ')
+        self.assertEqual(output.split()[1], fabric_network)
+
+
+if __name__ == '__main__':
+    unittest.main()
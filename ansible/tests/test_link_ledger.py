@@ -0,0 +1,258 @@
+"""
+Tests of the link ledger of the pn_ztp_l3_links action plugin and module,
+the module listing the links against the cli simulator.
+
+    python -m unittest discover -s tests
+
+Both are loaded without ansible.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+TREE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLUGIN = os.path.join(TREE_DIR, 'plugins', 'pn_ztp_l3_links.py')
+MODULE = os.path.join(TREE_DIR, 'modules', 'pn_ztp_l3_links.py')
+SIMULATOR = os.path.join(TREE_DIR, 'benchmarks', 'cli_simulator.py')
+
+# CLI_PATH is read when pn_nvos is imported, which other tests may have
+# done already.
+os.environ['PN_CLI_PATH'] = SIMULATOR
+sys.path.insert(0, os.path.join(TREE_DIR, 'module_utils'))
+
+import pn_nvos
+
+pn_nvos.CLI_PATH = SIMULATOR
+
+RANGES = {'link_ipv4': ['172.168.1.1', '24', '31']}
+
+
+def load_source(path, end, imports):
+    """
+    Run the part of a plugin or module source before end in a namespace of
+    its own, with the ansible imports replaced.
+    """
+    with open(path) as source_file:
+        source = source_file.read()
+    source = source[:source.index(end)]
+    for line, replacement in imports:
+        source = source.replace(line, replacement)
+    namespace = {'__name__': os.path.basename(path)[:-3]}
+    exec(compile(source, path, 'exec'), namespace)
+    return namespace
+
+
+def load_plugin():
+    return load_source(PLUGIN, 'class ActionModule', [
+        ('from ansible.plugins.action import ActionBase\n', '')])
+
+
+def load_module():
+    return load_source(MODULE, "if __name__ == '__main__':", [
+        ('from ansible.module_utils.basic import AnsibleModule\n', ''),
+        ('from ansible.module_utils.pn_nvos import *\n',
+         'from pn_nvos import *\n')])
+
+
+def listed(links, seed=None, next_number=0):
+    listing = {'ranges': RANGES, 'links': links}
+    if seed is not None:
+        listing['seed'] = seed
+        listing['next'] = next_number
+    return listing
+
+
+class ReserveLinksTest(unittest.TestCase):
+
+    def setUp(self):
+        self.plugin = load_plugin()
+        self.ledger = self.plugin['load_ledger']('/nonexistent/links.json')
+
+    def test_new_links(self):
+        reserve_links = self.plugin['reserve_links']
+        self.assertTrue(reserve_links(self.ledger, listed(
+            ['spine1,leaf1,1', 'spine2,leaf1,2'])))
+        self.assertEqual(self.ledger['ranges'], RANGES)
+        self.assertTrue(reserve_links(self.ledger, listed(
+            ['spine1,leaf2,1', 'spine1,leaf1,1'])))
+        self.assertEqual(self.ledger['links'], {
+            'spine1,leaf1,1': 0, 'spine2,leaf1,2': 1, 'spine1,leaf2,1': 2})
+        self.assertEqual(self.ledger['next'], 3)
+        # Numbered links are kept.
+        self.assertFalse(reserve_links(self.ledger, listed(['spine1,leaf2,1'])))
+
+    def test_seed_empty_ledger(self):
+        seed = {'spine1,leaf1,1': 0, 'spine1,leaf2,1': 2}
+        self.assertTrue(self.plugin['reserve_links'](self.ledger, listed(
+            ['spine1,leaf2,1', 'spine1,leaf2,3'], seed, 4)))
+        self.assertEqual(self.ledger['links'], {
+            'spine1,leaf1,1': 0, 'spine1,leaf2,1': 2, 'spine1,leaf2,3': 4})
+        self.assertEqual(self.ledger['next'], 5)
+
+    def test_seed_ignored_once_numbered(self):
+        self.ledger['links'] = {'spine1,leaf1,1': 7}
+        self.ledger['next'] = 8
+        self.plugin['reserve_links'](self.ledger, listed(
+            ['spine1,leaf2,1'], {'spine1,leaf1,1': 0, 'spine1,leaf2,1': 1}, 2))
+        self.assertEqual(self.ledger['links'], {
+            'spine1,leaf1,1': 7, 'spine1,leaf2,1': 8})
+
+    def test_other_range(self):
+        self.ledger['ranges'] = {'link_ipv4': ['10.0.0.0', '24', '31']}
+        self.assertRaises(ValueError, self.plugin['reserve_links'],
+                          self.ledger, listed(['spine1,leaf1,1']))
+
+
+class UpdateLedgerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.plugin = load_plugin()
+        self.workdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.workdir, 'links.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def test_saved_in_one_rename(self):
+        ledger = self.plugin['update_ledger'](self.path, listed(
+            ['spine1,leaf1,1']))
+        self.assertEqual(self.plugin['load_ledger'](self.path), ledger)
+        self.assertEqual(sorted(os.listdir(self.workdir)),
+                         ['links.json', 'links.json.lock'])
+
+    def test_reloaded_under_the_lock(self):
+        update_ledger = self.plugin['update_ledger']
+        # A ledger read before another fork saved its links.
+        stale = self.plugin['load_ledger'](self.path)
+        update_ledger(self.path, listed(['spine1,leaf1,1']))
+        ledger = update_ledger(self.path, listed(['spine1,leaf2,1']))
+        self.assertEqual(stale['links'], {})
+        self.assertEqual(ledger['links'], {
+            'spine1,leaf1,1': 0, 'spine1,leaf2,1': 1})
+
+    def test_check_mode(self):
+        update_ledger = self.plugin['update_ledger']
+        update_ledger(self.path, listed(['spine1,leaf1,1']))
+        with open(self.path) as ledger_file:
+            saved = ledger_file.read()
+        ledger = update_ledger(self.path, listed(['spine1,leaf2,1']),
+                               save=False)
+        self.assertEqual(ledger['links']['spine1,leaf2,1'], 1)
+        with open(self.path) as ledger_file:
+            self.assertEqual(ledger_file.read(), saved)
+
+    def test_concurrent_reservation(self):
+        update_ledger = self.plugin['update_ledger']
+        leafs = ['leaf%d' % number for number in range(1, 9)]
+        children = []
+        for leaf in leafs:
+            pid = os.fork()
+            if pid == 0:
+                status = 1
+                try:
+                    update_ledger(self.path, listed(
+                        ['spine1,%s,1' % leaf, 'spine2,%s,2' % leaf]))
+                    status = 0
+                finally:
+                    os._exit(status)
+            children.append(pid)
+        for pid in children:
+            self.assertEqual(os.waitpid(pid, 0)[1], 0)
+
+        ledger = self.plugin['load_ledger'](self.path)
+        self.assertEqual(len(ledger['links']), 2 * len(leafs))
+        self.assertEqual(sorted(ledger['links'].values()),
+                         list(range(2 * len(leafs))))
+        self.assertEqual(ledger['next'], 2 * len(leafs))
+        for leaf in leafs:
+            # The links of a leaf were numbered together.
+            self.assertEqual(ledger['links']['spine2,%s,2' % leaf],
+                             ledger['links']['spine1,%s,1' % leaf] + 1)
+
+
+class LedgerModule(object):
+    """
+    The parts of an AnsibleModule the link listing uses.
+    """
+
+    check_mode = False
+
+    def __init__(self, params):
+        self.params = params
+
+    def run_command(self, args):
+        process = subprocess.Popen(args, stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE,
+                                   universal_newlines=True)
+        out, err = process.communicate()
+        return process.returncode, out, err
+
+    def exit_json(self, **result):
+        raise AssertionError(json.dumps(result))
+
+
+class SeedLinkLedgerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        state = os.path.join(self.workdir, 'fabric.json')
+        subprocess.check_call([sys.executable, SIMULATOR, '--init',
+                               '--spines', '2', '--leafs', '2',
+                               '--state', state],
+                              stdout=open(os.devnull, 'w'))
+        os.environ['PN_CLI_SIM_STATE'] = state
+        os.environ['PN_CLI_SIM_SWITCH'] = 'leaf1'
+        pn_nvos.close_cli_sessions()
+        pn_nvos.memoize_shows(True)
+        self.module = load_module()
+        self.plugin = load_plugin()
+        self.path = os.path.join(self.workdir, 'links.json')
+
+    def tearDown(self):
+        pn_nvos.close_cli_sessions()
+        shutil.rmtree(self.workdir)
+
+    def list_links(self, leaf, seed):
+        # The switch names as an inventory may pad them.
+        module = LedgerModule({
+            'pn_spine_list': [' spine1', 'spine2 '],
+            'pn_leaf_list': ['leaf1', ' leaf2'],
+            'pn_current_switch': leaf,
+            'pn_addr_type': 'ipv4',
+            'pn_net_address_ipv4': '172.168.1.1',
+            'pn_cidr_ipv4': '24',
+            'pn_subnet_ipv4': '31',
+            'pn_address_plan': None,
+        })
+        ledger = self.plugin['load_ledger'](self.path)
+        return self.module['list_ledger_links'](module, {
+            'ranges': ledger['ranges'], 'list': True, 'seed': seed})
+
+    def test_seed_empty_ledger(self):
+        listing = self.list_links(' leaf2', True)
+        # The links are numbered leaf by leaf, spine by spine, as they are
+        # without a ledger.
+        self.assertEqual(listing['seed'], {
+            'spine1,leaf1,1': 0, 'spine2,leaf1,2': 1,
+            'spine1,leaf2,1': 2, 'spine2,leaf2,2': 3})
+        self.assertEqual(listing['next'], 4)
+        self.assertEqual(listing['links'], ['spine1,leaf2,1', 'spine2,leaf2,2'])
+
+        ledger = self.plugin['update_ledger'](self.path, listing)
+        self.assertEqual(ledger['links'], listing['seed'])
+        self.assertEqual(ledger['next'], 4)
+
+        # The other leaf finds its links seeded.
+        listing = self.list_links('leaf1', False)
+        self.assertNotIn('seed', listing)
+        self.assertFalse(self.plugin['reserve_links'](
+            self.plugin['load_ledger'](self.path), listing))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+"""
+Tests of the result store of the pn_json callback.
+
+    python -m unittest discover -s tests
+
+The callback tests need ansible; ResultStore is loaded without it.
+"""
+
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import uuid
+
+TREE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLUGIN = os.path.join(TREE_DIR, 'plugins', 'pn_json.py')
+
+try:
+    from ansible.plugins.callback import CallbackBase
+    HAVE_ANSIBLE = True
+except ImportError:
+    HAVE_ANSIBLE = False
+
+
+def load_plugin(whole=True):
+    """
+    Run the plugin source in a namespace of its own, with the environment of
+    the test; without whole only the part before the callback class, which
+    does not need ansible.
+    """
+    with open(PLUGIN) as plugin:
+        source = plugin.read()
+    if not whole:
+        source = source[:source.index('class CallbackModule')].replace(
+            'from ansible.plugins.callback import CallbackBase\n', '')
+    namespace = {'__name__': 'pn_json'}
+    exec(compile(source, PLUGIN, 'exec'), namespace)
+    return namespace
+
+
+class ResultStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.workdir, 'results.ndjson')
+        self.ResultStore = load_plugin(whole=False)['ResultStore']
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def check_store(self, compress):
+        store = self.ResultStore(self.path, compress)
+        records = [{'task': {'name': 'task %d' % number}, 'hosts': {
+            'leaf%d' % number: {'msg': 'x' * number}}} for number in range(50)]
+        for number, record in enumerate(records):
+            self.assertEqual(store.append(record), number)
+        self.assertEqual(len(store), 50)
+        # The writer reads back and keeps appending at the end.
+        self.assertEqual(store.page(10, 3), records[10:13])
+        store.append({'task': {'name': 'last'}})
+        store.close()
+
+        reader = self.ResultStore(self.path, mode='r')
+        self.assertEqual(len(reader), 51)
+        self.assertEqual(reader.page(0, 100)[:50], records)
+        self.assertEqual(reader.page(48, 10)[2], {'task': {'name': 'last'}})
+        self.assertEqual(reader.get(7), records[7])
+        self.assertEqual(reader.page(60, 5), [])
+        self.assertRaises(IndexError, reader.get, 51)
+        reader.close()
+
+    def test_plain(self):
+        self.check_store(False)
+        with open(self.path, 'rb') as results:
+            self.assertEqual(len(results.read().splitlines()), 51)
+
+    def test_compressed(self):
+        self.check_store(True)
+        with open(self.path, 'rb') as results:
+            self.assertEqual(results.read(2), b'\x1f\x8b')
+
+
+class Named(object):
+
+    def __init__(self, name):
+        self.name = name
+        self._uuid = uuid.uuid4()
+
+
+class Result(object):
+
+    def __init__(self, host, task, result):
+        self._host = host
+        self._task = task
+        self._result = result
+
+
+class Stats(object):
+
+    def __init__(self, hosts):
+        self.processed = dict((host, 1) for host in hosts)
+
+    def summarize(self, host):
+        return {'ok': 1}
+
+
+@unittest.skipUnless(HAVE_ANSIBLE, 'ansible is not installed')
+class SpillTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.workdir, 'results.ndjson')
+        self.environ = dict(os.environ)
+        os.environ['PN_JSON_RESULTS_FILE'] = self.path
+        os.environ['PN_JSON_FORMAT'] = 'json'
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.environ)
+        shutil.rmtree(self.workdir)
+
+    def test_results_read_back_in_order(self):
+        plugin = load_plugin()
+        hosts = [Named('leaf1'), Named('leaf2')]
+        plays = [Named('play 1'), Named('play 2')]
+        output = io.StringIO() if sys.version_info[0] > 2 else io.BytesIO()
+        with contextlib.closing(output):
+            stdout, sys.stdout = sys.stdout, output
+            try:
+                callback = plugin['CallbackModule']()
+                for play in plays:
+                    callback.v2_playbook_on_play_start(play)
+                    for number in range(3):
+                        task = Named('%s task %d' % (play.name, number))
+                        callback.v2_playbook_on_task_start(task, False)
+                        for host in hosts:
+                            callback.v2_runner_on_ok(Result(
+                                host, task, {'msg': host.name, 'failed': False}))
+                        # Only the running task is kept in memory.
+                        self.assertEqual(len(callback.results[-1]['tasks']), 1)
+                callback.v2_playbook_on_stats(Stats(['leaf1', 'leaf2']))
+            finally:
+                sys.stdout = stdout
+
+        store = plugin['ResultStore'](self.path, mode='r')
+        records = store.page(0, 10)
+        store.close()
+        self.assertEqual([record['task']['task']['name'] for record in records],
+                         ['%s task %d' % (play.name, number)
+                          for play in plays for number in range(3)])
+        self.assertEqual([record['play']['name'] for record in records],
+                         ['play 1'] * 3 + ['play 2'] * 3)
+        for record in records:
+            self.assertEqual(record['task']['status'], '0')
+            self.assertEqual(sorted(record['task']['hosts']), ['leaf1', 'leaf2'])
+            self.assertEqual(record['task']['hosts']['leaf2']['msg'], 'leaf2')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+Tests of the PrefixIndex overlap detection of pn_nvos.
+
+    python -m unittest discover -s tests
+"""
+
+import os
+import random
+import sys
+import unittest
+
+TREE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(TREE_DIR, 'module_utils'))
+
+import pn_nvos
+
+
+class PrefixIntervalTest(unittest.TestCase):
+
+    def test_host_bits(self):
+        self.assertEqual(pn_nvos.prefix_interval('10.0.1.7/24'),
+                         ('ipv4', pn_nvos.ipv4_to_int('10.0.1.0'),
+                          pn_nvos.ipv4_to_int('10.0.1.255')))
+
+    def test_ipv6(self):
+        family, first, last = pn_nvos.prefix_interval('2001:db8::1/127')
+        self.assertEqual(family, 'ipv6')
+        self.assertEqual(first, pn_nvos.ipv6_to_int('2001:db8::'))
+        self.assertEqual(last, first + 1)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, pn_nvos.prefix_interval, '10.0.0.1')
+        self.assertRaises(ValueError, pn_nvos.prefix_interval, '10.0.0.0/33')
+
+
+class PrefixIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = pn_nvos.PrefixIndex()
+        self.index.add('10.0.0.0/24', 'line 1')
+        self.index.add('10.0.0.128/25', 'line 2')
+        self.index.add('10.0.1.0/24', 'line 3')
+        self.index.add('2001:db8::/64', 'line 4')
+        self.index.add('2001:db8::10/124', 'line 5')
+
+    def test_find(self):
+        found = [entry[3] for entry in self.index.find('10.0.0.200/32')]
+        self.assertEqual(found, ['line 1', 'line 2'])
+        self.assertEqual(self.index.find('10.0.2.0/24'), [])
+        found = [entry[3] for entry in self.index.find('10.0.0.0/23')]
+        self.assertEqual(found, ['line 1', 'line 2', 'line 3'])
+
+    def test_overlaps(self):
+        pairs = [(entry[3], other[3]) for entry, other in self.index.overlaps()]
+        # Adjacent subnets do not overlap, nor do the families.
+        self.assertEqual(pairs, [('line 1', 'line 2'), ('line 4', 'line 5')])
+
+    def test_overlaps_match_pairwise_check(self):
+        generator = random.Random(7)
+        index = pn_nvos.PrefixIndex()
+        prefixes = []
+        for number in range(300):
+            prefix = '10.%d.%d.0/%d' % (generator.randint(0, 3),
+                                        generator.randint(0, 255),
+                                        generator.randint(16, 24))
+            prefixes.append((pn_nvos.prefix_interval(prefix), number))
+            index.add(prefix, number)
+
+        expected = set()
+        for (interval, number) in prefixes:
+            for (other, other_number) in prefixes:
+                if (number < other_number and interval[1] <= other[2] and
+                        other[1] <= interval[2]):
+                    expected.add((number, other_number))
+        found = set(tuple(sorted((entry[3], other[3])))
+                    for entry, other in index.overlaps())
+        self.assertEqual(found, expected)
+
+    def test_add_after_search(self):
+        self.assertEqual(self.index.find('10.0.5.0/24'), [])
+        self.index.add('10.0.5.0/26', 'line 6')
+        found = [entry[3] for entry in self.index.find('10.0.5.0/24')]
+        self.assertEqual(found, ['line 6'])
+
+
+class PrefixOverlapMessagesTest(unittest.TestCase):
+
+    def test_messages(self):
+        index = pn_nvos.PrefixIndex()
+        index.add('10.0.0.0/24', 'vrrp.csv line 1')
+        index.add('10.0.0.64/26', 'vrrp.csv line 2')
+        self.assertEqual(pn_nvos.prefix_overlap_messages(index),
+                         '10.0.0.64/26 (vrrp.csv line 2) overlaps '
+                         '10.0.0.0/24 (vrrp.csv line 1)\n')
+
+    def test_no_overlap(self):
+        index = pn_nvos.PrefixIndex()
+        index.add('10.0.0.0/25', 'vrrp.csv line 1')
+        index.add('10.0.0.128/25', 'vrrp.csv line 2')
+        self.assertEqual(pn_nvos.prefix_overlap_messages(index), '')
+
+
+if __name__ == '__main__':
+    unittest.main()